@@ -35,6 +35,8 @@ class Application():
         # we need these for later
         self.housekeeper = None
         self.manager = None
+        self.task_queue = None
+        self.broker_version = None
 
         # SSL is a little convoluted because old installations will not have any value
         # for the 'Server', 'ssl' variable. So, if it doesn't exist that's one condition, 
@@ -66,6 +68,10 @@ class Application():
                 'timeout': int(self.config.get_value('Server', 'timeout'))
             }
 
+        # Workers long-poll the broker for tasks, so each Gunicorn worker serves requests on several threads.
+        # The broker state those threads share, the task queue and the WorkerRegistry, is guarded by locks
+        self.gunicorn_options['threads'] = int(self.config.get_value('Server', 'threads'))
+
         self.logging.configure_logging(self.config)
         self.gunicorn_options.update(self.logging.gunicorn_logging_options)
 
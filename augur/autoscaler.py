@@ -0,0 +1,185 @@
+#SPDX-License-Identifier: MIT
+"""
+Starts and stops worker instances to follow the backlog of their task queues
+"""
+import logging
+import math
+import threading
+import time
+
+import sqlalchemy as s
+
+from augur.worker_registry import bump_version, get_worker_type
+
+logger = logging.getLogger(__name__)
+
+def desired_instances(current, backlog, completed_per_hour, min_workers, max_workers, target_drain_seconds, budget_cap=None):
+    """ Number of instances of a worker type needed to work off its backlog in time
+
+    :param current: Integer, number of running instances
+    :param backlog: Integer, number of tasks queued for all instances of the type
+    :param completed_per_hour: Integer, tasks the running instances completed in the last hour
+    :param target_drain_seconds: Integer, how long the backlog is allowed to take to work off
+    :param budget_cap: Integer, most instances the remaining API rate limit can keep busy, None if unlimited
+    """
+    if backlog == 0:
+        desired = min_workers
+    elif current == 0 or completed_per_hour <= 0:
+        # Without a throughput measurement, grow one instance at a time
+        desired = current + 1
+    else:
+        per_instance = completed_per_hour / current * target_drain_seconds / 3600
+        desired = math.ceil(backlog / max(per_instance, 1))
+
+    if budget_cap is not None:
+        desired = min(desired, max(budget_cap, min_workers))
+
+    return max(min_workers, min(max_workers, desired))
+
+class Autoscaler(threading.Thread):
+    """
+    Controller thread in the main augur process that keeps the number of instances of every
+    worker type with an `autoscale` block in the Workers section between its min_workers and
+    max_workers, based on the backlog, throughput and remaining API rate limit of the type.
+
+    New instances are started with the same command as the ones booted with augur. Instances
+    are stopped by marking them Draining in the broker: no new tasks are routed to them and
+    they shut themselves down once their queue is empty. Only workers that claim their own
+    tasks can be drained.
+    """
+
+    def __init__(self, augur_app, broker, broker_version, task_queue, start_worker):
+        super().__init__(name='autoscaler', daemon=True)
+        self.config = augur_app.config
+        self.helper_db = augur_app.operations_database
+        self.broker = broker
+        self.broker_version = broker_version
+        self.task_queue = task_queue
+        self.start_worker = start_worker
+
+        settings = self.config.get_section('Autoscaler')
+        self.interval = int(settings['interval'])
+        self.target_drain_seconds = int(settings['target_drain_seconds'])
+        self.idle_seconds = int(settings['idle_seconds'])
+        self.boot_seconds = int(settings['boot_seconds'])
+        self.requests_per_worker = int(settings['requests_per_worker'])
+
+        self.worker_types = {worker_type: worker_config['autoscale']
+            for worker_type, worker_config in self.config.get_section('Workers').items()
+            if worker_config.get('switch') and 'autoscale' in worker_config}
+
+        self._booting = {worker_type: [] for worker_type in self.worker_types} # start times of instances that did not say HELLO yet
+        self._booting_ports = {worker_type: [] for worker_type in self.worker_types} # ports given to those instances
+        self._surplus_since = {} # worker_type -> time the type started having more instances than it needs
+
+    def run(self):
+        logger.info("Autoscaling worker types: {}".format(list(self.worker_types.keys())))
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.scale()
+            except Exception as e:
+                logger.error("Autoscaler ran into an error: {}".format(repr(e)))
+
+    def get_instances(self):
+        """ Ids of the instances of every worker type that are accepting tasks
+        """
+        instances = {worker_type: [] for worker_type in self.worker_types}
+        for worker_id in list(self.broker._getvalue().keys()):
+            worker_type = get_worker_type(worker_id)
+            if worker_type in instances and self.broker[worker_id]['status'] not in ['Disconnected', 'Draining']:
+                instances[worker_type].append(worker_id)
+        return instances
+
+    def get_throughput(self):
+        """ Number of tasks every worker type completed in the last hour
+        """
+        throughput_sql = s.sql.text("""
+            SELECT worker, COUNT(*) AS completed FROM worker_history
+            WHERE status = 'Success' AND timestamp > now() - interval '1 hour'
+            GROUP BY worker
+        """)
+        throughput = {}
+        for row in self.helper_db.execute(throughput_sql):
+            worker_type = get_worker_type(row['worker'])
+            throughput[worker_type] = throughput.get(worker_type, 0) + row['completed']
+        return throughput
+
+    def get_github_budget(self):
+        """ Requests left across every GitHub key before their rate limits reset, from the budgets the
+        workers share in worker_key_budget. Keys whose limit already reset count with their full capacity.
+
+        :return: Integer, or None when no worker registered its keys yet
+        """
+        budget_sql = s.sql.text("""
+            SELECT COUNT(*) AS keys, SUM(CASE WHEN reset_at <= now() THEN capacity ELSE remaining END) AS remaining
+            FROM augur_operations.worker_key_budget
+            WHERE platform = 'github'
+        """)
+        budget = self.helper_db.execute(budget_sql).fetchone()
+        return int(budget['remaining']) if budget['keys'] else None
+
+    def next_port(self, worker_type):
+        """ Lowest port from the worker type's configured port on that no running or booting instance
+        of the type uses, so a new instance does not collide with instances that are still starting
+        """
+        taken = set(self._booting_ports.get(worker_type, []))
+        for worker_id in list(self.broker._getvalue().keys()):
+            if get_worker_type(worker_id) == worker_type:
+                taken.add(int(worker_id.split('.')[-1]))
+        port = int(self.config.get_value('Workers', worker_type)['port'])
+        while port in taken:
+            port += 1
+        return port
+
+    def scale(self):
+        instances = self.get_instances()
+        depths = self.task_queue.lengths()
+        throughput = self.get_throughput()
+        github_budget = None
+
+        for worker_type, bounds in self.worker_types.items():
+            now = time.time()
+            self._booting[worker_type] = [started for started in self._booting[worker_type]
+                if now - started < self.boot_seconds]
+            if not self._booting[worker_type]:
+                self._booting_ports[worker_type] = []
+            running = instances[worker_type]
+            current = len(running) + len(self._booting[worker_type])
+            backlog = sum(depths.get(worker_id, 0) for worker_id in running)
+
+            budget_cap = None
+            if bounds.get('rate_limited') == 'github':
+                github_budget = self.get_github_budget() if github_budget is None else github_budget
+                budget_cap = github_budget // self.requests_per_worker if github_budget is not None else None
+
+            desired = desired_instances(current, backlog, throughput.get(worker_type, 0),
+                int(bounds['min_workers']), int(bounds['max_workers']), self.target_drain_seconds, budget_cap)
+
+            logger.debug("{}: {} instances, {} queued tasks, {} completed in the last hour, wants {}".format(
+                worker_type, current, backlog, throughput.get(worker_type, 0), desired))
+
+            if desired > current:
+                self._surplus_since.pop(worker_type, None)
+                for _ in range(desired - current):
+                    logger.info("Scaling up {} to {} instances, {} tasks are queued".format(worker_type, desired, backlog))
+                    port = self.next_port(worker_type)
+                    self.start_worker(worker_name=worker_type, worker_port=port)
+                    self._booting[worker_type].append(now)
+                    self._booting_ports[worker_type].append(port)
+            elif desired < current and not self._booting[worker_type]:
+                # Only scale down once the type has had spare instances for a while, one instance at a time
+                surplus_since = self._surplus_since.setdefault(worker_type, now)
+                if now - surplus_since >= self.idle_seconds:
+                    self.drain(min(running, key=lambda worker_id: depths.get(worker_id, 0)))
+                    self._surplus_since[worker_type] = now
+            else:
+                self._surplus_since.pop(worker_type, None)
+
+    def drain(self, worker_id):
+        if not self.broker[worker_id].get('claim_tasks'):
+            logger.info("Not scaling down {}, it does not claim its own tasks so it cannot be drained".format(worker_id))
+            return
+        logger.info("Scaling down, draining {}".format(worker_id))
+        self.broker[worker_id]['status'] = 'Draining'
+        bump_version(self.broker_version)
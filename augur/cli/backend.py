@@ -13,6 +13,9 @@ from gunicorn.arbiter import Arbiter
 
 from augur.cli import initialize_logging, pass_config, pass_application
 from augur.housekeeper import Housekeeper
+from augur.autoscaler import Autoscaler
+from augur.task_queue import create_task_queue
+from augur.worker_registry import bump_version
 from augur.server import Server
 from augur.application import Application
 from augur.gunicorn import AugurGunicornApp
@@ -154,6 +157,8 @@ def initialize_components(augur_app, disable_housekeeper):
     manager = None
     broker = None
     housekeeper = None
+    task_queue = None
+    broker_version = None
     worker_processes = []
     mp.set_start_method('forkserver', force=True)
 
@@ -161,7 +166,10 @@ def initialize_components(augur_app, disable_housekeeper):
 
         manager = mp.Manager()
         broker = manager.dict()
-        housekeeper = Housekeeper(broker=broker, augur_app=augur_app)
+        broker_version = manager.Value('u', None)
+        bump_version(broker_version)
+        task_queue = create_task_queue(augur_app)
+        housekeeper = Housekeeper(broker=broker, augur_app=augur_app, manager=manager)
 
         controller = augur_app.config.get_section('Workers')
         for worker in controller.keys():
@@ -172,9 +180,19 @@ def initialize_components(augur_app, disable_housekeeper):
                     worker_processes.append(worker_process)
                     worker_process.start()
 
+        if augur_app.config.get_value('Autoscaler', 'switch'):
+            def start_worker(worker_name, worker_port):
+                worker_process = mp.Process(target=worker_start, name=f"{worker_name}_{len(worker_processes)}", kwargs={'worker_name': worker_name, 'worker_port': worker_port}, daemon=True)
+                worker_processes.append(worker_process)
+                worker_process.start()
+
+            Autoscaler(augur_app, broker, broker_version, task_queue, start_worker).start()
+
     augur_app.manager = manager
     augur_app.broker = broker
     augur_app.housekeeper = housekeeper
+    augur_app.task_queue = task_queue
+    augur_app.broker_version = broker_version
 
     atexit._clear()
     atexit.register(exit, augur_app, worker_processes, master)
@@ -184,7 +202,9 @@ def worker_start(worker_name=None, instance_number=0, worker_port=None):
     try:
         time.sleep(30 * instance_number)
         destination = subprocess.DEVNULL
-        process = subprocess.Popen("cd workers/{} && {}_start".format(worker_name,worker_name), shell=True, stdout=destination, stderr=subprocess.STDOUT)
+        # The worker probes for a free port starting at the one it is given
+        environment = dict(os.environ, AUGUR_WORKER_PORT=str(worker_port)) if worker_port is not None else None
+        process = subprocess.Popen("cd workers/{} && {}_start".format(worker_name,worker_name), shell=True, stdout=destination, stderr=subprocess.STDOUT, env=environment)
         logger.info("{} #{} booted.".format(worker_name,instance_number+1))
     except KeyboardInterrupt as e:
         pass
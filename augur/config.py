@@ -57,6 +57,13 @@ default_config = {
             "gitlab_api_key":"gitlab_api_key"
         },
         "Housekeeper": {
+            "submission_batch_size": 500,
+            "max_queue_depth": 1000,
+            "freshness": {
+                "min_interval": 3600,
+                "max_interval": 604800,
+                "smoothing": 0.3
+            },
             "update_redirects": {
                 "switch": 0,
                 "repo_group_id": 0
@@ -264,7 +271,11 @@ default_config = {
                     "port": facade_worker_p,
                     "repo_directory": "repos/",
                     "switch": 1,
-                    "workers": 1
+                    "workers": 1,
+                    "autoscale": {
+                        "min_workers": 1,
+                        "max_workers": 3
+                    }
                 },
                 "github_worker": {
                     "port": github_worker_p,
@@ -295,7 +306,12 @@ default_config = {
                 "pull_request_worker": {
                     "port": pull_request_worker_p,
                     "switch": 1,
-                    "workers": 1
+                    "workers": 1,
+                    "autoscale": {
+                        "min_workers": 1,
+                        "max_workers": 4,
+                        "rate_limited": "github"
+                    }
                 },
                 "repo_info_worker": {
                     "port": repo_info_worker_p,
@@ -387,10 +403,30 @@ default_config = {
             "host": "0.0.0.0",
             "port": main_port,
             "workers": 6,
+            "threads": 4,
             "timeout": 6000,
             "ssl": False,
             "ssl_cert_file": None, 
-            "ssl_key_file": None 
+            "ssl_key_file": None
+        },
+        "Broker": {
+            "queue_backend": "postgres",
+            "lease_seconds": 1800,
+            "lease_renew_interval": 300,
+            "max_attempts": 5,
+            "retry_delay": 60,
+            "max_retry_delay": 3600,
+            "claim_tasks": 1,
+            "claim_timeout": 20,
+            "claim_batch_size": 1
+        },
+        "Autoscaler": {
+            "switch": 0,
+            "interval": 60,
+            "target_drain_seconds": 3600,
+            "idle_seconds": 1800,
+            "boot_seconds": 300,
+            "requests_per_worker": 1000
         },
         "Frontend": {
             "host": "0.0.0.0",
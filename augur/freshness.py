@@ -0,0 +1,184 @@
+#SPDX-License-Identifier: MIT
+"""
+Tracks how often the data of every repo changes so the housekeeper only collects it when it is due
+"""
+import heapq
+import logging
+import time
+
+import sqlalchemy as s
+
+logger = logging.getLogger(__name__)
+
+class FreshnessPolicy():
+    """
+    Turns the observed change rate of a (repo, model) pair into the time until its next collection
+
+    The change rate is an exponential moving average of whether each collection found new or
+    updated data, so it ranges from 0 (never changes) to 1 (changes every time). Repos that
+    change on every collection are polled every `min_interval` seconds, repos that never change
+    every `max_interval` seconds, and the interval falls off quadratically in between.
+    """
+
+    def __init__(self, min_interval=3600, max_interval=604800, smoothing=0.3, retry_interval=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.retry_interval = min_interval if retry_interval is None else retry_interval
+
+    @classmethod
+    def from_config(cls, freshness_config, job={}):
+        """ Builds the policy for a housekeeper job, jobs can override the intervals of the Housekeeper section
+        """
+        return cls(
+            min_interval=int(job.get('min_interval', freshness_config['min_interval'])),
+            max_interval=int(job.get('max_interval', freshness_config['max_interval'])),
+            smoothing=float(freshness_config['smoothing'])
+        )
+
+    def update_change_rate(self, change_rate, changed):
+        """ Folds the result of one collection into the change rate, None means nothing was observed yet
+        """
+        observation = 1.0 if changed else 0.0
+        if change_rate is None:
+            return observation
+        return (1 - self.smoothing) * change_rate + self.smoothing * observation
+
+    def interval(self, change_rate):
+        """ Seconds to wait before collecting data that changes at the given rate again
+        """
+        if change_rate is None:
+            return self.min_interval
+        change_rate = min(max(change_rate, 0.0), 1.0)
+        return self.min_interval + (self.max_interval - self.min_interval) * (1 - change_rate) ** 2
+
+class FreshnessSchedule():
+    """
+    Min-heap of the next due time of every repo in a housekeeper job
+
+    Repos without a due time (never collected) are due right away, in the order they were added.
+    """
+
+    def __init__(self, next_due_times):
+        """
+        :param next_due_times: List of (repo_id, next_due) tuples, next_due is a unix timestamp or None
+        """
+        self._heap = [(next_due or 0, order, repo_id) for order, (repo_id, next_due) in enumerate(next_due_times)]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def pop_due(self, now=None):
+        """ Removes and returns the ids of every repo that is due, most overdue first
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def next_due(self):
+        """ Unix timestamp of the next repo that becomes due, None if the schedule is empty
+        """
+        return self._heap[0][0] if self._heap else None
+
+class FreshnessStore():
+    """
+    Reads and writes the augur_operations.repo_freshness table
+    """
+
+    def __init__(self, engine):
+        self.db = engine
+
+    def next_due_times(self, job_model, repo_ids):
+        """ Next due time of each of the given repos for a model, in the order of repo_ids
+
+        :return: List of (repo_id, next_due) tuples, next_due is None for repos that were never scheduled
+        """
+        next_due_sql = s.sql.text("""
+            SELECT repo_id, EXTRACT(EPOCH FROM next_due) AS next_due
+            FROM repo_freshness
+            WHERE job_model = :job_model AND repo_id = ANY(CAST(:repo_ids AS int8[]))
+        """)
+        next_due = {
+            row['repo_id']: row['next_due']
+            for row in self.db.execute(next_due_sql, job_model=job_model, repo_ids=list(repo_ids))
+        }
+        return [(repo_id, float(next_due[repo_id]) if next_due.get(repo_id) is not None else None) for repo_id in repo_ids]
+
+    def mark_scheduled(self, job_model, repo_ids, hold_seconds):
+        """ Records that tasks were sent for these repos, and holds them back until their results arrive
+
+        :param hold_seconds: Seconds until the repos are due again if their tasks never complete
+        """
+        if not repo_ids:
+            return
+        schedule_sql = s.sql.text("""
+            INSERT INTO repo_freshness (repo_id, job_model, last_scheduled, next_due)
+            SELECT repo_id, :job_model, now(), now() + make_interval(secs => :hold_seconds)
+            FROM unnest(CAST(:repo_ids AS int8[])) AS repo_id
+            ON CONFLICT (repo_id, job_model) DO UPDATE
+            SET last_scheduled = EXCLUDED.last_scheduled, next_due = EXCLUDED.next_due
+        """)
+        self.db.execute(schedule_sql, job_model=job_model, repo_ids=list(repo_ids), hold_seconds=hold_seconds)
+
+    def record_success(self, repo_id, job_model, changed, policy, upstream_updated_at=None):
+        """ Updates the change rate of a (repo, model) pair after a completed collection and schedules the next one
+
+        :param changed: Boolean, whether the collection inserted or updated any rows
+        :param upstream_updated_at: String, newest update time of the data the worker collected, if it
+            collects incrementally
+        """
+        previous_sql = s.sql.text("""
+            SELECT change_rate, upstream_updated_at < CAST(:upstream_updated_at AS timestamptz) AS upstream_moved
+            FROM repo_freshness
+            WHERE repo_id = :repo_id AND job_model = :job_model
+        """)
+        previous = self.db.execute(previous_sql, repo_id=repo_id, job_model=job_model,
+            upstream_updated_at=upstream_updated_at).fetchone()
+
+        # Newer upstream data is a change even if the worker did not write anything new
+        if previous is not None and previous['upstream_moved']:
+            changed = True
+
+        change_rate = policy.update_change_rate(previous['change_rate'] if previous is not None else None, changed)
+
+        success_sql = s.sql.text("""
+            INSERT INTO repo_freshness (repo_id, job_model, last_success, upstream_updated_at, change_rate, next_due)
+            VALUES (:repo_id, :job_model, now(), CAST(:upstream_updated_at AS timestamptz),
+                :change_rate, now() + make_interval(secs => :interval))
+            ON CONFLICT (repo_id, job_model) DO UPDATE
+            SET last_success = EXCLUDED.last_success,
+                upstream_updated_at = COALESCE(EXCLUDED.upstream_updated_at, repo_freshness.upstream_updated_at),
+                change_rate = EXCLUDED.change_rate,
+                next_due = EXCLUDED.next_due
+        """)
+        self.db.execute(success_sql, repo_id=repo_id, job_model=job_model, upstream_updated_at=upstream_updated_at,
+            change_rate=change_rate, interval=policy.interval(change_rate))
+        return change_rate
+
+    def mark_retry(self, job_model, repo_ids, retry_seconds):
+        """ Makes repos whose tasks the broker did not accept due again after the retry interval
+        """
+        if not repo_ids:
+            return
+        retry_sql = s.sql.text("""
+            INSERT INTO repo_freshness (repo_id, job_model, next_due)
+            SELECT repo_id, :job_model, now() + make_interval(secs => :retry_seconds)
+            FROM unnest(CAST(:repo_ids AS int8[])) AS repo_id
+            ON CONFLICT (repo_id, job_model) DO UPDATE
+            SET next_due = EXCLUDED.next_due
+        """)
+        self.db.execute(retry_sql, job_model=job_model, repo_ids=list(repo_ids), retry_seconds=retry_seconds)
+
+    def record_failure(self, repo_id, job_model, policy):
+        """ Makes a (repo, model) pair due again after the retry interval, without touching its change rate
+        """
+        failure_sql = s.sql.text("""
+            INSERT INTO repo_freshness (repo_id, job_model, next_due)
+            VALUES (:repo_id, :job_model, now() + make_interval(secs => :interval))
+            ON CONFLICT (repo_id, job_model) DO UPDATE
+            SET next_due = EXCLUDED.next_due
+        """)
+        self.db.execute(failure_sql, repo_id=repo_id, job_model=job_model, interval=policy.retry_interval)
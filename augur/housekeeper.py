@@ -13,6 +13,7 @@ import pandas as pd
 from sqlalchemy import MetaData
 
 from augur.logging import AugurLogging
+from augur.scheduler import run_scheduler
 from urllib.parse import urlparse
 
 import warnings
@@ -22,7 +23,7 @@ logger = logging.getLogger(__name__)
 
 class Housekeeper:
 
-    def __init__(self, broker, augur_app):
+    def __init__(self, broker, augur_app, manager):
         logger.info("Booting housekeeper")
 
         self._processes = []
@@ -32,9 +33,21 @@ class Housekeeper:
         self.broker_host = augur_app.config.get_value("Server", "host")
         self.broker_port = augur_app.config.get_value("Server", "port")
         self.broker = broker
+        # Set by the broker on every HELLO message to wake jobs waiting for a compatible worker
+        self.worker_registered = manager.Event()
+        # State and next run time of every job, published by the scheduler
+        self.status = manager.dict()
+        self.submission = {
+            'batch_size': int(augur_app.config.get_value("Housekeeper", "submission_batch_size")),
+            'max_queue_depth': int(augur_app.config.get_value("Housekeeper", "max_queue_depth"))
+        }
 
         self.db = augur_app.database
         self.helper_db = augur_app.operations_database
+        self.freshness = {
+            'config': augur_app.config.get_value("Housekeeper", "freshness"),
+            'database_url': str(self.helper_db.url)
+        }
 
         helper_metadata = MetaData()
         helper_metadata.reflect(self.helper_db, only=['worker_job'])
@@ -57,101 +70,14 @@ class Housekeeper:
 
     def schedule_updates(self):
         """
-        Starts update processes
+        Starts the scheduler process that sends the tasks of every job
         """
         self.prep_jobs()
         self.augur_logging.initialize_housekeeper_logging_listener()
-        logger.info("Scheduling update processes")
-        for job in self.jobs:
-            process = Process(target=self.updater_process, name=job["model"], args=(self.broker_host, self.broker_port, self.broker, job, (self.augur_logging.housekeeper_job_config, self.augur_logging.get_config())))
-            self._processes.append(process)
-            process.start()
-
-
-    @staticmethod
-    def updater_process(broker_host, broker_port, broker, job, logging_config):
-        """
-        Controls a given plugin's update process
-
-        """
-        logging.config.dictConfig(logging_config[0])
-        logger = logging.getLogger(f"augur.jobs.{job['model']}")
-        coloredlogs.install(level=logging_config[1]["log_level"], logger=logger, fmt=logging_config[1]["format_string"])
-
-        if logging_config[1]["quiet"]:
-            logger.disabled
-
-        if 'repo_group_id' in job:
-            repo_group_id = job['repo_group_id']
-            logger.info('Housekeeper spawned {} model updater process for repo group id {}'.format(job['model'], repo_group_id))
-        else:
-            repo_group_id = None
-            logger.info('Housekeeper spawned {} model updater process for repo ids {}'.format(job['model'], job['repo_ids']))
-
-        try:
-            compatible_worker_found = False
-            # Waiting for compatible worker
-            while True:
-                if not compatible_worker_found:
-                    for worker in list(broker._getvalue().keys()):
-                        if job['model'] in broker[worker]['models'] and job['given'] in broker[worker]['given']:
-                            compatible_worker_found = True
-                    time.sleep(10)
-                    continue
-
-                logger.info("Housekeeper recognized that the broker has a worker that " + 
-                    "can handle the {} model... beginning to distribute maintained tasks".format(job['model']))
-                while True:
-                    logger.info('Housekeeper updating {} model with given {}...'.format(
-                        job['model'], job['given'][0]))
-                    
-                    if job['given'][0] == 'git_url' or job['given'][0] == 'github_url':
-                        for repo in job['repos']:
-                            if job['given'][0] == 'github_url' and 'github.com' not in repo['repo_git']:
-                                continue
-                            given_key = 'git_url' if job['given'][0] == 'git_url' else 'github_url'
-                            task = {
-                                "job_type": job['job_type'] if 'job_type' in job else 'MAINTAIN', 
-                                "models": [job['model']], 
-                                "display_name": "{} model for url: {}".format(job['model'], repo['repo_git']),
-                                "given": {}
-                            }
-                            task['given'][given_key] = repo['repo_git']
-                            if "focused_task" in repo:
-                                task["focused_task"] = repo['focused_task']
-                            try:
-                                requests.post('http://{}:{}/api/unstable/task'.format(
-                                    broker_host,broker_port), json=task, timeout=10)
-                            except Exception as e:
-                                logger.error("Error encountered: {}".format(e))
-
-                            logger.debug(task)
-
-                            time.sleep(10)
-
-                    elif job['given'][0] == 'repo_group':
-                        time.sleep(120)
-                        task = {
-                                "job_type": job['job_type'] if 'job_type' in job else 'MAINTAIN', 
-                                "models": [job['model']], 
-                                "display_name": "{} model for repo group id: {}".format(job['model'], repo_group_id),
-                                "given": {
-                                    "repo_group": job['repos']
-                                }
-                            }
-                        try:
-                            time.sleep(120)
-                            requests.post('http://{}:{}/api/unstable/task'.format(
-                                broker_host,broker_port), json=task, timeout=10)
-                            time.sleep(120)
-                        except Exception as e:
-                            logger.error("Error encountered: {}".format(e))
-
-                    logger.info("Housekeeper finished sending {} tasks to the broker for it to distribute to your worker(s)".format(len(job['repos'])))
-                    time.sleep(job['delay'])
-
-        except KeyboardInterrupt as e:
-            pass
+        logger.info("Scheduling updates")
+        process = Process(target=run_scheduler, name="housekeeper_scheduler", args=(self.jobs, self.broker, self.broker_host, self.broker_port, (self.augur_logging.housekeeper_job_config, self.augur_logging.get_config()), self.submission, self.freshness, self.worker_registered, self.status))
+        self._processes.append(process)
+        process.start()
 
     def join_updates(self):
         """
@@ -10,20 +10,32 @@ import requests
 import json
 from flask import request, Response
 
+from augur.freshness import FreshnessPolicy, FreshnessStore
+from augur.task_queue import empty_queue_summary
+from augur.worker_registry import broker_snapshot, bump_version
+
 logger = logging.getLogger(__name__)
 
+# Seconds between checks of an empty queue while a claim is waiting for tasks
+CLAIM_POLL_INTERVAL = 2
+
+# Most tasks a single page of a worker's queue holds
+MAX_QUEUE_PAGE_SIZE = 1000
+
 # TODO: not this...
 def worker_start(worker_name=None):
     process = subprocess.Popen("cd workers/{} && {}_start".format(worker_name,worker_name), shell=True)
 
-def send_task(worker_proxy):
+def send_task(server, worker_id):
 
     # Defining local variables for convenience/readability
-    user_queue = worker_proxy['user_queue']
-    maintain_queue = worker_proxy['maintain_queue']
-    worker_id = worker_proxy['id']
+    worker_proxy = server.broker[worker_id]
     task_endpoint = worker_proxy['location'] + '/AUGWOP/task'
 
+    # Workers in pull mode claim their own tasks
+    if worker_proxy.get('claim_tasks'):
+        return
+
     # Check if worker is alive
     r = requests.get('{}/AUGWOP/heartbeat'.format(
         worker_proxy['location']))
@@ -38,18 +50,14 @@ def send_task(worker_proxy):
         logger.info("Worker: {} is busy, setting its status as so.\n".format(worker_id))
         return
 
-    # Want to check user-created job requests first
-    if len(user_queue) > 0:
-        new_task = user_queue.pop(0)
-
-    # If no user-created job requests, move on to regulated/maintained ones
-    elif len(maintain_queue) > 0:
-        new_task = maintain_queue.pop(0)
-
-    else:
+    # User-created job requests are leased before regulated/maintained ones
+    tasks = server.task_queue.dequeue(worker_id)
+    if not tasks:
         logger.debug("Both queues are empty for worker {}\n".format(worker_id))
         worker_proxy['status'] = 'Idle'
         return
+    new_task = tasks[0]
+    server.worker_registry.adjust_depth(worker_id, -1)
 
     logger.info("Worker {} is idle, preparing to send the {} task to {}\n".format(worker_id, new_task['display_name'], task_endpoint))
     try:
@@ -58,61 +66,100 @@ def send_task(worker_proxy):
     except:
         logger.error("Sending Worker: {} a task did not return a response, setting worker status as 'Disconnected'\n".format(worker_id))
         worker_proxy['status'] = 'Disconnected'
+        # Put the task back so it is not lost with the worker
+        server.task_queue.release(new_task['task_id'])
         # If the worker died, then restart it
         worker_start(worker_id.split('.')[len(worker_id.split('.')) - 2])
 
+def announce_worker(server):
+    """ Lets the other server processes and the housekeeper know a worker registered
+    """
+    bump_version(server.broker_version)
+    if server.housekeeper is not None:
+        server.housekeeper.worker_registered.set()
+
+def route_task(server, task):
+    """ Picks the least loaded worker of every worker type that can fill a task
+
+    :return: Dict, maps worker types to the id of the worker the task should be queued for
+    """
+    given = list(task['given'].keys())
+    return server.worker_registry.route(task['models'][0], given)
+
+def finish_task(server, task, succeeded=True):
+    """ Removes a task a worker reported back on from the task queue, failed tasks are retried
+    until they use up their attempts
+
+    :return: String, 'retrying' if a failed task was queued again, otherwise 'done' or 'dead'
+    """
+    outcome = 'done' if succeeded else 'dead'
+    # Workers from before the task queue existed do not echo the task id back
+    if task.get('task_id') is not None:
+        if succeeded:
+            acked = server.task_queue.ack(task['task_id'])
+        else:
+            outcome = server.task_queue.fail(task['task_id'], task.get('error'))
+            acked = outcome is not None
+            outcome = outcome or 'dead'
+        if not acked:
+            logger.warning("Task {} was no longer leased when {} reported it back\n".format(task['task_id'], task['worker_id']))
+
+    server.worker_registry.set_depth(task['worker_id'], server.task_queue.length(task['worker_id']))
+    return outcome
+
+
+def record_freshness(server, task, succeeded):
+    """ Updates the freshness state of the (repo, model) pair a worker reported back on
+    """
+    job_model = task.get('job_model') or (task.get('models') or [None])[0]
+    if task.get('repo_id') is None or job_model is None:
+        return
+
+    policy = server.freshness_policies.get(job_model, server.freshness_policies[None])
+    try:
+        if succeeded:
+            server.freshness.record_success(task['repo_id'], job_model, task.get('changes', 1) > 0, policy,
+                upstream_updated_at=task.get('upstream_updated_at'))
+        else:
+            server.freshness.record_failure(task['repo_id'], job_model, policy)
+    except Exception as e:
+        logger.error("Could not record freshness of repo {} for model {}: {}\n".format(task['repo_id'], job_model, repr(e)))
 
 def create_routes(server):
 
+    freshness_config = server.augur_app.config.get_value('Housekeeper', 'freshness')
+    server.freshness = FreshnessStore(server.augur_app.operations_database)
+    server.freshness_policies = {job['model']: FreshnessPolicy.from_config(freshness_config, job)
+        for job in server.augur_app.config.get_value('Housekeeper', 'jobs')}
+    server.freshness_policies[None] = FreshnessPolicy.from_config(freshness_config)
+
     @server.app.route('/{}/task'.format(server.api_version), methods=['POST'])
     def task():
         """ AUGWOP route that is hit when data needs to be added to the database
         Retrieves a json consisting of task specifications that the broker will use to assign a worker
         """
         task = request.json
-
-        given = []
-        for given_component in list(task['given'].keys()):
-            given.append(given_component)
         model = task['models'][0]
-        logger.info("Broker recieved a new user task ... checking for compatible workers for given: " + str(given) + " and model(s): " + str(model) + "\n")
-
-        logger.debug("Broker's list of all workers: {}\n".format(server.broker._getvalue().keys()))
+        logger.info("Broker recieved a new user task ... checking for compatible workers for given: " + str(list(task['given'].keys())) + " and model(s): " + str(model) + "\n")
 
         worker_found = False
-        compatible_workers = {}
-
-        # For every worker the broker is aware of that can fill the task's given and model
-        for worker_id in [id for id in list(server.broker._getvalue().keys()) if model in server.broker[id]['models'] and given in server.broker[id]['given']]:
-            if type(server.broker[worker_id]._getvalue()) != dict:
-                continue
 
-            logger.debug("Considering compatible worker: {}\n".format(worker_id))
+        # Least loaded worker of every worker type that can fill the task's given and model
+        server.worker_registry.sync(server.broker, server.broker_version, server.task_queue)
+        compatible_workers = route_task(server, task)
 
-            # Group workers by type (all gh workers grouped together etc)
-            worker_type = worker_id.split('.')[len(worker_id.split('.'))-2]
-            compatible_workers[worker_type] = compatible_workers[worker_type] if worker_type in compatible_workers else {'task_load': len(server.broker[worker_id]['user_queue']) + len(server.broker[worker_id]['maintain_queue']), 'worker_id': worker_id}
-
-            # Make worker that is prioritized the one with the smallest sum of task queues
-            if (len(server.broker[worker_id]['user_queue']) + len(server.broker[worker_id]['maintain_queue'])) < min([compatible_workers[w]['task_load'] for w in compatible_workers.keys() if worker_type == w]):
-                logger.debug("Worker id: {} has the smallest task load encountered so far: {}\n".format(worker_id, len(server.broker[worker_id]['user_queue']) + len(server.broker[worker_id]['maintain_queue'])))
-                compatible_workers[worker_type]['task_load'] = len(server.broker[worker_id]['user_queue']) + len(server.broker[worker_id]['maintain_queue'])
-                compatible_workers[worker_type]['worker_id'] = worker_id
-
-        for worker_type in compatible_workers.keys():
-            worker_id = compatible_workers[worker_type]['worker_id']
+        for worker_type, worker_id in compatible_workers.items():
             worker = server.broker[worker_id]
-            logger.info("Final compatible worker chosen: {} with smallest task load: {} found to work on task: {}\n".format(worker_id, len(server.broker[worker_id]['user_queue']) + len(server.broker[worker_id]['maintain_queue']), task))
+            logger.info("Final compatible worker chosen: {} with smallest task load: {} found to work on task: {}\n".format(worker_id, server.worker_registry.depth(worker_id), task))
 
-            if task['job_type'] == "UPDATE":
-                worker['user_queue'].append(task)
-                logger.info("Added task for model: {}. New length of worker {}'s user queue: {}\n".format(model, worker_id, str(len(server.broker[worker_id]['user_queue']))))
-            elif task['job_type'] == "MAINTAIN":
-                worker['maintain_queue'].append(task)
-                logger.info("Added task for model: {}. New length of worker {}'s maintain queue: {}\n".format(model, worker_id, str(len(server.broker[worker_id]['maintain_queue']))))
+            if server.task_queue.enqueue(worker_id, task) is None:
+                logger.info("An identical {} task for model: {} is already queued for the {}s\n".format(task['job_type'], model, worker_type))
+            else:
+                server.worker_registry.set_depth(worker_id, server.task_queue.length(worker_id))
+                logger.info("Added {} task for model: {}. New length of worker {}'s queue: {}\n".format(task['job_type'], model, worker_id, server.worker_registry.depth(worker_id)))
 
             if worker['status'] == 'Idle':
-                send_task(worker)
+                send_task(server, worker_id)
             worker_found = True
         # Otherwise, let the frontend know that the request can't be served
         if not worker_found:
@@ -122,6 +169,54 @@ def create_routes(server):
                         status=200,
                         mimetype="application/json")
 
+    @server.app.route('/{}/tasks'.format(server.api_version), methods=['POST'])
+    def tasks():
+        """ AUGWOP route the housekeeper uses to submit a batch of tasks at once
+        Routes every task in the list and queues them all in one transaction, then reports
+        which tasks of the batch were accepted and the deepest queue the batch went to so the
+        sender can slow down
+        """
+        tasks = request.json
+        server.worker_registry.sync(server.broker, server.broker_version, server.task_queue)
+
+        routed = []
+        accepted = []
+        unroutable = 0
+        for position, task in enumerate(tasks):
+            compatible_workers = route_task(server, task)
+            if not compatible_workers:
+                unroutable += 1
+                continue
+            accepted.append(position)
+            for worker_id in compatible_workers.values():
+                routed.append((worker_id, task))
+                # Counted right away so the rest of the batch is spread over the other workers
+                server.worker_registry.adjust_depth(worker_id, 1)
+
+        # Tasks that are already waiting in a queue of the same worker type are coalesced
+        queued = server.task_queue.enqueue_many(routed)
+        server.worker_registry.refresh_depths(server.task_queue)
+
+        worker_ids = set(worker_id for worker_id, _ in routed)
+        for worker_id in worker_ids:
+            if server.broker[worker_id]['status'] == 'Idle':
+                send_task(server, worker_id)
+
+        logger.info("Broker queued {} tasks for {} workers from a batch of {}, {} were already queued\n".format(
+            queued, len(worker_ids), len(tasks), len(routed) - queued))
+        if unroutable:
+            logger.warning("Augur does not have knowledge of any workers that are capable of handing {} tasks of the batch\n".format(unroutable))
+
+        return Response(response=json.dumps({
+                            'queued': queued,
+                            'coalesced': len(routed) - queued,
+                            'unroutable': unroutable,
+                            'accepted': accepted,
+                            'queue_depth': max([server.worker_registry.depth(worker_id) for worker_id in worker_ids], default=0)
+                        }),
+                        status=200,
+                        mimetype="application/json")
+
     @server.app.route('/{}/workers'.format(server.api_version), methods=['POST'])
     def worker():
         """ AUGWOP route responsible for interpreting HELLO messages
@@ -133,8 +228,6 @@ def create_routes(server):
         if worker['id'] not in server.broker:
             server.broker[worker['id']] = server.manager.dict()
             server.broker[worker['id']]['id'] = worker['id']
-            server.broker[worker['id']]['user_queue'] = server.manager.list()
-            server.broker[worker['id']]['maintain_queue'] = server.manager.list()
             server.broker[worker['id']]['given'] = server.manager.list()
             server.broker[worker['id']]['models'] = server.manager.list()
             for given in worker['qualifications'][0]['given']:
@@ -143,34 +236,143 @@ def create_routes(server):
                 server.broker[worker['id']]['models'].append(model)
             server.broker[worker['id']]['status'] = 'Idle'
             server.broker[worker['id']]['location'] = worker['location']
+            server.broker[worker['id']]['claim_tasks'] = worker.get('claim_tasks', False)
+            announce_worker(server)
+            # Tasks queued for this worker before a restart of augur are picked up right away
+            if server.task_queue.length(worker['id']) > 0:
+                send_task(server, worker['id'])
         else:
             logger.info("Worker: {} has been reconnected.\n".format(worker['id']))
-            models = server.broker[worker['id']]['models']
-            givens = server.broker[worker['id']]['given']
-            user_queue = server.broker[worker['id']]['user_queue']
-            maintain_queue = server.broker[worker['id']]['maintain_queue']
+            server.broker[worker['id']]['claim_tasks'] = worker.get('claim_tasks', False)
 
             time.sleep(10)
             server.broker[worker['id']]['status'] = 'Idle'
-            send_task(server.broker[worker['id']])
+            announce_worker(server)
+            send_task(server, worker['id'])
 
         return Response(response=worker['id'],
                         status=200,
                         mimetype="application/json")
 
+    @server.app.route('/{}/tasks/claim'.format(server.api_version), methods=['POST'])
+    def claim_tasks():
+        """ AUGWOP route that workers in pull mode long-poll for their next tasks
+        Leases up to max_tasks tasks from the worker's queue, waiting at most the requested
+        timeout (capped by Broker:claim_timeout) for one to arrive
+        """
+        claim = request.json
+        worker_id = claim['worker_id']
+
+        if worker_id not in server.broker:
+            logger.warning("Worker {} tried to claim tasks before sending a HELLO message\n".format(worker_id))
+            return Response(response=json.dumps({'error': 'Unknown worker: {}'.format(worker_id)}),
+                            status=404,
+                            mimetype="application/json")
+
+        max_timeout = int(server.augur_app.config.get_value('Broker', 'claim_timeout'))
+        deadline = time.time() + min(float(claim.get('timeout', max_timeout)), max_timeout)
+        max_tasks = max(int(claim.get('max_tasks', 1)), 1)
+
+        tasks = server.task_queue.dequeue(worker_id, limit=max_tasks)
+
+        # Workers the autoscaler is draining get the rest of their queue, then are told to stop
+        if server.broker[worker_id]['status'] == 'Draining':
+            if tasks:
+                server.worker_registry.adjust_depth(worker_id, -len(tasks))
+                logger.info("Draining worker {} claimed {} tasks\n".format(worker_id, len(tasks)))
+                return Response(response=json.dumps({'tasks': tasks}),
+                                status=200,
+                                mimetype="application/json")
+            logger.info("Worker {} is drained, telling it to stop\n".format(worker_id))
+            return Response(response=json.dumps({'tasks': [], 'stop': True}),
+                            status=200,
+                            mimetype="application/json")
+
+        while not tasks and time.time() < deadline:
+            time.sleep(min(CLAIM_POLL_INTERVAL, max(deadline - time.time(), 0)))
+            tasks = server.task_queue.dequeue(worker_id, limit=max_tasks)
+
+        if tasks:
+            server.worker_registry.adjust_depth(worker_id, -len(tasks))
+            logger.info("Worker {} claimed {} tasks: {}\n".format(worker_id, len(tasks), [task['display_name'] for task in tasks]))
+            server.broker[worker_id]['status'] = 'Working'
+        elif not claim.get('busy', False):
+            server.broker[worker_id]['status'] = 'Idle'
+
+        return Response(response=json.dumps({'tasks': tasks}),
+                        status=200,
+                        mimetype="application/json")
+
+    @server.app.route('/{}/tasks/renew'.format(server.api_version), methods=['POST'])
+    def renew_task():
+        """ AUGWOP route workers hit periodically while they work on a task, so its lease does not expire
+        """
+        renewal = request.json
+        renewed = server.task_queue.renew(renewal['task_id'])
+        if not renewed:
+            logger.warning("Worker {} renewed task {}, which is no longer leased\n".format(renewal.get('worker_id'), renewal['task_id']))
+        return Response(response=json.dumps({'renewed': renewed}),
+                        status=200,
+                        mimetype="application/json")
+
+    @server.app.route('/{}/tasks/dead_letter'.format(server.api_version), methods=['GET'])
+    def get_dead_letters():
+        """ One page of the tasks that failed on every attempt, most recent first
+        """
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 100)), 1), MAX_QUEUE_PAGE_SIZE)
+        except ValueError:
+            return Response(response=json.dumps({'error': 'offset and limit must be integers'}),
+                            status=400,
+                            mimetype="application/json")
+
+        return Response(response=json.dumps({
+                            'offset': offset,
+                            'limit': limit,
+                            'tasks': server.task_queue.dead_letters(offset=offset, limit=limit)
+                        }),
+                        status=200,
+                        mimetype="application/json")
+
+    @server.app.route('/{}/tasks/dead_letter/requeue'.format(server.api_version), methods=['POST'])
+    def requeue_dead_letters():
+        """ Routes tasks from the dead letter queue to the current workers again, with fresh attempts
+        """
+        dead_letters = server.task_queue.dead_letters(task_ids=request.json.get('task_ids', []))
+
+        server.worker_registry.sync(server.broker, server.broker_version, server.task_queue)
+        routes = {}
+        unroutable = []
+        for dead_letter in dead_letters:
+            compatible_workers = route_task(server, dead_letter['task'])
+            if not compatible_workers:
+                # Left in the dead letter queue until a compatible worker is running
+                unroutable.append(dead_letter['task_id'])
+                continue
+            routes[dead_letter['task_id']] = list(compatible_workers.values())
+
+        # Tasks leave the dead letter queue in the same transaction that queues them
+        queued = server.task_queue.requeue_dead_letters(routes)
+        server.worker_registry.refresh_depths(server.task_queue)
+
+        if unroutable:
+            logger.warning("Augur does not have knowledge of any workers that are capable of handing {} requeued tasks\n".format(len(unroutable)))
+
+        return Response(response=json.dumps({'found': len(dead_letters), 'queued': queued, 'unroutable': unroutable}),
+                        status=200,
+                        mimetype="application/json")
+
     @server.app.route('/{}/completed_task'.format(server.api_version), methods=['POST'])
     def sync_queue():
         task = request.json
         worker = task['worker_id']
         logger.info("Message recieved that worker {} completed task: {}\n".format(worker,task))
+        finish_task(server, task)
+        record_freshness(server, task, succeeded=True)
         try:
-            models = server.broker[worker]['models']
-            givens = server.broker[worker]['given']
-            user_queue = server.broker[worker]['user_queue']
-            maintain_queue = server.broker[worker]['maintain_queue']
-
             if server.broker[worker]['status'] != 'Disconnected':
-                send_task(server.broker[worker])
+                send_task(server, worker)
         except Exception as e:
             logger.error("Ran into error: {}\n".format(repr(e)))
             logger.error("A past instance of the {} worker finished a previous leftover task.\n".format(worker))
@@ -181,29 +383,102 @@ def create_routes(server):
 
     @server.app.route('/{}/workers/status'.format(server.api_version), methods=['GET'])
     def get_status():
+        """ Every worker with its queue depths and the first page of each of its queues, further
+        pages come from /workers/<worker_id>/queue
+        """
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 100)), 1), MAX_QUEUE_PAGE_SIZE)
+        except ValueError:
+            return Response(response=json.dumps({'error': 'offset and limit must be integers'}),
+                            status=400,
+                            mimetype="application/json")
+
         all_workers_status = []
-        for worker in server.broker.items():
+        for full_worker_id, worker in broker_snapshot(server.broker).items():
             status = {}
-            worker_id = ".".join(worker[0].split('.')[1:])
+            worker_id = ".".join(full_worker_id.split('.')[1:])
             status[worker_id] = {}
-            status[worker_id]['id'] = worker[1]['id']
-            status[worker_id]['user_queue'] = [repo for repo in worker[1]['user_queue']]
-            status[worker_id]['maintain_queue'] = [repo for repo in worker[1]['maintain_queue']]
-            status[worker_id]['given'] = [given for given in worker[1]['given']]
-            status[worker_id]['models'] = [model for model in worker[1]['models']]
-            status[worker_id]['status'] = worker[1]['status']
-            status[worker_id]['location'] = worker[1]['location']
+            status[worker_id]['id'] = worker['id']
+            status[worker_id]['user_queue'] = server.task_queue.list_tasks(full_worker_id, job_type='UPDATE', offset=offset, limit=limit)
+            status[worker_id]['user_queue_length'] = server.task_queue.length(full_worker_id, job_type='UPDATE')
+            status[worker_id]['maintain_queue'] = server.task_queue.list_tasks(full_worker_id, job_type='MAINTAIN', offset=offset, limit=limit)
+            status[worker_id]['maintain_queue_length'] = server.task_queue.length(full_worker_id, job_type='MAINTAIN')
+            status[worker_id]['given'] = worker['given']
+            status[worker_id]['models'] = worker['models']
+            status[worker_id]['status'] = worker['status']
+            status[worker_id]['location'] = worker['location']
             all_workers_status.append(status)
 
         return Response(response=json.dumps(all_workers_status),
                         status=200,
                         mimetype="application/json")
 
+    @server.app.route('/{}/workers/status/summary'.format(server.api_version), methods=['GET'])
+    def get_status_summary():
+        """ Task counts, oldest task age and recent throughput of every worker, without listing any queue
+        """
+        queues = server.task_queue.summary()
+        finished_5 = server.task_queue.throughput(5)
+        finished_60 = server.task_queue.throughput(60)
+
+        workers = {}
+        for worker_id, worker in broker_snapshot(server.broker).items():
+            queue = queues.get(worker_id, empty_queue_summary())
+            workers[worker_id] = {
+                'status': worker.get('status'),
+                'location': worker.get('location'),
+                'models': worker['models'],
+                'queued': queue['queued'],
+                'leased': queue['leased'],
+                'queued_per_model': queue['models'],
+                'oldest_task_age': queue['oldest_task_age'],
+                'finished_last_5_minutes': finished_5.get(worker_id, 0),
+                'finished_last_60_minutes': finished_60.get(worker_id, 0)
+            }
+
+        summary = {
+            'queued': sum(queue['queued'] for queue in queues.values()),
+            'leased': sum(queue['leased'] for queue in queues.values()),
+            'finished_last_5_minutes': sum(finished_5.values()),
+            'finished_last_60_minutes': sum(finished_60.values()),
+            'workers': workers
+        }
+        return Response(response=json.dumps(summary),
+                        status=200,
+                        mimetype="application/json")
+
+    @server.app.route('/{}/workers/<worker_id>/queue'.format(server.api_version), methods=['GET'])
+    def get_worker_queue(worker_id):
+        """ One page of the tasks waiting for a worker, in the order they will be handed out
+        """
+        try:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', 100)), 1), MAX_QUEUE_PAGE_SIZE)
+        except ValueError:
+            return Response(response=json.dumps({'error': 'offset and limit must be integers'}),
+                            status=400,
+                            mimetype="application/json")
+        job_type = request.args.get('job_type')
+
+        tasks = server.task_queue.list_tasks(worker_id, job_type=job_type, offset=offset, limit=limit)
+        page = {
+            'worker_id': worker_id,
+            'total': server.task_queue.length(worker_id, job_type=job_type),
+            'offset': offset,
+            'limit': limit,
+            'tasks': tasks
+        }
+        return Response(response=json.dumps(page),
+                        status=200,
+                        mimetype="application/json")
+
     @server.app.route('/{}/workers/remove'.format(server.api_version), methods=['POST'])
     def remove_worker():
         worker = request.json
         logger.info("Recieved a message to disconnect worker: {}\n".format(worker))
         server.broker[worker['id']]['status'] = 'Disconnected'
+        bump_version(server.broker_version)
         return Response(response=worker,
                         status=200,
                         mimetype="application/json")
@@ -213,10 +488,15 @@ def create_routes(server):
         task = request.json
         worker_id = task['worker_id']
         # logger.error("Recieved a message that {} ran into an error on task: {}\n".format(worker_id, task))
+        if finish_task(server, task, succeeded=False) == 'retrying':
+            logger.info("Task {} will be retried after a backoff\n".format(task.get('task_id')))
+        else:
+            # The repo waits for its next scheduled collection only once the task gave up
+            record_freshness(server, task, succeeded=False)
         if worker_id in server.broker:
             if server.broker[worker_id]['status'] != 'Disconnected':
                 logger.error("{} ran into error while completing task: {}\n".format(worker_id, task))
-                send_task(server.broker[worker_id])
+                send_task(server, worker_id)
         else:
             logger.error("A previous instance of {} ran into error while completing task: {}\n".format(worker_id, task))
         return Response(response=request.json,
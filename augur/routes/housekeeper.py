@@ -0,0 +1,30 @@
+#SPDX-License-Identifier: MIT
+"""
+Creates routes for inspecting the housekeeper
+"""
+import datetime
+import json
+from flask import Response
+
+def create_routes(server):
+
+    @server.app.route('/{}/housekeeper/jobs'.format(server.api_version), methods=['GET'])
+    def get_housekeeper_jobs():
+        """ State, last run and next run time of every housekeeper job
+        """
+        if server.housekeeper is None:
+            return Response(response=json.dumps({'error': 'The housekeeper is disabled'}),
+                            status=404,
+                            mimetype="application/json")
+
+        jobs = []
+        for name, job_status in server.housekeeper.status.items():
+            job_status = dict(job_status, name=name)
+            for key in ['last_run', 'next_run']:
+                if job_status.get(key) is not None:
+                    job_status[key] = datetime.datetime.fromtimestamp(job_status[key], datetime.timezone.utc).isoformat()
+            jobs.append(job_status)
+
+        return Response(response=json.dumps(sorted(jobs, key=lambda job: job['name'])),
+                        status=200,
+                        mimetype="application/json")
@@ -0,0 +1,235 @@
+#SPDX-License-Identifier: MIT
+"""
+Drives the timers of every housekeeper job from a single asyncio event loop
+"""
+import asyncio
+import logging
+import logging.config
+import threading
+import time
+
+import coloredlogs
+import requests
+import sqlalchemy as s
+
+from augur.freshness import FreshnessPolicy, FreshnessSchedule, FreshnessStore
+
+logger = logging.getLogger(__name__)
+
+def get_job_names(jobs):
+    """ Unique name of every job, models that appear in more than one job get their position appended
+    """
+    models = [job['model'] for job in jobs]
+    return [model if models.count(model) == 1 else "{}#{}".format(model, index)
+        for index, model in enumerate(models)]
+
+def run_scheduler(jobs, broker, broker_host, broker_port, logging_config, submission, freshness,
+        worker_registered, status):
+    """
+    Entry point of the housekeeper's scheduler process
+    """
+    logging.config.dictConfig(logging_config[0])
+    coloredlogs.install(level=logging_config[1]["log_level"], logger=logger, fmt=logging_config[1]["format_string"])
+
+    scheduler = HousekeeperScheduler(jobs, broker, broker_host, broker_port, submission, freshness,
+        worker_registered, status, logging_config)
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        pass
+
+class HousekeeperScheduler():
+    """
+    Sends the tasks of every housekeeper job to the broker when they are due
+
+    Every job is a coroutine on one event loop. Jobs that have no compatible worker yet
+    sleep until a worker sends its HELLO message to the broker, which sets the shared
+    `worker_registered` event. The state and next run time of every job is published
+    in the shared `status` dict for the /housekeeper/jobs route.
+    """
+
+    def __init__(self, jobs, broker, broker_host, broker_port, submission, freshness, worker_registered,
+            status, logging_config):
+        self.jobs = jobs
+        self.job_names = get_job_names(jobs)
+        self.broker = broker
+        self.broker_host = broker_host
+        self.broker_port = broker_port
+        self.submission = submission
+        self.freshness = freshness
+        self.worker_registered = worker_registered
+        self.status = status
+        self.logging_config = logging_config
+
+        self._capabilities = set() # (model, given) pairs the registered workers can fill
+        self._registration = None
+        self._loop = None
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._registration = asyncio.Event()
+        self.freshness_store = FreshnessStore(s.create_engine(self.freshness['database_url'],
+            poolclass=s.pool.NullPool, connect_args={'options': '-csearch_path=augur_operations'}))
+
+        await self.blocking(self.refresh_capabilities)
+        threading.Thread(target=self.watch_registrations, daemon=True).start()
+
+        await asyncio.gather(*[self.run_job(name, job) for name, job in zip(self.job_names, self.jobs)])
+
+    async def blocking(self, function, *args):
+        """ Runs blocking I/O on the default executor so the other jobs keep going
+        """
+        return await self._loop.run_in_executor(None, function, *args)
+
+    def watch_registrations(self):
+        """ Waits on the shared event in a thread and wakes the jobs waiting for a compatible worker
+        """
+        while True:
+            self.worker_registered.wait()
+            self.worker_registered.clear()
+            self.refresh_capabilities()
+            self._loop.call_soon_threadsafe(self.notify_registration)
+
+    def notify_registration(self):
+        registration, self._registration = self._registration, asyncio.Event()
+        registration.set()
+
+    def refresh_capabilities(self):
+        capabilities = set()
+        for worker_id in list(self.broker._getvalue().keys()):
+            try:
+                worker = self.broker[worker_id]._getvalue()
+            except (AttributeError, KeyError):
+                continue
+            for model in worker['models']:
+                for given in worker['given']:
+                    capabilities.add((model, tuple(given)))
+        self._capabilities = capabilities
+
+    def set_status(self, name, **values):
+        job_status = dict(self.status.get(name, {}))
+        job_status.update(values)
+        self.status[name] = job_status
+
+    async def run_job(self, name, job):
+        job_logger = logging.getLogger("augur.jobs.{}".format(name))
+        coloredlogs.install(level=self.logging_config[1]["log_level"], logger=job_logger, fmt=self.logging_config[1]["format_string"])
+        self.set_status(name, model=job['model'], given=job['given'], state='waiting_for_worker',
+            next_run=None, last_run=None, last_submitted=None)
+
+        # Waiting for compatible worker
+        while (job['model'], tuple(job['given'])) not in self._capabilities:
+            await self._registration.wait()
+
+        job_logger.info("Housekeeper recognized that the broker has a worker that " +
+            "can handle the {} model... beginning to distribute maintained tasks".format(job['model']))
+
+        policy = FreshnessPolicy.from_config(self.freshness['config'], job)
+        while True:
+            self.set_status(name, state='running', last_run=time.time())
+            try:
+                delay = await self.run_job_once(name, job, policy, job_logger)
+            except Exception as e:
+                job_logger.error("Error encountered: {}".format(e))
+                delay = job['delay']
+            self.set_status(name, state='scheduled', next_run=time.time() + delay)
+            await asyncio.sleep(delay)
+
+    async def run_job_once(self, name, job, policy, job_logger):
+        """ Sends the tasks of a job that are due
+
+        :return: Float, seconds until the job should run again
+        """
+        job_logger.info('Housekeeper updating {} model with given {}...'.format(
+            job['model'], job['given'][0]))
+
+        if job['given'][0] == 'git_url' or job['given'][0] == 'github_url':
+            repos = {repo['repo_id']: repo for repo in job['repos']
+                if job['given'][0] != 'github_url' or 'github.com' in repo['repo_git']}
+
+            # Only repos whose data is due for a refresh get a task, busy repos come up often and quiet ones rarely
+            schedule = FreshnessSchedule(await self.blocking(self.freshness_store.next_due_times, job['model'], list(repos.keys())))
+            due_repo_ids = schedule.pop_due()
+
+            tasks = []
+            for repo_id in due_repo_ids:
+                repo = repos[repo_id]
+                given_key = 'git_url' if job['given'][0] == 'git_url' else 'github_url'
+                task = {
+                    "job_type": job['job_type'] if 'job_type' in job else 'MAINTAIN',
+                    "models": [job['model']],
+                    "display_name": "{} model for url: {}".format(job['model'], repo['repo_git']),
+                    "given": {}
+                }
+                task['given'][given_key] = repo['repo_git']
+                if "focused_task" in repo:
+                    task["focused_task"] = repo['focused_task']
+                tasks.append(task)
+
+            accepted = set(await self.submit_tasks(tasks, job_logger))
+            accepted_repo_ids = [repo_id for position, repo_id in enumerate(due_repo_ids) if position in accepted]
+            rejected_repo_ids = [repo_id for position, repo_id in enumerate(due_repo_ids) if position not in accepted]
+            # Held back until the workers report back, which reschedules them based on what they found
+            await self.blocking(self.freshness_store.mark_scheduled, job['model'], accepted_repo_ids, policy.max_interval)
+            # Tasks the broker could not be reached for or had no worker for are tried again soon
+            await self.blocking(self.freshness_store.mark_retry, job['model'], rejected_repo_ids, policy.retry_interval)
+
+            job_logger.info("Housekeeper finished sending {} of {} {} tasks to the broker for it to distribute to your worker(s), {} were not accepted".format(
+                len(accepted_repo_ids), len(repos), job['model'], len(rejected_repo_ids)))
+            self.set_status(name, last_submitted=len(accepted_repo_ids))
+
+            next_due = schedule.next_due()
+            return job['delay'] if next_due is None else min(max(next_due - time.time(), 60), job['delay'])
+
+        elif job['given'][0] == 'repo_group':
+            task = {
+                    "job_type": job['job_type'] if 'job_type' in job else 'MAINTAIN',
+                    "models": [job['model']],
+                    "display_name": "{} model for repo group id: {}".format(job['model'], job.get('repo_group_id')),
+                    "given": {
+                        "repo_group": job['repos']
+                    }
+                }
+            await asyncio.sleep(240)
+            await self.blocking(self.post, '/api/unstable/task', task, 10)
+            await asyncio.sleep(120)
+
+            job_logger.info("Housekeeper finished sending {} tasks to the broker for it to distribute to your worker(s)".format(len(job['repos'])))
+            self.set_status(name, last_submitted=1)
+
+        return job['delay']
+
+    def post(self, route, data, timeout):
+        return requests.post('http://{}:{}{}'.format(self.broker_host, self.broker_port, route),
+            json=data, timeout=timeout).json()
+
+    async def submit_tasks(self, tasks, job_logger):
+        """ Sends tasks to the broker in batches, backing off while the queues they are routed to are full
+
+        :return: List of Integers, positions in tasks of the tasks the broker queued or already had queued
+        """
+        accepted = []
+        backoff = 0
+        for start in range(0, len(tasks), self.submission['batch_size']):
+            batch = tasks[start:start + self.submission['batch_size']]
+            try:
+                response = await self.blocking(self.post, '/api/unstable/tasks', batch, 60)
+            except Exception as e:
+                job_logger.error("Error encountered: {}".format(e))
+                continue
+
+            accepted += [start + position for position in response['accepted']]
+
+            job_logger.debug("Broker queued {} of {} tasks, deepest queue now holds {}".format(
+                response['queued'], len(batch), response['queue_depth']))
+
+            # Back off exponentially while the workers are behind, and go back to full speed once they catch up
+            if response['queue_depth'] > self.submission['max_queue_depth']:
+                backoff = min(max(backoff * 2, 1), 300)
+                job_logger.info("Worker queues hold {} tasks, waiting {} seconds before sending more".format(
+                    response['queue_depth'], backoff))
+                await asyncio.sleep(backoff)
+            else:
+                backoff = 0
+
+        return accepted
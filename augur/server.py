@@ -18,6 +18,7 @@ import pandas as pd
 
 import augur
 from augur.routes import create_routes
+from augur.worker_registry import WorkerRegistry
 
 AUGUR_API_VERSION = 'api/unstable'
 
@@ -44,6 +45,9 @@ class Server(object):
         self.manager = augur_app.manager
         self.broker = augur_app.broker
         self.housekeeper = augur_app.housekeeper
+        self.task_queue = augur_app.task_queue
+        self.broker_version = augur_app.broker_version
+        self.worker_registry = WorkerRegistry()
 
         # Initialize cache
         expire = int(self.augur_app.config.get_value('Server', 'cache_expire'))
@@ -0,0 +1,768 @@
+#SPDX-License-Identifier: MIT
+"""
+Task queue backends used by the broker to hold the tasks routed to each worker
+"""
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+
+import sqlalchemy as s
+
+from augur.worker_registry import get_worker_type
+
+logger = logging.getLogger(__name__)
+
+# Lower values are handed out first, so user requested tasks always jump
+#   ahead of the tasks the housekeeper schedules for maintenance
+JOB_PRIORITIES = {
+    'UPDATE': 0,
+    'MAINTAIN': 1
+}
+
+DEFAULT_LEASE_SECONDS = 1800
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 60
+DEFAULT_MAX_RETRY_DELAY = 3600
+
+def get_task_priority(task):
+    return JOB_PRIORITIES.get(task.get('job_type'), max(JOB_PRIORITIES.values()))
+
+def get_task_model(task):
+    return task['models'][0] if task.get('models') else None
+
+def get_task_key(task):
+    """ Hash of a task's model and given, identical tasks waiting in the queues of one worker type are coalesced
+    """
+    return hashlib.sha1(json.dumps([task.get('models'), task.get('given')], sort_keys=True).encode()).hexdigest()
+
+def empty_queue_summary():
+    return {'queued': 0, 'leased': 0, 'models': {}, 'oldest_task_age': None}
+
+class TaskQueue():
+    """
+    Interface shared by the task queue backends. Every worker instance the broker knows
+    about gets its own named queue. Dequeued tasks are leased to the caller and become
+    visible again when the lease expires without being acknowledged.
+
+    Only one copy of a task (same model and given) waits in the queues of a worker type at
+    a time. Enqueueing a task that is already waiting leaves the queues as they are, unless
+    the new task has a higher priority, in which case the waiting task is upgraded to it.
+    Tasks that are leased do not count, so a repo can be queued again while it is collected.
+
+    A task that fails, or whose lease expires because its worker died, is queued again after
+    an exponential backoff. Once it was handed out `max_attempts` times it is moved to the
+    dead letter queue instead, where it stays until someone requeues it.
+    """
+
+    def __init__(self, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+            retry_delay=DEFAULT_RETRY_DELAY, max_retry_delay=DEFAULT_MAX_RETRY_DELAY):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    def get_retry_delay(self, attempts):
+        """ Seconds a task waits before it is handed out again after its `attempts`-th attempt failed
+        """
+        return min(self.retry_delay * 2 ** max(attempts - 1, 0), self.max_retry_delay)
+
+    def enqueue(self, queue_name, task):
+        """ Adds a task to the end of its priority class in the given queue
+
+        :param queue_name: String, name of the queue (the broker uses the worker id)
+        :param task: Dict, task specification as sent by the housekeeper or a user
+        :return: Integer, id of the queued task, or of the waiting task it was coalesced into
+        """
+        raise NotImplementedError
+
+    def enqueue_many(self, tasks):
+        """ Adds many tasks at once, backends that support it do so in a single transaction
+
+        :param tasks: List of (queue_name, task) tuples
+        :return: Integer, number of tasks that were queued or upgraded a waiting task
+        """
+        return sum(1 for queue_name, task in tasks if self.enqueue(queue_name, task) is not None)
+
+    def dequeue(self, queue_name, limit=1, lease_seconds=None):
+        """ Leases up to `limit` of the highest priority tasks in the given queue
+
+        :param queue_name: String, name of the queue to take tasks from
+        :param limit: Integer, max number of tasks to lease
+        :param lease_seconds: Integer, seconds until the tasks are visible to other consumers again,
+            defaults to the lease length the queue was created with
+        :return: List of dicts, leased tasks, each with its `task_id` added
+        """
+        raise NotImplementedError
+
+    def ack(self, task_id):
+        """ Removes a leased task from its queue for good
+
+        :return: Boolean, whether the task was still held by the queue
+        """
+        raise NotImplementedError
+
+    def release(self, task_id):
+        """ Returns a leased task that never reached its worker to its queue, so it can be handed out again right away
+
+        :return: Boolean, whether the task was still held by the queue
+        """
+        raise NotImplementedError
+
+    def renew(self, task_id, lease_seconds=None):
+        """ Extends the lease on a task that is still being worked on
+
+        :return: Boolean, whether the task is still leased
+        """
+        raise NotImplementedError
+
+    def fail(self, task_id, error=None):
+        """ Queues a leased task again after a backoff, or moves it to the dead letter queue
+            if it used up its attempts
+
+        :param error: String, description of what went wrong, kept with the task
+        :return: String, 'retrying' or 'dead', None if the task was not leased
+        """
+        raise NotImplementedError
+
+    def dead_letters(self, offset=0, limit=None, task_ids=None):
+        """ Tasks in the dead letter queue, most recently failed first
+
+        :param task_ids: List of integers, only return these tasks
+        :return: List of dicts with the `task_id`, `queue_name`, `attempts`, last `error`, `failed_at` and `task`
+        """
+        raise NotImplementedError
+
+    def pop_dead_letters(self, task_ids):
+        """ Removes tasks from the dead letter queue so they can be routed again
+
+        :return: List of dicts, task specifications of the removed tasks
+        """
+        raise NotImplementedError
+
+    def requeue_dead_letters(self, routes):
+        """ Moves tasks from the dead letter queue into the queues they were routed to, with fresh
+        attempts. A task only leaves the dead letter queue together with its copies being queued.
+
+        :param routes: Dict, maps the id of each dead letter to the list of queue names it goes to
+        :return: Integer, number of tasks that were queued or upgraded a waiting task
+        """
+        tasks = {dead_letter['task_id']: dead_letter['task'] for dead_letter in self.dead_letters(task_ids=list(routes))}
+        queued = self.enqueue_many([(queue_name, tasks[task_id])
+            for task_id, queue_names in routes.items() if task_id in tasks for queue_name in queue_names])
+        self.pop_dead_letters(list(tasks))
+        return queued
+
+    def length(self, queue_name, job_type=None):
+        """ Number of tasks waiting in a queue, optionally only counting one job type
+        """
+        raise NotImplementedError
+
+    def lengths(self):
+        """ Number of tasks waiting in every queue
+
+        :return: Dict, maps queue names to their lengths
+        """
+        raise NotImplementedError
+
+    def list_tasks(self, queue_name, job_type=None, offset=0, limit=None):
+        """ Tasks waiting in a queue in the order they would be handed out
+        """
+        raise NotImplementedError
+
+    def summary(self):
+        """ Task counts of every queue, read from counters instead of the tasks themselves
+
+        :return: Dict, maps queue names to dicts with the number of `queued` and `leased` tasks,
+            the queued tasks per model and job type under `models`, and the seconds the oldest
+            queued task has been waiting as `oldest_task_age`
+        """
+        raise NotImplementedError
+
+    def throughput(self, minutes):
+        """ Number of tasks every queue finished in the last `minutes` minutes
+
+        :return: Dict, maps queue names to the number of acknowledged tasks
+        """
+        raise NotImplementedError
+
+    def clear(self, queue_name):
+        """ Drops every task in a queue, leased or not
+        """
+        raise NotImplementedError
+
+class MemoryTaskQueue(TaskQueue):
+    """
+    Task queue held in the memory of the current process. Nothing survives a restart and
+    the queues are not shared between Gunicorn workers, so this is only meant for tests
+    and single process deployments.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._tasks = {} # task_id -> record of the task and its state
+        self._queues = {} # queue_name -> heap of (priority, task_id) for queued tasks
+        self._leases = [] # heap of (leased_until, task_id) for leased tasks
+        self._delayed = [] # heap of (available_at, task_id) for queued tasks waiting out a backoff
+        self._dead = {} # task_id -> record of tasks that used up their attempts
+        self._counts = {} # queue_name -> {(status, job_model, job_type): number of tasks}
+        self._waiting = {} # (worker_type, task key) -> task_id of the queued copy of the task
+        self._finished = {} # minute -> {queue_name: number of acknowledged tasks}
+
+    def _count(self, record, status, delta):
+        counts = self._counts.setdefault(record['queue_name'], {})
+        key = (status, get_task_model(record['task']), record['task'].get('job_type'))
+        counts[key] = counts.get(key, 0) + delta
+
+    def _push(self, record, delay=0):
+        record['status'] = 'queued'
+        record['leased_until'] = None
+        record['available_at'] = time.time() + delay
+        if delay > 0:
+            heapq.heappush(self._delayed, (record['available_at'], record['task_id']))
+        else:
+            heapq.heappush(self._queues.setdefault(record['queue_name'], []),
+                (record['priority'], record['task_id']))
+        self._count(record, 'queued', 1)
+        waiting_key = (get_worker_type(record['queue_name']), record['key'])
+        # A task coming back from a lease stays a separate copy if an identical one was queued meanwhile
+        if record['key'] is not None and self._waiting.setdefault(waiting_key, record['task_id']) != record['task_id']:
+            record['key'] = None
+
+    def _is_queued(self, priority, task_id):
+        """ Whether a heap entry still stands for a queued task, upgrades leave the old entry behind
+        """
+        record = self._tasks.get(task_id)
+        return (record is not None and record['status'] == 'queued' and record['priority'] == priority
+            and record['available_at'] <= time.time())
+
+    def _unwait(self, record):
+        waiting_key = (get_worker_type(record['queue_name']), record['key'])
+        if self._waiting.get(waiting_key) == record['task_id']:
+            del self._waiting[waiting_key]
+
+    def _reclaim_expired_leases(self):
+        now = time.time()
+        while self._leases and self._leases[0][0] <= now:
+            leased_until, task_id = heapq.heappop(self._leases)
+            record = self._tasks.get(task_id)
+            # Skip heap entries left behind by tasks that were acked, released or re-leased
+            if record is None or record['status'] != 'leased' or record['leased_until'] != leased_until:
+                continue
+            logger.info("Lease on task {} expired, returning it to queue {}".format(task_id, record['queue_name']))
+            self._fail(record, 'Lease expired')
+
+        while self._delayed and self._delayed[0][0] <= now:
+            available_at, task_id = heapq.heappop(self._delayed)
+            record = self._tasks.get(task_id)
+            if record is not None and record['status'] == 'queued' and record['available_at'] == available_at:
+                heapq.heappush(self._queues.setdefault(record['queue_name'], []), (record['priority'], task_id))
+
+    def _fail(self, record, error):
+        self._count(record, 'leased', -1)
+        record['last_error'] = error
+        if record['attempts'] >= self.max_attempts:
+            del self._tasks[record['task_id']]
+            record['status'] = 'dead'
+            record['failed_at'] = time.time()
+            self._dead[record['task_id']] = record
+            return 'dead'
+        self._push(record, delay=self.get_retry_delay(record['attempts']))
+        return 'retrying'
+
+    def enqueue(self, queue_name, task):
+        with self._lock:
+            key = get_task_key(task)
+            waiting_id = self._waiting.get((get_worker_type(queue_name), key))
+            if waiting_id is not None:
+                record = self._tasks[waiting_id]
+                if get_task_priority(task) >= record['priority']:
+                    return None
+                # Upgraded tasks skip what is left of their backoff
+                self._count(record, 'queued', -1)
+                record['priority'] = get_task_priority(task)
+                record['task'] = dict(task)
+                self._push(record)
+                return waiting_id
+
+            task_id = next(self._ids)
+            self._tasks[task_id] = {
+                'task_id': task_id,
+                'queue_name': queue_name,
+                'key': key,
+                'priority': get_task_priority(task),
+                'task': dict(task),
+                'attempts': 0,
+                'last_error': None,
+                'created_at': time.time()
+            }
+            self._push(self._tasks[task_id])
+            return task_id
+
+    def enqueue_many(self, tasks):
+        with self._lock:
+            return super().enqueue_many(tasks)
+
+    def dequeue(self, queue_name, limit=1, lease_seconds=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        leased = []
+        with self._lock:
+            self._reclaim_expired_leases()
+            heap = self._queues.get(queue_name, [])
+            while heap and len(leased) < limit:
+                priority, task_id = heapq.heappop(heap)
+                if not self._is_queued(priority, task_id):
+                    continue
+                record = self._tasks[task_id]
+                self._unwait(record)
+                record['status'] = 'leased'
+                record['leased_until'] = time.time() + lease_seconds
+                record['attempts'] += 1
+                heapq.heappush(self._leases, (record['leased_until'], task_id))
+                self._count(record, 'queued', -1)
+                self._count(record, 'leased', 1)
+                leased.append(dict(record['task'], task_id=task_id))
+        return leased
+
+    def ack(self, task_id):
+        with self._lock:
+            record = self._tasks.get(task_id)
+            if record is None or record['status'] != 'leased':
+                return False
+            del self._tasks[task_id]
+            self._count(record, 'leased', -1)
+            finished = self._finished.setdefault(int(time.time() // 60), {})
+            finished[record['queue_name']] = finished.get(record['queue_name'], 0) + 1
+            return True
+
+    def release(self, task_id):
+        with self._lock:
+            record = self._tasks.get(task_id)
+            if record is None or record['status'] != 'leased':
+                return False
+            self._count(record, 'leased', -1)
+            # The worker never got the task, so this attempt does not count
+            record['attempts'] -= 1
+            self._push(record)
+            return True
+
+    def renew(self, task_id, lease_seconds=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        with self._lock:
+            self._reclaim_expired_leases()
+            record = self._tasks.get(task_id)
+            if record is None or record['status'] != 'leased':
+                return False
+            record['leased_until'] = time.time() + lease_seconds
+            heapq.heappush(self._leases, (record['leased_until'], task_id))
+            return True
+
+    def fail(self, task_id, error=None):
+        with self._lock:
+            record = self._tasks.get(task_id)
+            if record is None or record['status'] != 'leased':
+                return None
+            return self._fail(record, error)
+
+    def dead_letters(self, offset=0, limit=None, task_ids=None):
+        with self._lock:
+            records = sorted([record for record in self._dead.values() if task_ids is None or record['task_id'] in task_ids],
+                key=lambda record: record['failed_at'], reverse=True)
+            records = records[offset:] if limit is None else records[offset:offset + limit]
+            return [{
+                'task_id': record['task_id'],
+                'queue_name': record['queue_name'],
+                'attempts': record['attempts'],
+                'error': record['last_error'],
+                'failed_at': record['failed_at'],
+                'task': record['task']
+            } for record in records]
+
+    def pop_dead_letters(self, task_ids):
+        with self._lock:
+            return [self._dead.pop(task_id)['task'] for task_id in task_ids if task_id in self._dead]
+
+    def requeue_dead_letters(self, routes):
+        with self._lock:
+            return super().requeue_dead_letters(routes)
+
+    def length(self, queue_name, job_type=None):
+        with self._lock:
+            self._reclaim_expired_leases()
+            return sum(count for (status, _, task_job_type), count in self._counts.get(queue_name, {}).items()
+                if status == 'queued' and (job_type is None or task_job_type == job_type))
+
+    def lengths(self):
+        with self._lock:
+            self._reclaim_expired_leases()
+            return {queue_name: sum(count for (status, _, _), count in counts.items() if status == 'queued')
+                for queue_name, counts in self._counts.items()}
+
+    def list_tasks(self, queue_name, job_type=None, offset=0, limit=None):
+        with self._lock:
+            self._reclaim_expired_leases()
+            task_ids = [task_id for priority, task_id in sorted(self._queues.get(queue_name, []))
+                if self._is_queued(priority, task_id)]
+            tasks = [dict(self._tasks[task_id]['task'], task_id=task_id) for task_id in task_ids]
+            if job_type is not None:
+                tasks = [task for task in tasks if task.get('job_type') == job_type]
+            return tasks[offset:] if limit is None else tasks[offset:offset + limit]
+
+    def summary(self):
+        with self._lock:
+            self._reclaim_expired_leases()
+            now = time.time()
+            summary = {}
+            for queue_name, counts in self._counts.items():
+                queue_summary = summary[queue_name] = empty_queue_summary()
+                for (status, job_model, job_type), count in counts.items():
+                    if not count:
+                        continue
+                    queue_summary[status] += count
+                    if status == 'queued':
+                        queue_summary['models'].setdefault(job_model, {})[job_type] = count
+                # The heap holds every queued task once, plus stale entries that are skipped
+                created = [self._tasks[task_id]['created_at'] for priority, task_id in self._queues.get(queue_name, [])
+                    if self._is_queued(priority, task_id)]
+                if created:
+                    queue_summary['oldest_task_age'] = now - min(created)
+            return summary
+
+    def throughput(self, minutes):
+        with self._lock:
+            current_minute = int(time.time() // 60)
+            # Buckets older than an hour are not asked for by the broker
+            for minute in [minute for minute in self._finished if minute <= current_minute - 60]:
+                del self._finished[minute]
+            throughput = {}
+            for minute, finished in self._finished.items():
+                if minute > current_minute - minutes:
+                    for queue_name, count in finished.items():
+                        throughput[queue_name] = throughput.get(queue_name, 0) + count
+            return throughput
+
+    def clear(self, queue_name):
+        with self._lock:
+            for task_id in [task_id for task_id, record in self._tasks.items()
+                    if record['queue_name'] == queue_name]:
+                self._unwait(self._tasks.pop(task_id))
+            self._queues.pop(queue_name, None)
+            self._counts.pop(queue_name, None)
+
+class PostgresTaskQueue(TaskQueue):
+    """
+    Task queue stored in the augur_operations.worker_task_queue table, so queued tasks
+    are shared by every Gunicorn worker and survive restarts of the server. Dequeueing
+    uses SKIP LOCKED so concurrent consumers never lease the same task.
+
+    Triggers on the table keep the number of tasks per queue, model, job type and status in
+    worker_queue_stats, and acknowledged tasks are counted per minute in worker_task_throughput,
+    so the status of the broker can be read without scanning the queues.
+
+    Coalescing relies on a unique index over (queue_group, dedup_key) of the queued tasks,
+    so identical tasks routed by different server processes at the same time still end up
+    as one row.
+    """
+
+    # Keeps the waiting copy of a task, and upgrades it when the new one has a higher priority
+    COALESCE_SQL = """
+        ON CONFLICT (queue_group, dedup_key) WHERE status = 'queued' DO UPDATE
+        SET priority = EXCLUDED.priority, job_type = EXCLUDED.job_type, task = EXCLUDED.task,
+            available_at = EXCLUDED.available_at
+        WHERE EXCLUDED.priority < worker_task_queue.priority
+    """
+
+    # Tasks coming back from a lease stay separate copies if an identical one was queued meanwhile
+    REQUEUE_SQL = """
+        UPDATE worker_task_queue AS requeued
+        SET status = 'queued', leased_until = NULL,
+            dedup_key = CASE WHEN candidates.duplicate THEN NULL ELSE requeued.dedup_key END,
+            {}
+        FROM (
+            SELECT leased.task_id,
+                ROW_NUMBER() OVER (PARTITION BY leased.queue_group, leased.dedup_key
+                    ORDER BY leased.priority, leased.task_id) > 1
+                OR EXISTS (
+                    SELECT 1 FROM worker_task_queue AS waiting
+                    WHERE waiting.status = 'queued' AND waiting.queue_group = leased.queue_group
+                    AND waiting.dedup_key = leased.dedup_key
+                ) AS duplicate
+            FROM worker_task_queue AS leased
+            WHERE leased.status = 'leased' AND {}
+        ) AS candidates
+        WHERE requeued.task_id = candidates.task_id
+    """
+
+    RETRY_SQL = """
+        available_at = now() + make_interval(secs => LEAST(
+            :retry_delay * power(2, GREATEST(requeued.attempts - 1, 0)), :max_retry_delay)),
+        last_error = :error
+    """
+
+    DEAD_LETTER_SQL = """
+        WITH dead AS (
+            DELETE FROM worker_task_queue
+            WHERE status = 'leased' AND attempts >= :max_attempts AND {}
+            RETURNING task_id, queue_name, job_model, attempts, task
+        )
+        INSERT INTO worker_task_dead_letter (task_id, queue_name, job_model, attempts, error, task)
+        SELECT task_id, queue_name, job_model, attempts, :error, task FROM dead
+    """
+
+    def __init__(self, engine, **kwargs):
+        super().__init__(**kwargs)
+        self.db = engine
+
+    def _retry(self, connection, where, **params):
+        """ Dead letters the leased tasks matching `where` that used up their attempts, and queues the rest again after a backoff
+
+        :return: Tuple of the number of dead lettered and of queued tasks
+        """
+        params = dict(params, max_attempts=self.max_attempts, retry_delay=self.retry_delay,
+            max_retry_delay=self.max_retry_delay)
+        dead = connection.execute(s.sql.text(self.DEAD_LETTER_SQL.format(where)), **params).rowcount
+        retrying = connection.execute(s.sql.text(self.REQUEUE_SQL.format(self.RETRY_SQL,
+            "leased.attempts < :max_attempts AND " + where)), **params).rowcount
+        return dead, retrying
+
+    def _reclaim_expired_leases(self, connection):
+        dead, retrying = self._retry(connection, "leased_until < now()", error='Lease expired')
+        if dead or retrying:
+            logger.info("Leases expired on {} tasks, {} were queued again and {} used up their attempts".format(
+                dead + retrying, retrying, dead))
+
+    def enqueue(self, queue_name, task):
+        enqueue_sql = s.sql.text("""
+            INSERT INTO worker_task_queue (queue_name, queue_group, dedup_key, priority, job_type, job_model, task)
+            VALUES (:queue_name, :queue_group, :dedup_key, :priority, :job_type, :job_model, CAST(:task AS jsonb))
+            {}
+            RETURNING task_id
+        """.format(self.COALESCE_SQL))
+        return self.db.execute(enqueue_sql, queue_name=queue_name, queue_group=get_worker_type(queue_name),
+            dedup_key=get_task_key(task), priority=get_task_priority(task), job_type=task.get('job_type'),
+            job_model=get_task_model(task), task=json.dumps(task)).scalar()
+
+    def enqueue_many(self, tasks):
+        return self._enqueue_many(self.db, tasks)
+
+    def _enqueue_many(self, connection, tasks):
+        # Copies within the batch are coalesced here, a statement cannot update the same row twice
+        batch = {}
+        for queue_name, task in tasks:
+            row = {
+                'queue_name': queue_name,
+                'queue_group': get_worker_type(queue_name),
+                'dedup_key': get_task_key(task),
+                'priority': get_task_priority(task),
+                'job_type': task.get('job_type'),
+                'job_model': get_task_model(task),
+                'task': task
+            }
+            key = (row['queue_group'], row['dedup_key'])
+            if key not in batch:
+                batch[key] = row
+            elif row['priority'] < batch[key]['priority']:
+                batch[key] = dict(row, queue_name=batch[key]['queue_name'])
+        if not batch:
+            return 0
+
+        # The whole batch is sent as one jsonb document and inserted by a single statement
+        enqueue_sql = s.sql.text("""
+            INSERT INTO worker_task_queue (queue_name, queue_group, dedup_key, priority, job_type, job_model, task)
+            SELECT queue_name, queue_group, dedup_key, priority, job_type, job_model, task
+            FROM jsonb_to_recordset(CAST(:tasks AS jsonb))
+                AS batch(queue_name varchar, queue_group varchar, dedup_key varchar, priority int4,
+                    job_type varchar, job_model varchar, task jsonb)
+            {}
+        """.format(self.COALESCE_SQL))
+        return connection.execute(enqueue_sql, tasks=json.dumps(list(batch.values()))).rowcount
+
+    def dequeue(self, queue_name, limit=1, lease_seconds=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        dequeue_sql = s.sql.text("""
+            UPDATE worker_task_queue
+            SET status = 'leased', leased_until = now() + make_interval(secs => :lease_seconds),
+                attempts = attempts + 1
+            WHERE task_id IN (
+                SELECT task_id FROM worker_task_queue
+                WHERE queue_name = :queue_name AND status = 'queued' AND available_at <= now()
+                ORDER BY priority, task_id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING task_id, priority, task
+        """)
+        with self.db.begin() as connection:
+            self._reclaim_expired_leases(connection)
+            rows = connection.execute(dequeue_sql, queue_name=queue_name, limit=limit,
+                lease_seconds=lease_seconds).fetchall()
+        # RETURNING does not keep the order of the subquery
+        rows = sorted(rows, key=lambda row: (row['priority'], row['task_id']))
+        return [dict(row['task'], task_id=row['task_id']) for row in rows]
+
+    def ack(self, task_id):
+        ack_sql = s.sql.text("""
+            WITH acked AS (
+                DELETE FROM worker_task_queue WHERE task_id = :task_id AND status = 'leased'
+                RETURNING queue_name
+            )
+            INSERT INTO worker_task_throughput (minute, queue_name, finished)
+            SELECT date_trunc('minute', now()), queue_name, 1 FROM acked
+            ON CONFLICT (minute, queue_name) DO UPDATE
+            SET finished = worker_task_throughput.finished + 1
+        """)
+        return self.db.execute(ack_sql, task_id=task_id).rowcount > 0
+
+    def release(self, task_id):
+        # The worker never got the task, so this attempt does not count
+        release_sql = s.sql.text(self.REQUEUE_SQL.format(
+            "attempts = GREATEST(requeued.attempts - 1, 0), available_at = now()", "leased.task_id = :task_id"))
+        return self.db.execute(release_sql, task_id=task_id).rowcount > 0
+
+    def renew(self, task_id, lease_seconds=None):
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        renew_sql = s.sql.text("""
+            UPDATE worker_task_queue SET leased_until = now() + make_interval(secs => :lease_seconds)
+            WHERE task_id = :task_id AND status = 'leased'
+        """)
+        return self.db.execute(renew_sql, task_id=task_id, lease_seconds=lease_seconds).rowcount > 0
+
+    def fail(self, task_id, error=None):
+        with self.db.begin() as connection:
+            dead, retrying = self._retry(connection, "task_id = :task_id", task_id=task_id, error=error)
+        if dead:
+            return 'dead'
+        return 'retrying' if retrying else None
+
+    def dead_letters(self, offset=0, limit=None, task_ids=None):
+        dead_letters_sql = s.sql.text("""
+            SELECT task_id, queue_name, attempts, error, EXTRACT(EPOCH FROM failed_at) AS failed_at, task
+            FROM worker_task_dead_letter
+            WHERE CAST(:task_ids AS int8[]) IS NULL OR task_id = ANY(CAST(:task_ids AS int8[]))
+            ORDER BY failed_at DESC
+            OFFSET :offset LIMIT :limit
+        """)
+        return [dict(row, failed_at=float(row['failed_at'])) for row in self.db.execute(dead_letters_sql,
+            offset=offset, limit=limit, task_ids=list(task_ids) if task_ids is not None else None)]
+
+    def pop_dead_letters(self, task_ids):
+        if not task_ids:
+            return []
+        pop_sql = s.sql.text("""
+            DELETE FROM worker_task_dead_letter WHERE task_id = ANY(CAST(:task_ids AS int8[]))
+            RETURNING task
+        """)
+        return [row['task'] for row in self.db.execute(pop_sql, task_ids=list(task_ids))]
+
+    def requeue_dead_letters(self, routes):
+        if not routes:
+            return 0
+        pop_sql = s.sql.text("""
+            DELETE FROM worker_task_dead_letter WHERE task_id = ANY(CAST(:task_ids AS int8[]))
+            RETURNING task_id, task
+        """)
+        # The dead letters are only deleted if their tasks are queued too
+        with self.db.begin() as connection:
+            tasks = {row['task_id']: row['task'] for row in connection.execute(pop_sql, task_ids=list(routes))}
+            return self._enqueue_many(connection, [(queue_name, tasks[task_id])
+                for task_id, queue_names in routes.items() if task_id in tasks for queue_name in queue_names])
+
+    def length(self, queue_name, job_type=None):
+        length_sql = s.sql.text("""
+            SELECT COUNT(*) FROM worker_task_queue
+            WHERE queue_name = :queue_name AND status = 'queued'
+            AND (CAST(:job_type AS varchar) IS NULL OR job_type = :job_type)
+        """)
+        return self.db.execute(length_sql, queue_name=queue_name, job_type=job_type).scalar()
+
+    def lengths(self):
+        lengths_sql = s.sql.text("""
+            SELECT queue_name, COUNT(*) AS length FROM worker_task_queue
+            WHERE status = 'queued'
+            GROUP BY queue_name
+        """)
+        return {row['queue_name']: row['length'] for row in self.db.execute(lengths_sql)}
+
+    def list_tasks(self, queue_name, job_type=None, offset=0, limit=None):
+        list_sql = s.sql.text("""
+            SELECT task_id, task FROM worker_task_queue
+            WHERE queue_name = :queue_name AND status = 'queued'
+            AND (CAST(:job_type AS varchar) IS NULL OR job_type = :job_type)
+            ORDER BY priority, task_id
+            OFFSET :offset LIMIT :limit
+        """)
+        rows = self.db.execute(list_sql, queue_name=queue_name, job_type=job_type,
+            offset=offset, limit=limit).fetchall()
+        return [dict(row['task'], task_id=row['task_id']) for row in rows]
+
+    def summary(self):
+        stats_sql = s.sql.text("""
+            SELECT queue_name, status, job_model, job_type, tasks FROM worker_queue_stats
+            WHERE tasks > 0
+        """)
+        # The oldest task of every priority is the first one on the dequeue index
+        oldest_sql = s.sql.text("""
+            SELECT queues.queue_name, EXTRACT(EPOCH FROM now() - MIN(oldest.created_at)) AS oldest_task_age
+            FROM (SELECT DISTINCT queue_name FROM worker_queue_stats WHERE status = 'queued' AND tasks > 0) AS queues
+            CROSS JOIN unnest(CAST(:priorities AS int4[])) AS priorities(priority)
+            CROSS JOIN LATERAL (
+                SELECT created_at FROM worker_task_queue
+                WHERE queue_name = queues.queue_name AND status = 'queued' AND priority = priorities.priority
+                ORDER BY task_id
+                LIMIT 1
+            ) AS oldest
+            GROUP BY queues.queue_name
+        """)
+        summary = {}
+        for row in self.db.execute(stats_sql):
+            queue_summary = summary.setdefault(row['queue_name'], empty_queue_summary())
+            queue_summary[row['status']] = queue_summary.get(row['status'], 0) + row['tasks']
+            if row['status'] == 'queued':
+                queue_summary['models'].setdefault(row['job_model'] or None, {})[row['job_type'] or None] = row['tasks']
+        for row in self.db.execute(oldest_sql, priorities=list(JOB_PRIORITIES.values())):
+            summary[row['queue_name']]['oldest_task_age'] = float(row['oldest_task_age'])
+        return summary
+
+    def throughput(self, minutes):
+        # Counts older than a day are not asked for by the broker
+        self.db.execute(s.sql.text("""
+            DELETE FROM worker_task_throughput WHERE minute < now() - interval '1 day'
+        """))
+        throughput_sql = s.sql.text("""
+            SELECT queue_name, SUM(finished) AS finished FROM worker_task_throughput
+            WHERE minute > now() - make_interval(mins => :minutes)
+            GROUP BY queue_name
+        """)
+        return {row['queue_name']: int(row['finished']) for row in self.db.execute(throughput_sql, minutes=minutes)}
+
+    def clear(self, queue_name):
+        self.db.execute(s.sql.text("""
+            DELETE FROM worker_task_queue WHERE queue_name = :queue_name
+        """), queue_name=queue_name)
+
+def create_task_queue(augur_app):
+    """
+    Creates the task queue backend configured in the Broker section of the config
+    """
+    backend = augur_app.config.get_value('Broker', 'queue_backend')
+    options = {
+        'lease_seconds': int(augur_app.config.get_value('Broker', 'lease_seconds')),
+        'max_attempts': int(augur_app.config.get_value('Broker', 'max_attempts')),
+        'retry_delay': int(augur_app.config.get_value('Broker', 'retry_delay')),
+        'max_retry_delay': int(augur_app.config.get_value('Broker', 'max_retry_delay'))
+    }
+
+    if backend == 'memory':
+        if int(augur_app.config.get_value('Server', 'workers')) > 1:
+            logger.warning("The memory task queue is not shared between Gunicorn workers, " +
+                "set Server:workers to 1 or use the postgres queue backend")
+        return MemoryTaskQueue(**options)
+    elif backend == 'postgres':
+        return PostgresTaskQueue(augur_app.operations_database, **options)
+
+    raise ValueError("Unknown task queue backend: {}".format(backend))
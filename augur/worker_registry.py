@@ -0,0 +1,193 @@
+#SPDX-License-Identifier: MIT
+"""
+Index of the workers the broker knows about, used to route tasks without walking the broker's proxies
+"""
+import heapq
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def get_worker_type(worker_id):
+    """ Type of a worker, e.g. github_worker for com.augurlabs.core.github_worker.9400
+    """
+    return worker_id.split('.')[len(worker_id.split('.')) - 2]
+
+def bump_version(version):
+    """ Tells the registries of every server process that the set of workers changed
+
+    A fresh token is used instead of incrementing a counter, so two processes
+    bumping at the same time can never make a third one miss a change.
+    """
+    if version is not None:
+        version.value = uuid.uuid4().hex
+
+def broker_snapshot(broker):
+    """ Plain copy of every worker the broker knows about, fetched with one round trip per worker
+
+    :param broker: Manager dict proxy holding every worker the broker knows about
+    :return: Dict, maps worker ids to dicts with the worker's given and models as lists
+    """
+    snapshot = {}
+    for worker_id, worker in broker._getvalue().items():
+        try:
+            worker = worker._getvalue()
+        except (AttributeError, KeyError):
+            continue
+        if type(worker) != dict:
+            continue
+        worker = dict(worker)
+        worker['given'] = [list(given) for given in worker.get('given', [])]
+        worker['models'] = list(worker.get('models', []))
+        snapshot[worker_id] = worker
+    return snapshot
+
+class WorkerRegistry():
+    """
+    Per process index of worker capabilities and queue depths
+
+    Workers are indexed by the (model, given) pairs they can fill, grouped by worker type,
+    and every worker type keeps a min-heap of its workers' queue depths. Heap entries are
+    invalidated lazily, so routing a task is a dictionary lookup plus a heap peek per type.
+
+    Every Gunicorn worker has its own registry. It is rebuilt from the broker whenever the
+    shared version token changes (HELLO and remove messages) and the depths are refreshed
+    from the task queue every `refresh_interval` seconds to account for the tasks other
+    processes routed and workers claimed in the meantime. A Gunicorn worker serves requests
+    on several threads, so every method holds the registry's lock.
+    """
+
+    def __init__(self, refresh_interval=10):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._version = None
+        self._depths_refreshed_at = 0
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._capabilities = {} # (model, given) -> set of worker types
+            self._workers = {} # worker_type -> set of worker ids
+            self._depths = {} # worker_id -> number of queued tasks
+            self._heaps = {} # worker_type -> heap of (depth, worker_id)
+
+    @staticmethod
+    def capability_key(model, given):
+        return (model, tuple(given))
+
+    def add_worker(self, worker_id, models, givens, depth=0):
+        """ Indexes a worker under every combination of the models and givens it registered with
+
+        :param worker_id: String, id the worker sent in its HELLO message
+        :param models: List of strings, models the worker can fill
+        :param givens: List of lists, each one a set of givens the worker accepts
+        :param depth: Integer, number of tasks already queued for the worker
+        """
+        with self._lock:
+            worker_type = get_worker_type(worker_id)
+            for model in models:
+                for given in givens:
+                    self._capabilities.setdefault(self.capability_key(model, given), set()).add(worker_type)
+            self._workers.setdefault(worker_type, set()).add(worker_id)
+            self.set_depth(worker_id, depth)
+
+    def remove_worker(self, worker_id):
+        """ Stops routing tasks to a worker, its stale heap entries are dropped as they surface
+        """
+        with self._lock:
+            worker_type = get_worker_type(worker_id)
+            self._workers.get(worker_type, set()).discard(worker_id)
+            self._depths.pop(worker_id, None)
+
+    def set_depth(self, worker_id, depth):
+        with self._lock:
+            if worker_id not in self._workers.get(get_worker_type(worker_id), ()):
+                return
+            self._depths[worker_id] = depth
+            heap = self._heaps.setdefault(get_worker_type(worker_id), [])
+            heapq.heappush(heap, (depth, worker_id))
+
+            # Every depth change leaves a stale entry behind, so rebuild heaps that grew well past their worker count
+            if len(heap) > 4 * len(self._workers[get_worker_type(worker_id)]) + 16:
+                self._compact(get_worker_type(worker_id))
+
+    def adjust_depth(self, worker_id, delta):
+        with self._lock:
+            if worker_id in self._depths:
+                self.set_depth(worker_id, max(self._depths[worker_id] + delta, 0))
+
+    def depth(self, worker_id):
+        with self._lock:
+            return self._depths.get(worker_id)
+
+    def _compact(self, worker_type):
+        heap = [(self._depths[worker_id], worker_id) for worker_id in self._workers.get(worker_type, ())]
+        heapq.heapify(heap)
+        self._heaps[worker_type] = heap
+
+    def least_loaded(self, worker_type):
+        """ Worker of the given type with the fewest queued tasks, or None if there are no workers of that type
+        """
+        with self._lock:
+            heap = self._heaps.get(worker_type, [])
+            while heap:
+                depth, worker_id = heap[0]
+                if self._depths.get(worker_id) == depth:
+                    return worker_id
+                heapq.heappop(heap)
+            return None
+
+    def route(self, model, given):
+        """ Least loaded worker of every worker type that can fill the model for the given
+
+        :param model: String, model requested by the task
+        :param given: List of strings, keys of the task's given
+        :return: Dict, maps worker types to the id of the worker that should get the task
+        """
+        with self._lock:
+            routes = {}
+            for worker_type in self._capabilities.get(self.capability_key(model, given), ()):
+                worker_id = self.least_loaded(worker_type)
+                if worker_id is not None:
+                    routes[worker_type] = worker_id
+            return routes
+
+    def sync(self, broker, version, task_queue):
+        """ Brings the registry up to date with the broker before routing a task
+
+        :param broker: Manager dict proxy holding every worker the broker knows about
+        :param version: Manager value proxy holding the token bumped on HELLO and remove messages
+        :param task_queue: TaskQueue the depths are read from
+        """
+        current_version = version.value if version is not None else None
+        if current_version != self._version or self._version is None:
+            self.rebuild(broker, task_queue)
+            self._version = current_version
+        elif time.time() - self._depths_refreshed_at > self.refresh_interval:
+            self.refresh_depths(task_queue)
+
+    def rebuild(self, broker, task_queue):
+        """ Indexes the broker's workers again. The new index is built on the side and swapped in
+        at once, so tasks routed meanwhile still see the previous workers instead of none
+        """
+        logger.debug("Rebuilding worker registry\n")
+        depths = task_queue.lengths()
+        fresh = WorkerRegistry(self.refresh_interval)
+        for worker_id, worker in broker_snapshot(broker).items():
+            if worker.get('status') in ['Disconnected', 'Draining']:
+                continue
+            fresh.add_worker(worker_id, worker['models'], worker['given'], depth=depths.get(worker_id, 0))
+        with self._lock:
+            self._capabilities, self._workers, self._depths, self._heaps = (
+                fresh._capabilities, fresh._workers, fresh._depths, fresh._heaps
+            )
+            self._depths_refreshed_at = time.time()
+
+    def refresh_depths(self, task_queue):
+        depths = task_queue.lengths()
+        with self._lock:
+            for worker_id in list(self._depths.keys()):
+                self.set_depth(worker_id, depths.get(worker_id, 0))
+            self._depths_refreshed_at = time.time()
@@ -31,6 +31,18 @@
 \i schema/generate/104-schema_update_106.sql
 \i schema/generate/105-schema_update_107.sql
 \i schema/generate/106-schema_update_108.sql
+\i schema/generate/107-schema_update_109.sql
+\i schema/generate/108-schema_update_110.sql
+\i schema/generate/109-schema_update_111.sql
+\i schema/generate/110-schema_update_112.sql
+\i schema/generate/111-schema_update_113.sql
+\i schema/generate/112-schema_update_114.sql
+\i schema/generate/113-schema_update_115.sql
+\i schema/generate/114-schema_update_116.sql
+\i schema/generate/115-schema_update_117.sql
+\i schema/generate/116-schema_update_118.sql
+\i schema/generate/117-schema_update_119.sql
+\i schema/generate/118-schema_update_120.sql
 
 
 -- prior update scripts incorporated into 
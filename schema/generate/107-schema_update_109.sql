@@ -0,0 +1,48 @@
+BEGIN; 
+CREATE SEQUENCE "augur_operations"."worker_task_queue_task_id_seq" 
+INCREMENT 1
+MINVALUE  1
+MAXVALUE 9223372036854775807
+START 1
+CACHE 1;
+
+ALTER SEQUENCE "augur_operations"."worker_task_queue_task_id_seq" OWNER TO "augur";
+
+CREATE TABLE "augur_operations"."worker_task_queue" (
+  "task_id" int8 NOT NULL DEFAULT nextval('"augur_operations".worker_task_queue_task_id_seq'::regclass),
+  "queue_name" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "priority" int4 NOT NULL DEFAULT 1,
+  "job_type" varchar(32) COLLATE "pg_catalog"."default",
+  "job_model" varchar(255) COLLATE "pg_catalog"."default",
+  "task" jsonb NOT NULL,
+  "status" varchar(16) COLLATE "pg_catalog"."default" NOT NULL DEFAULT 'queued',
+  "attempts" int4 NOT NULL DEFAULT 0,
+  "available_at" timestamptz(6) NOT NULL DEFAULT now(),
+  "leased_until" timestamptz(6),
+  "created_at" timestamptz(6) NOT NULL DEFAULT now(),
+  CONSTRAINT "worker_task_queue_pkey" PRIMARY KEY ("task_id")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_task_queue" OWNER TO "augur";
+
+CREATE INDEX "worker_task_queue_dequeue" ON "augur_operations"."worker_task_queue" USING btree (
+  "queue_name", "priority", "task_id"
+) WHERE "status" = 'queued';
+
+CREATE INDEX "worker_task_queue_leases" ON "augur_operations"."worker_task_queue" USING btree (
+  "leased_until"
+) WHERE "status" = 'leased';
+
+COMMENT ON TABLE "augur_operations"."worker_task_queue" IS 'Tasks the broker has routed to each worker. Survives restarts of augur and is shared by every server process. ';
+
+COMMENT ON COLUMN "augur_operations"."worker_task_queue"."queue_name" IS 'Id of the worker instance the task was routed to. ';
+
+COMMENT ON COLUMN "augur_operations"."worker_task_queue"."priority" IS 'Lower values are handed out first. UPDATE tasks are 0, MAINTAIN tasks are 1. ';
+
+COMMENT ON COLUMN "augur_operations"."worker_task_queue"."leased_until" IS 'Leased tasks that are not acknowledged by this time are queued again. ';
+
+update "augur_operations"."augur_settings" set value = 109
+  where setting = 'augur_data_version'; 
+
+COMMIT; 
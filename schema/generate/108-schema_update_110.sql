@@ -0,0 +1,26 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."repo_freshness" (
+  "repo_id" int8 NOT NULL,
+  "job_model" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "last_scheduled" timestamptz(6),
+  "last_success" timestamptz(6),
+  "upstream_updated_at" timestamptz(6),
+  "upstream_etag" varchar COLLATE "pg_catalog"."default",
+  "change_rate" float8,
+  "next_due" timestamptz(6),
+  CONSTRAINT "repo_freshness_pkey" PRIMARY KEY ("repo_id", "job_model")
+)
+;
+
+ALTER TABLE "augur_operations"."repo_freshness" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."repo_freshness" IS 'How often the data of each repo changes for each model, used by the housekeeper to only send tasks for repos that are due. ';
+
+COMMENT ON COLUMN "augur_operations"."repo_freshness"."change_rate" IS 'Exponential moving average of whether each collection found new or updated data, from 0 (never) to 1 (every time). ';
+
+COMMENT ON COLUMN "augur_operations"."repo_freshness"."next_due" IS 'Time the housekeeper sends the next task for this repo and model. ';
+
+update "augur_operations"."augur_settings" set value = 110
+  where setting = 'augur_data_version'; 
+
+COMMIT; 
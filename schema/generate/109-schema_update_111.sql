@@ -0,0 +1,76 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_queue_stats" (
+  "queue_name" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "status" varchar(16) COLLATE "pg_catalog"."default" NOT NULL,
+  "job_model" varchar(255) COLLATE "pg_catalog"."default" NOT NULL DEFAULT '',
+  "job_type" varchar(32) COLLATE "pg_catalog"."default" NOT NULL DEFAULT '',
+  "tasks" int8 NOT NULL DEFAULT 0,
+  CONSTRAINT "worker_queue_stats_pkey" PRIMARY KEY ("queue_name", "status", "job_model", "job_type")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_queue_stats" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_queue_stats" IS 'Number of tasks in worker_task_queue per queue, status, model and job type. Kept up to date by triggers on worker_task_queue. ';
+
+CREATE TABLE "augur_operations"."worker_task_throughput" (
+  "minute" timestamptz(6) NOT NULL,
+  "queue_name" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "finished" int4 NOT NULL DEFAULT 0,
+  CONSTRAINT "worker_task_throughput_pkey" PRIMARY KEY ("minute", "queue_name")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_task_throughput" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_task_throughput" IS 'Number of tasks each queue finished per minute, for the broker status summary. Rows older than a day are deleted. ';
+
+-- Statement level triggers, so a batch of tasks changes every counter once
+create or replace function "augur_operations"."count_worker_tasks"()
+returns trigger
+language plpgsql
+as $$
+    begin
+        if TG_OP in ('UPDATE', 'DELETE') then
+            insert into "augur_operations"."worker_queue_stats" (queue_name, status, job_model, job_type, tasks)
+            select queue_name, status, coalesce(job_model, ''), coalesce(job_type, ''), -count(*)
+            from old_tasks
+            group by 1, 2, 3, 4
+            order by 1, 2, 3, 4
+            on conflict (queue_name, status, job_model, job_type) do update
+            set tasks = "worker_queue_stats".tasks + excluded.tasks;
+        end if;
+        if TG_OP in ('INSERT', 'UPDATE') then
+            insert into "augur_operations"."worker_queue_stats" (queue_name, status, job_model, job_type, tasks)
+            select queue_name, status, coalesce(job_model, ''), coalesce(job_type, ''), count(*)
+            from new_tasks
+            group by 1, 2, 3, 4
+            order by 1, 2, 3, 4
+            on conflict (queue_name, status, job_model, job_type) do update
+            set tasks = "worker_queue_stats".tasks + excluded.tasks;
+        end if;
+        return null;
+    end;
+$$;
+
+CREATE TRIGGER "worker_task_queue_count_insert" AFTER INSERT ON "augur_operations"."worker_task_queue"
+  REFERENCING NEW TABLE AS new_tasks
+  FOR EACH STATEMENT EXECUTE PROCEDURE "augur_operations"."count_worker_tasks"();
+
+CREATE TRIGGER "worker_task_queue_count_update" AFTER UPDATE ON "augur_operations"."worker_task_queue"
+  REFERENCING OLD TABLE AS old_tasks NEW TABLE AS new_tasks
+  FOR EACH STATEMENT EXECUTE PROCEDURE "augur_operations"."count_worker_tasks"();
+
+CREATE TRIGGER "worker_task_queue_count_delete" AFTER DELETE ON "augur_operations"."worker_task_queue"
+  REFERENCING OLD TABLE AS old_tasks
+  FOR EACH STATEMENT EXECUTE PROCEDURE "augur_operations"."count_worker_tasks"();
+
+INSERT INTO "augur_operations"."worker_queue_stats" (queue_name, status, job_model, job_type, tasks)
+SELECT queue_name, status, coalesce(job_model, ''), coalesce(job_type, ''), count(*)
+FROM "augur_operations"."worker_task_queue"
+GROUP BY 1, 2, 3, 4;
+
+update "augur_operations"."augur_settings" set value = 111
+  where setting = 'augur_data_version'; 
+
+COMMIT;
@@ -0,0 +1,21 @@
+BEGIN; 
+ALTER TABLE "augur_operations"."worker_task_queue"
+  ADD COLUMN "queue_group" varchar(255) COLLATE "pg_catalog"."default",
+  ADD COLUMN "dedup_key" varchar(40) COLLATE "pg_catalog"."default";
+
+-- Worker type of the queue, e.g. github_worker for com.augurlabs.core.github_worker.9400
+UPDATE "augur_operations"."worker_task_queue"
+  SET "queue_group" = reverse(split_part(reverse("queue_name"), '.', 2));
+
+CREATE UNIQUE INDEX "worker_task_queue_coalesce" ON "augur_operations"."worker_task_queue" USING btree (
+  "queue_group", "dedup_key"
+) WHERE "status" = 'queued';
+
+COMMENT ON COLUMN "augur_operations"."worker_task_queue"."queue_group" IS 'Worker type of the queue. Identical tasks are coalesced across the queues of a worker type. ';
+
+COMMENT ON COLUMN "augur_operations"."worker_task_queue"."dedup_key" IS 'Hash of the model and given of the task. Only one queued task per queue_group has a given key, NULL for tasks that are never coalesced. ';
+
+update "augur_operations"."augur_settings" set value = 112
+  where setting = 'augur_data_version'; 
+
+COMMIT;
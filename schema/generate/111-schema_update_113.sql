@@ -0,0 +1,30 @@
+BEGIN; 
+ALTER TABLE "augur_operations"."worker_task_queue"
+  ADD COLUMN "last_error" text COLLATE "pg_catalog"."default";
+
+COMMENT ON COLUMN "augur_operations"."worker_task_queue"."attempts" IS 'Number of times the task was handed out. Tasks that fail or whose lease expires are queued again with an exponential backoff until they reach the max_attempts of the Broker config. ';
+
+CREATE TABLE "augur_operations"."worker_task_dead_letter" (
+  "task_id" int8 NOT NULL,
+  "queue_name" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "job_model" varchar(255) COLLATE "pg_catalog"."default",
+  "attempts" int4 NOT NULL,
+  "error" text COLLATE "pg_catalog"."default",
+  "task" jsonb NOT NULL,
+  "failed_at" timestamptz(6) NOT NULL DEFAULT now(),
+  CONSTRAINT "worker_task_dead_letter_pkey" PRIMARY KEY ("task_id")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_task_dead_letter" OWNER TO "augur";
+
+CREATE INDEX "worker_task_dead_letter_failed_at" ON "augur_operations"."worker_task_dead_letter" USING btree (
+  "failed_at"
+);
+
+COMMENT ON TABLE "augur_operations"."worker_task_dead_letter" IS 'Tasks that failed on every attempt. They stay here until they are requeued through the broker. ';
+
+update "augur_operations"."augur_settings" set value = 113
+  where setting = 'augur_data_version'; 
+
+COMMIT;
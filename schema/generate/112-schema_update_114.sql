@@ -0,0 +1,18 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_collection_watermark" (
+  "repo_id" int8 NOT NULL,
+  "model" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "since" timestamp(0) NOT NULL,
+  "data_collection_date" timestamp(0) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT "worker_collection_watermark_pkey" PRIMARY KEY ("repo_id", "model")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_collection_watermark" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_collection_watermark" IS 'Newest updated_at a model has fully collected for a repo. The next collection only asks the platform for data updated since then. Delete the row to collect the repo in full again. ';
+
+update "augur_operations"."augur_settings" set value = 114
+  where setting = 'augur_data_version'; 
+
+COMMIT;
@@ -0,0 +1,21 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_http_cache" (
+  "url" text COLLATE "pg_catalog"."default" NOT NULL,
+  "auth_scope" varchar(40) COLLATE "pg_catalog"."default" NOT NULL,
+  "etag" text COLLATE "pg_catalog"."default",
+  "last_modified" text COLLATE "pg_catalog"."default",
+  "link" text COLLATE "pg_catalog"."default",
+  "body" text COLLATE "pg_catalog"."default",
+  "cached_at" timestamp(0) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT "worker_http_cache_pkey" PRIMARY KEY ("url", "auth_scope")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_http_cache" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_http_cache" IS 'ETag and Last-Modified of the API responses workers received, so they can ask for a page only if it changed. auth_scope is a digest of the token the response was requested with. body is only kept for single objects, pages that did not change are skipped. ';
+
+update "augur_operations"."augur_settings" set value = 115
+  where setting = 'augur_data_version'; 
+
+COMMIT;
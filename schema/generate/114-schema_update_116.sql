@@ -0,0 +1,20 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_key_budget" (
+  "platform" varchar(255) COLLATE "pg_catalog"."default" NOT NULL,
+  "key_id" varchar(40) COLLATE "pg_catalog"."default" NOT NULL,
+  "capacity" int4 NOT NULL,
+  "remaining" int4 NOT NULL,
+  "reset_at" timestamptz(6) NOT NULL,
+  "blocked_until" timestamptz(6) NOT NULL DEFAULT now(),
+  CONSTRAINT "worker_key_budget_pkey" PRIMARY KEY ("platform", "key_id")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_key_budget" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_key_budget" IS 'Rate limit budget of every API key, shared by all worker processes. Workers lease requests from the key with the most remaining budget, which is refilled to its capacity at reset_at. A key is not leased to any worker before blocked_until, e.g. after a secondary rate limit. key_id is a digest of the access token in worker_oauth. ';
+
+update "augur_operations"."augur_settings" set value = 116
+  where setting = 'augur_data_version'; 
+
+COMMIT;
@@ -0,0 +1,18 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_pagination_checkpoint" (
+  "repo_id" int8 NOT NULL,
+  "endpoint" text COLLATE "pg_catalog"."default" NOT NULL,
+  "page" int4 NOT NULL,
+  "data_collection_date" timestamp(0) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT "worker_pagination_checkpoint_pkey" PRIMARY KEY ("repo_id", "endpoint")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_pagination_checkpoint" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_pagination_checkpoint" IS 'Last page of an endpoint whose rows a pipelined pagination stored for a repo. An interrupted pagination resumes after it, and the row is deleted once the endpoint is paginated to the end. ';
+
+update "augur_operations"."augur_settings" set value = 117
+  where setting = 'augur_data_version'; 
+
+COMMIT;
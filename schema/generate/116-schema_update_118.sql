@@ -0,0 +1,22 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_contributor_request" (
+  "login" text COLLATE "pg_catalog"."default" NOT NULL,
+  "cntrb_id" int8,
+  "requested_at" timestamp(0) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "settled_at" timestamp(0),
+  CONSTRAINT "worker_contributor_request_pkey" PRIMARY KEY ("login")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_contributor_request" OWNER TO "augur";
+
+CREATE INDEX "worker_contributor_request_pending" ON "augur_operations"."worker_contributor_request" USING btree (
+  "requested_at" "pg_catalog"."timestamp_ops" ASC NULLS LAST
+) WHERE "settled_at" IS NULL;
+
+COMMENT ON TABLE "augur_operations"."worker_contributor_request" IS 'GitHub users, by lowercased login, that workers need contributors for. One worker at a time resolves the rows that are not settled yet and records the cntrb_id, which stays null for users that could not be found. ';
+
+update "augur_operations"."augur_settings" set value = 118
+  where setting = 'augur_data_version'; 
+
+COMMIT;
@@ -0,0 +1,26 @@
+BEGIN; 
+CREATE TABLE "augur_operations"."worker_commit_email_attempt" (
+  "email" text COLLATE "pg_catalog"."default" NOT NULL,
+  "name" text COLLATE "pg_catalog"."default" NOT NULL,
+  "attempts" int4 NOT NULL DEFAULT 1,
+  "attempted_at" timestamp(0) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  "retry_at" timestamp(0) NOT NULL,
+  CONSTRAINT "worker_commit_email_attempt_pkey" PRIMARY KEY ("email", "name")
+)
+;
+
+ALTER TABLE "augur_operations"."worker_commit_email_attempt" OWNER TO "augur";
+
+COMMENT ON TABLE "augur_operations"."worker_commit_email_attempt" IS 'Commit author emails and names the facade contributor resolution could not find a GitHub login for. They are skipped until retry_at, which moves further out with every failed attempt. ';
+
+-- Emails that were already unresolved are retried a day after they were last looked up
+INSERT INTO "augur_operations"."worker_commit_email_attempt" ("email", "name", "attempted_at", "retry_at")
+SELECT "email", COALESCE("name", ''), COALESCE("data_collection_date", CURRENT_TIMESTAMP),
+  COALESCE("data_collection_date", CURRENT_TIMESTAMP) + interval '1 day'
+FROM "augur_data"."unresolved_commit_emails"
+ON CONFLICT DO NOTHING;
+
+update "augur_operations"."augur_settings" set value = 119
+  where setting = 'augur_data_version'; 
+
+COMMIT;
@@ -0,0 +1,9 @@
+BEGIN; 
+ALTER TABLE "augur_operations"."repo_freshness" DROP COLUMN IF EXISTS "upstream_etag";
+
+COMMENT ON COLUMN "augur_operations"."repo_freshness"."upstream_updated_at" IS 'Newest update time of the data an incremental collection of this repo and model found, newer data counts as a change. ';
+
+update "augur_operations"."augur_settings" set value = 120
+  where setting = 'augur_data_version'; 
+
+COMMIT;
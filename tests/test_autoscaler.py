@@ -0,0 +1,36 @@
+#SPDX-License-Identifier: MIT
+from augur.autoscaler import desired_instances
+
+def test_scales_to_drain_backlog_in_time():
+    # 2 instances finish 20 tasks an hour, so 100 queued tasks need 10 instances to be done in an hour
+    assert desired_instances(2, 100, 20, 1, 10, 3600) == 10
+    assert desired_instances(2, 100, 20, 1, 10, 7200) == 5
+    assert desired_instances(2, 100, 20, 1, 4, 3600) == 4
+
+def test_idle_and_unmeasured_types():
+    assert desired_instances(3, 0, 50, 1, 10, 3600) == 1
+    assert desired_instances(0, 10, 0, 0, 10, 3600) == 1
+    assert desired_instances(2, 10, 0, 1, 10, 3600) == 3
+
+def test_rate_limit_budget_caps_instances():
+    assert desired_instances(2, 100, 20, 1, 10, 3600, budget_cap=3) == 3
+    assert desired_instances(2, 100, 20, 1, 10, 3600, budget_cap=0) == 1
+
+def test_new_instances_get_a_port_no_other_instance_uses():
+    from augur.autoscaler import Autoscaler
+
+    class Config():
+        def get_value(self, section, name):
+            return {'port': 9400}
+
+    class Broker(dict):
+        def _getvalue(self):
+            return self
+
+    autoscaler = Autoscaler.__new__(Autoscaler)
+    autoscaler.config = Config()
+    autoscaler.broker = Broker({'workers.github_worker.9400': {}, 'workers.github_worker.9401': {},
+        'workers.gitlab_issues_worker.9402': {}})
+    autoscaler._booting_ports = {'github_worker': [9402]}
+
+    assert autoscaler.next_port('github_worker') == 9403
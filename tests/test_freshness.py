@@ -0,0 +1,47 @@
+#SPDX-License-Identifier: MIT
+from augur.freshness import FreshnessPolicy, FreshnessSchedule, FreshnessStore
+
+def test_busy_repos_are_polled_more_often():
+    policy = FreshnessPolicy(min_interval=100, max_interval=1000, smoothing=0.5)
+
+    busy = quiet = None
+    for _ in range(5):
+        busy = policy.update_change_rate(busy, True)
+        quiet = policy.update_change_rate(quiet, False)
+
+    assert busy == 1.0
+    assert quiet == 0.0
+    assert policy.interval(busy) == 100
+    assert policy.interval(quiet) == 1000
+    assert policy.interval(None) == 100
+
+    busy = policy.update_change_rate(busy, False)
+    assert busy == 0.5
+    assert 100 < policy.interval(busy) < 1000
+
+def test_policy_uses_job_overrides():
+    policy = FreshnessPolicy.from_config({'min_interval': 10, 'max_interval': 20, 'smoothing': 0.1}, {'max_interval': 50})
+    assert (policy.min_interval, policy.max_interval, policy.smoothing) == (10, 50, 0.1)
+
+def test_schedule_pops_due_repos_most_overdue_first():
+    schedule = FreshnessSchedule([(1, 500), (2, None), (3, 50), (4, 2000), (5, None)])
+
+    assert schedule.pop_due(now=1000) == [2, 5, 3, 1]
+    assert schedule.next_due() == 2000
+    assert schedule.pop_due(now=1000) == []
+    assert len(schedule) == 1
+
+class RecordingEngine():
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def execute(self, statement, **params):
+        self.params = params
+        return self.rows
+
+def test_next_due_times_only_loads_the_given_repos():
+    engine = RecordingEngine([{'repo_id': 2, 'next_due': 50}])
+
+    assert FreshnessStore(engine).next_due_times('issues', (1, 2)) == [(1, None), (2, 50.0)]
+    assert engine.params == {'job_model': 'issues', 'repo_ids': [1, 2]}
@@ -0,0 +1,74 @@
+#SPDX-License-Identifier: MIT
+import asyncio
+import logging
+import threading
+
+import pytest
+
+from augur.scheduler import HousekeeperScheduler, get_job_names
+
+class FakeProxy(dict):
+    def _getvalue(self):
+        return self
+
+def test_job_names_are_unique():
+    jobs = [{'model': 'issues'}, {'model': 'repo_info'}, {'model': 'issues'}]
+    assert get_job_names(jobs) == ['issues#0', 'repo_info', 'issues#2']
+
+def test_jobs_wait_for_a_compatible_worker():
+    broker = FakeProxy()
+    worker_registered = threading.Event()
+    status = {}
+    job = {'model': 'issues', 'given': ['github_url'], 'delay': 100, 'repos': []}
+    freshness = {'config': {'min_interval': 10, 'max_interval': 100, 'smoothing': 0.3}}
+    scheduler = HousekeeperScheduler([job], broker, 'localhost', 5000, {}, freshness, worker_registered,
+        status, (None, {'log_level': 'INFO', 'format_string': '%(message)s'}))
+
+    runs = []
+    async def run_job_once(name, job, policy, job_logger):
+        runs.append(name)
+        raise asyncio.CancelledError()
+    scheduler.run_job_once = run_job_once
+
+    async def run():
+        scheduler._loop = asyncio.get_running_loop()
+        scheduler._registration = asyncio.Event()
+        threading.Thread(target=scheduler.watch_registrations, daemon=True).start()
+
+        job_task = asyncio.ensure_future(scheduler.run_job('issues', job))
+        await asyncio.sleep(0.1)
+        assert status['issues']['state'] == 'waiting_for_worker'
+        assert runs == []
+
+        broker['com.augurlabs.core.github_worker.9400'] = FakeProxy(models=['issues'], given=[['github_url']])
+        worker_registered.set()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(job_task, 5)
+
+    asyncio.run(run())
+    assert runs == ['issues']
+    assert status['issues']['state'] == 'running'
+
+def test_only_accepted_tasks_are_reported_as_submitted():
+    submission = {'batch_size': 2, 'max_queue_depth': 100}
+    freshness = {'config': {'min_interval': 10, 'max_interval': 100, 'smoothing': 0.3}}
+    scheduler = HousekeeperScheduler([], FakeProxy(), 'localhost', 5000, submission, freshness, threading.Event(),
+        {}, (None, {'log_level': 'INFO', 'format_string': '%(message)s'}))
+
+    responses = [
+        {'queued': 1, 'coalesced': 0, 'unroutable': 1, 'accepted': [1], 'queue_depth': 1},
+        ConnectionError('broker is down'),
+        {'queued': 1, 'coalesced': 0, 'unroutable': 0, 'accepted': [0], 'queue_depth': 2}
+    ]
+    def post(route, data, timeout):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    scheduler.post = post
+
+    async def run():
+        scheduler._loop = asyncio.get_running_loop()
+        return await scheduler.submit_tasks([{'task': position} for position in range(5)], logging.getLogger(__name__))
+
+    assert asyncio.run(run()) == [1, 4]
@@ -0,0 +1,158 @@
+#SPDX-License-Identifier: MIT
+import time
+
+import pytest
+
+from augur.task_queue import MemoryTaskQueue
+
+def make_task(job_type, repo):
+    return {
+        'job_type': job_type,
+        'models': ['issues'],
+        'display_name': 'issues model for url: {}'.format(repo),
+        'given': {'github_url': repo}
+    }
+
+def test_update_tasks_are_handed_out_first():
+    queue = MemoryTaskQueue()
+    queue.enqueue('worker.1', make_task('MAINTAIN', 'a'))
+    queue.enqueue('worker.1', make_task('UPDATE', 'b'))
+    queue.enqueue('worker.1', make_task('MAINTAIN', 'c'))
+
+    assert queue.length('worker.1') == 3
+    assert queue.length('worker.1', job_type='MAINTAIN') == 2
+    assert [task['given']['github_url'] for task in queue.list_tasks('worker.1')] == ['b', 'a', 'c']
+    assert [task['given']['github_url'] for task in queue.dequeue('worker.1', limit=2)] == ['b', 'a']
+    assert queue.length('worker.1') == 1
+    assert queue.dequeue('worker.2') == []
+
+def test_ack_and_release():
+    queue = MemoryTaskQueue()
+    queue.enqueue('worker.1', make_task('MAINTAIN', 'a'))
+    queue.enqueue('worker.1', make_task('MAINTAIN', 'b'))
+
+    first, = queue.dequeue('worker.1')
+    assert queue.release(first['task_id'])
+    assert queue.length('worker.1') == 2
+    assert queue.dequeue('worker.1')[0]['task_id'] == first['task_id']
+
+    assert queue.ack(first['task_id'])
+    assert not queue.ack(first['task_id'])
+    assert queue.lengths() == {'worker.1': 1}
+
+def test_expired_leases_are_queued_again():
+    queue = MemoryTaskQueue(lease_seconds=0.05, retry_delay=0)
+    task_id = queue.enqueue('worker.1', make_task('MAINTAIN', 'a'))
+
+    assert queue.dequeue('worker.1')[0]['task_id'] == task_id
+    assert queue.length('worker.1') == 0
+    time.sleep(0.1)
+    assert queue.length('worker.1') == 1
+    assert queue.dequeue('worker.1')[0]['task_id'] == task_id
+
+def test_enqueue_many():
+    queue = MemoryTaskQueue()
+    queued = queue.enqueue_many([
+        ('worker.1', make_task('MAINTAIN', 'a')),
+        ('worker.2', make_task('MAINTAIN', 'b')),
+        ('worker.1', make_task('UPDATE', 'c'))
+    ])
+
+    assert queued == 3
+    assert queue.lengths() == {'worker.1': 2, 'worker.2': 1}
+    assert queue.dequeue('worker.1')[0]['given']['github_url'] == 'c'
+
+def test_summary_and_throughput():
+    queue = MemoryTaskQueue()
+    queue.enqueue_many([
+        ('worker.1', make_task('MAINTAIN', 'a')),
+        ('worker.1', make_task('UPDATE', 'b')),
+        ('worker.1', make_task('MAINTAIN', 'c')),
+        ('worker.2', make_task('MAINTAIN', 'd'))
+    ])
+    task, = queue.dequeue('worker.2')
+    queue.ack(task['task_id'])
+    task, = queue.dequeue('worker.1')
+
+    summary = queue.summary()
+    assert (summary['worker.1']['queued'], summary['worker.1']['leased']) == (2, 1)
+    assert summary['worker.1']['models'] == {'issues': {'MAINTAIN': 2}}
+    assert summary['worker.1']['oldest_task_age'] >= 0
+    assert (summary['worker.2']['queued'], summary['worker.2']['oldest_task_age']) == (0, None)
+
+    assert queue.release(task['task_id'])
+    assert queue.summary()['worker.1']['models'] == {'issues': {'MAINTAIN': 2, 'UPDATE': 1}}
+    assert queue.throughput(5) == {'worker.2': 1}
+
+def test_identical_waiting_tasks_are_coalesced():
+    queue = MemoryTaskQueue()
+    first = queue.enqueue('com.augurlabs.core.github_worker.1', make_task('MAINTAIN', 'a'))
+    assert queue.enqueue('com.augurlabs.core.github_worker.2', make_task('MAINTAIN', 'a')) is None
+    assert queue.enqueue_many([
+        ('com.augurlabs.core.github_worker.1', make_task('MAINTAIN', 'a')),
+        ('com.augurlabs.core.github_worker.1', make_task('MAINTAIN', 'b')),
+        ('com.augurlabs.core.facade_worker.1', make_task('MAINTAIN', 'a'))
+    ]) == 2
+    assert queue.lengths() == {'com.augurlabs.core.github_worker.1': 2, 'com.augurlabs.core.facade_worker.1': 1}
+
+    # A user request upgrades the waiting copy in place
+    assert queue.enqueue('com.augurlabs.core.github_worker.2', make_task('UPDATE', 'a')) == first
+    assert queue.length('com.augurlabs.core.github_worker.1', job_type='UPDATE') == 1
+    leased, = queue.dequeue('com.augurlabs.core.github_worker.1')
+    assert (leased['task_id'], leased['job_type']) == (first, 'UPDATE')
+
+    # Leased tasks do not block a new copy, and do not replace it when they come back
+    second = queue.enqueue('com.augurlabs.core.github_worker.1', make_task('MAINTAIN', 'a'))
+    assert second != first
+    assert queue.release(first)
+    assert queue.length('com.augurlabs.core.github_worker.1') == 3
+    assert queue.enqueue('com.augurlabs.core.github_worker.1', make_task('MAINTAIN', 'a')) is None
+
+def test_failed_tasks_are_retried_then_dead_lettered():
+    queue = MemoryTaskQueue(max_attempts=2, retry_delay=0.05)
+    task_id = queue.enqueue('worker.1', make_task('MAINTAIN', 'a'))
+
+    queue.dequeue('worker.1')
+    assert queue.fail(task_id, 'boom') == 'retrying'
+    # Waiting out the backoff
+    assert queue.length('worker.1') == 1
+    assert queue.dequeue('worker.1') == []
+    time.sleep(0.1)
+    assert queue.dequeue('worker.1')[0]['task_id'] == task_id
+
+    assert queue.fail(task_id, 'boom again') == 'dead'
+    assert queue.length('worker.1') == 0
+    dead_letter, = queue.dead_letters()
+    assert (dead_letter['task_id'], dead_letter['attempts'], dead_letter['error']) == (task_id, 2, 'boom again')
+    assert queue.pop_dead_letters([task_id]) == [make_task('MAINTAIN', 'a')]
+    assert queue.dead_letters() == []
+
+def test_dead_letters_are_only_removed_once_requeued():
+    queue = MemoryTaskQueue(max_attempts=1)
+    task_id = queue.enqueue('worker.1', make_task('MAINTAIN', 'a'))
+    queue.dequeue('worker.1')
+    assert queue.fail(task_id, 'boom') == 'dead'
+
+    def broken_enqueue_many(tasks):
+        raise RuntimeError('queue is unavailable')
+    queue.enqueue_many = broken_enqueue_many
+    with pytest.raises(RuntimeError):
+        queue.requeue_dead_letters({task_id: ['worker.2']})
+    assert [dead_letter['task_id'] for dead_letter in queue.dead_letters()] == [task_id]
+
+    del queue.enqueue_many
+    assert queue.requeue_dead_letters({task_id: ['worker.2']}) == 1
+    assert queue.dead_letters() == []
+    assert queue.length('worker.2') == 1
+
+def test_renewed_leases_do_not_expire():
+    queue = MemoryTaskQueue(lease_seconds=0.1)
+    task_id = queue.enqueue('worker.1', make_task('MAINTAIN', 'a'))
+
+    queue.dequeue('worker.1')
+    time.sleep(0.06)
+    assert queue.renew(task_id)
+    time.sleep(0.06)
+    assert queue.length('worker.1') == 0
+    assert queue.ack(task_id)
+    assert not queue.renew(task_id)
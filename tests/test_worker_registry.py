@@ -0,0 +1,80 @@
+#SPDX-License-Identifier: MIT
+from augur.worker_registry import WorkerRegistry
+
+def test_route_picks_least_loaded_worker_of_each_type():
+    registry = WorkerRegistry()
+    registry.add_worker('com.augurlabs.core.github_worker.9400', ['issues', 'repo_info'], [['github_url']], depth=3)
+    registry.add_worker('com.augurlabs.core.github_worker.9401', ['issues'], [['github_url']], depth=1)
+    registry.add_worker('com.augurlabs.core.gitlab_issues_worker.9460', ['gitlab_issues'], [['git_url']])
+
+    assert registry.route('issues', ['github_url']) == {'github_worker': 'com.augurlabs.core.github_worker.9401'}
+    assert registry.route('repo_info', ['github_url']) == {'github_worker': 'com.augurlabs.core.github_worker.9401'}
+    assert registry.route('issues', ['git_url']) == {}
+
+    registry.adjust_depth('com.augurlabs.core.github_worker.9401', 5)
+    assert registry.route('issues', ['github_url']) == {'github_worker': 'com.augurlabs.core.github_worker.9400'}
+
+def test_removed_workers_are_not_routed_to():
+    registry = WorkerRegistry()
+    registry.add_worker('com.augurlabs.core.github_worker.9400', ['issues'], [['github_url']], depth=3)
+    registry.add_worker('com.augurlabs.core.github_worker.9401', ['issues'], [['github_url']], depth=1)
+
+    registry.remove_worker('com.augurlabs.core.github_worker.9401')
+    assert registry.route('issues', ['github_url']) == {'github_worker': 'com.augurlabs.core.github_worker.9400'}
+
+    registry.remove_worker('com.augurlabs.core.github_worker.9400')
+    assert registry.route('issues', ['github_url']) == {}
+
+def test_heaps_are_compacted():
+    registry = WorkerRegistry()
+    registry.add_worker('com.augurlabs.core.github_worker.9400', ['issues'], [['github_url']])
+    for depth in range(1000):
+        registry.set_depth('com.augurlabs.core.github_worker.9400', depth)
+
+    assert len(registry._heaps['github_worker']) < 25
+    assert registry.depth('com.augurlabs.core.github_worker.9400') == 999
+
+class Proxy():
+    def __init__(self, value):
+        self.value = value
+
+    def _getvalue(self):
+        return self.value
+
+def test_rebuild_keeps_routing_to_the_previous_workers_until_it_is_done():
+    registry = WorkerRegistry()
+    registry.add_worker('com.augurlabs.core.github_worker.9400', ['issues'], [['github_url']])
+    routed_during_rebuild = []
+
+    class TaskQueue():
+        def lengths(self):
+            routed_during_rebuild.append(registry.route('issues', ['github_url']))
+            return {'com.augurlabs.core.github_worker.9401': 2}
+
+    broker = Proxy({'com.augurlabs.core.github_worker.9401': Proxy({
+        'models': ['issues'], 'given': [['github_url']], 'status': 'Idle'
+    })})
+    registry.rebuild(broker, TaskQueue())
+
+    assert routed_during_rebuild == [{'github_worker': 'com.augurlabs.core.github_worker.9400'}]
+    assert registry.route('issues', ['github_url']) == {'github_worker': 'com.augurlabs.core.github_worker.9401'}
+    assert registry.depth('com.augurlabs.core.github_worker.9401') == 2
+
+def test_depths_stay_consistent_across_threads():
+    import threading
+
+    registry = WorkerRegistry()
+    registry.add_worker('com.augurlabs.core.github_worker.9400', ['issues'], [['github_url']])
+
+    def route_tasks():
+        for _ in range(500):
+            worker_id = registry.route('issues', ['github_url'])['github_worker']
+            registry.adjust_depth(worker_id, 1)
+
+    threads = [threading.Thread(target=route_tasks) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.depth('com.augurlabs.core.github_worker.9400') == 2000
@@ -0,0 +1,22 @@
+#SPDX-License-Identifier: MIT
+from workers.contributor_index import ContributorIndex
+
+def test_contributors_are_found_by_any_identity():
+    index = ContributorIndex().add_all([
+        {'cntrb_id': 1, 'gh_user_id': 100, 'gh_node_id': 'MDQ6VXNlcjEwMA==', 'cntrb_login': 'Octocat', 'cntrb_canonical': 'octo@example.com'},
+        {'cntrb_id': 2, 'gh_user_id': None, 'gh_node_id': None, 'cntrb_login': None, 'cntrb_canonical': 'Dev@Example.com'}
+    ])
+    assert len(index) == 2
+
+    # Ids come back from pandas as floats, logins and emails in any case
+    assert index.lookup(gh_user_id=100.0) == 1
+    assert index.lookup(gh_user_id=float('nan'), gh_node_id='MDQ6VXNlcjEwMA==') == 1
+    # Node ids are case-sensitive base64
+    assert index.lookup(gh_node_id='mdq6vxnlcjewma==') is None
+    assert index.lookup(login='octocat') == 1
+    assert index.lookup(email='dev@example.COM') == 2
+    assert index.lookup(gh_user_id=101, login=None) is None
+
+    index.add({'cntrb_id': 3, 'gh_user_id': 101, 'gh_node_id': 'MDQ6VXNlcjEwMQ==', 'cntrb_login': 'hubot', 'cntrb_canonical': None})
+    assert index.lookup(gh_user_id='101') == 3
+    assert not index.expired(60)
@@ -0,0 +1,51 @@
+#SPDX-License-Identifier: MIT
+from workers.contributor_resolver import ResolutionQueue, UserQuery, batches, contributor_row, user_query
+
+def test_users_are_looked_up_in_batches_and_become_contributor_rows():
+    assert batches(['a', 'b', 'c'], 2) == [('a', 'b'), ('c',)]
+    assert user_query(('octocat', 'x"y')).startswith('{ u0: user(login: "octocat") { databaseId ')
+    assert 'u1: user(login: "x\\"y")' in user_query(('octocat', 'x"y'))
+
+    payload = {'data': {
+        'u0': {
+            'databaseId': 583231, 'id': 'MDQ6VXNlcjU4MzIzMQ==', 'login': 'octocat', 'email': '',
+            'company': '@github', 'location': 'San Francisco', 'createdAt': '2011-01-25T18:44:36Z',
+            'updatedAt': '2023-01-22T12:13:51Z', 'name': 'The Octocat',
+            'avatarUrl': 'https://avatars.githubusercontent.com/u/583231?v=4',
+            'url': 'https://github.com/octocat', 'isSiteAdmin': False
+        },
+        # Organizations are not Users
+        'u1': None
+    }}
+    query = UserQuery()
+    assert query.outcome(None, payload) == 'page'
+    users = query.users(payload, ('Octocat', 'github'))
+    assert list(users) == ['Octocat']
+
+    row = contributor_row(users['Octocat'], 'tool', '1.0', 'GitHub API', {
+        'cntrb_canonical': 'octocat@example.com', 'cntrb_full_name': 'Commit Name'
+    })
+    assert row['gh_user_id'] == 583231
+    assert row['gh_followers_url'] == 'https://api.github.com/users/octocat/followers'
+    # The commit email fills in for the public email GitHub did not return, the name GitHub has is kept
+    assert row['cntrb_canonical'] == 'octocat@example.com'
+    assert row['cntrb_email'] is None
+    assert row['cntrb_full_name'] == 'The Octocat'
+
+class RecordingEngine:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, statement, **params):
+        self.calls.append(params)
+
+def test_only_resolved_and_missing_logins_are_settled():
+    engine = RecordingEngine()
+    queue = ResolutionQueue(engine, None)
+
+    # A login that could not be looked up, like when rate limited, stays pending
+    queue.settle(['octocat', 'ghost', 'ratelimited'], {'octocat': 1}, {'ghost'})
+    assert engine.calls == [{'logins': ['octocat', 'ghost'], 'cntrb_ids': [1, None]}]
+
+    queue.settle(['ratelimited'], {})
+    assert len(engine.calls) == 1
@@ -0,0 +1,56 @@
+#SPDX-License-Identifier: MIT
+from tests.test_workers.worker_persistance.util_persistance import *
+
+
+def insert_commit(database_connection, repo_id, commit_hash, committer_email, cntrb_id=None):
+    database_connection.execute(s.sql.text("""
+        INSERT INTO augur_data.commits (repo_id, cmt_commit_hash, cmt_author_name, cmt_author_raw_email,
+            cmt_author_email, cmt_author_date, cmt_committer_name, cmt_committer_raw_email, cmt_committer_email,
+            cmt_committer_date, cmt_added, cmt_removed, cmt_whitespace, cmt_filename, cmt_date_attempted,
+            cmt_ght_author_id)
+        VALUES (:repo_id, :commit_hash, 'Dev', :email, :email, '2021-01-01', 'Dev', :email, :email,
+            '2021-01-01', 1, 0, 0, 'README.md', CURRENT_TIMESTAMP, :cntrb_id)
+    """), repo_id=repo_id, commit_hash=commit_hash, email=committer_email, cntrb_id=cntrb_id)
+
+
+def linked_contributors(database_connection, repo_id):
+    rows = database_connection.execute(s.sql.text("""
+        SELECT cmt_commit_hash, cmt_ght_author_id FROM augur_data.commits WHERE repo_id = :repo_id
+    """), repo_id=repo_id).fetchall()
+    return {commit_hash: cntrb_id for commit_hash, cntrb_id in rows}
+
+
+def test_link_commits_to_contributors(database_connection):
+
+    dummy = DummyFullWorker(database_connection)
+
+    insert_commit(database_connection, 1, 'a' * 40, 'dev@example.com')
+    insert_commit(database_connection, 1, 'b' * 40, 'dev@example.com', 10)
+    insert_commit(database_connection, 1, 'c' * 40, 'alias@example.com', 5)
+    insert_commit(database_connection, 1, 'd' * 40, 'unknown@example.com')
+    insert_commit(database_connection, 25430, 'e' * 40, 'dev@example.com')
+
+    cntrb_emails = [
+        {'email': 'dev@example.com', 'cntrb_id': 10},
+        {'email': 'alias@example.com', 'cntrb_id': 11},
+        # The first contributor found for an email wins
+        {'email': 'dev@example.com', 'cntrb_id': 12},
+        {'email': None, 'cntrb_id': 13},
+    ]
+
+    # The commit that already points at its contributor is not counted
+    assert dummy.link_commits_to_contributors(1, cntrb_emails) == 2
+
+    assert linked_contributors(database_connection, 1) == {
+        'a' * 40: 10,
+        'b' * 40: 10,
+        'c' * 40: 11,
+        'd' * 40: None,
+    }
+    # Commits of other repos are left alone
+    assert linked_contributors(database_connection, 25430) == {'e' * 40: None}
+
+    # Linking the same emails again changes nothing
+    assert dummy.link_commits_to_contributors(1, cntrb_emails) == 0
+
+    assert dummy.link_commits_to_contributors(1, []) == 0
@@ -0,0 +1,155 @@
+#SPDX-License-Identifier: MIT
+from tests.test_workers.worker_persistance.util_persistance import *
+
+
+# The docker database is only built from the base schema, so the attempts table is created
+# from its migration
+@pytest.fixture
+def attempt_table(database_connection):
+    with open("schema/generate/117-schema_update_119.sql") as migration_file:
+        migration = migration_file.read()
+
+    connection = database_connection.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(migration)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def insert_commit(database_connection, commit_hash, author_name, author_email):
+    database_connection.execute(s.sql.text("""
+        INSERT INTO augur_data.commits (repo_id, cmt_commit_hash, cmt_author_name, cmt_author_raw_email,
+            cmt_author_email, cmt_author_date, cmt_committer_name, cmt_committer_raw_email, cmt_committer_email,
+            cmt_committer_date, cmt_added, cmt_removed, cmt_whitespace, cmt_filename, cmt_date_attempted)
+        VALUES (1, :commit_hash, :name, :email, :email, '2021-01-01', :name, :email, :email,
+            '2021-01-01', 1, 0, 0, 'README.md', CURRENT_TIMESTAMP)
+    """), commit_hash=commit_hash, name=author_name, email=author_email)
+
+
+def attempt(database_connection, email, name):
+    return database_connection.execute(s.sql.text("""
+        SELECT attempts, EXTRACT(DAY FROM retry_at - attempted_at) AS retry_days
+        FROM augur_operations.worker_commit_email_attempt
+        WHERE email = :email AND name = :name
+    """), email=email, name=name).fetchone()
+
+
+def test_failed_attempts_back_off(database_connection, attempt_table):
+
+    dummy = DummyFullWorker(database_connection)
+
+    failed = [('dev@example.com', 'Dev')]
+
+    # The retry interval starts at commit_email_retry_days and doubles with every attempt
+    for attempts, retry_days in [(1, 1), (2, 2), (3, 4)]:
+        dummy.record_resolution_attempts(failed, [])
+        assert tuple(attempt(database_connection, 'dev@example.com', 'Dev')) == (attempts, retry_days)
+
+    # Up to MAX_RETRY_DAYS
+    database_connection.execute(s.sql.text("""
+        UPDATE augur_operations.worker_commit_email_attempt SET attempts = 20 WHERE email = 'dev@example.com'
+    """))
+    dummy.record_resolution_attempts(failed, [])
+    assert tuple(attempt(database_connection, 'dev@example.com', 'Dev')) == (21, MAX_RETRY_DAYS)
+
+    # The same email with another name is tracked on its own
+    dummy.record_resolution_attempts([('dev@example.com', 'Other Dev')], [])
+    assert tuple(attempt(database_connection, 'dev@example.com', 'Other Dev')) == (1, 1)
+
+    # Resolving the email deletes its attempts
+    dummy.record_resolution_attempts([], ['dev@example.com'])
+    assert attempt(database_connection, 'dev@example.com', 'Dev') is None
+    assert attempt(database_connection, 'dev@example.com', 'Other Dev') is None
+
+
+def test_new_contributor_commits_skip_resolved_and_recent_failures(database_connection, attempt_table):
+
+    dummy = DummyFullWorker(database_connection)
+
+    insert_commit(database_connection, 'a' * 40, 'Canonical', 'canonical@example.com')
+    insert_commit(database_connection, 'b' * 40, 'Alias', 'alias@example.com')
+    insert_commit(database_connection, 'c' * 40, 'Failed', 'failed@example.com')
+    insert_commit(database_connection, 'd' * 40, 'Retry', 'retry@example.com')
+    insert_commit(database_connection, 'e' * 40, 'New', 'new@example.com')
+    insert_commit(database_connection, 'f' * 40, 'New', 'new@example.com')
+
+    cntrb_id = database_connection.execute(s.sql.text("""
+        INSERT INTO augur_data.contributors (cntrb_canonical) VALUES ('canonical@example.com') RETURNING cntrb_id
+    """)).fetchone()[0]
+    database_connection.execute(s.sql.text("""
+        INSERT INTO augur_data.contributors_aliases (cntrb_id, canonical_email, alias_email)
+        VALUES (:cntrb_id, 'canonical@example.com', 'alias@example.com')
+    """), cntrb_id=cntrb_id)
+
+    dummy.record_resolution_attempts([('failed@example.com', 'Failed'), ('retry@example.com', 'Retry')], [])
+    # The retry interval of this one is over
+    database_connection.execute(s.sql.text("""
+        UPDATE augur_operations.worker_commit_email_attempt
+        SET retry_at = CURRENT_TIMESTAMP - interval '1 hour'
+        WHERE email = 'retry@example.com'
+    """))
+
+    new_contribs = dummy.get_new_contributor_commits(1)
+
+    # One commit of every email and name is looked up
+    assert sorted((commit['email_raw'], commit['name']) for commit in new_contribs) == [
+        ('new@example.com', 'New'),
+        ('retry@example.com', 'Retry'),
+    ]
+
+
+class FakeLookupInterface:
+    """ Answers the lookups of process_commit_metadata without GitHub or a database """
+
+    def __init__(self, not_found):
+        self.not_found = not_found
+        self.logger = logging.getLogger()
+        self.db = None
+        self.contributors_table = None
+        self.failed = None
+        self.resolved_emails = None
+
+    def get_login_with_commit_hash(self, commit_data, repo_id, not_found=None):
+        if 'commit' in self.not_found[commit_data['email_raw']]:
+            not_found.add('commit')
+        return None
+
+    def get_login_with_supplemental_data(self, commit_data, not_found=None):
+        not_found.update({'email', 'name'} & self.not_found[commit_data['email_raw']])
+        if commit_data['email_raw'] == 'found@example.com':
+            return 'found'
+        return None
+
+    def resolve_contributors(self, logins, defaults={}, not_found=None):
+        not_found.add('found')
+        return {}
+
+    def insert_aliases(self, aliases):
+        pass
+
+    def record_resolution_attempts(self, failed, resolved_emails):
+        self.failed = failed
+        self.resolved_emails = resolved_emails
+
+
+def test_only_definitive_misses_are_recorded():
+
+    interface = FakeLookupInterface({
+        'nobody@example.com': {'commit', 'email', 'name'},
+        'limited@example.com': {'commit', 'email'},
+        'timeout@example.com': {'email', 'name'},
+        'found@example.com': set(),
+    })
+
+    process_commit_metadata([
+        {'name': 'Nobody', 'hash': 'a' * 40, 'email_raw': 'nobody@example.com'},
+        {'name': 'Limited', 'hash': 'b' * 40, 'email_raw': 'limited@example.com'},
+        {'name': 'Timeout', 'hash': 'c' * 40, 'email_raw': 'timeout@example.com'},
+        {'name': 'Found', 'hash': 'd' * 40, 'email_raw': 'found@example.com'},
+    ], interface, 1)
+
+    # The commit had no author and both searches found nobody, or the login was not found
+    assert interface.failed == [('nobody@example.com', 'Nobody'), ('found@example.com', 'Found')]
+    assert interface.resolved_emails == []
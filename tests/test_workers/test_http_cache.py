@@ -0,0 +1,34 @@
+#SPDX-License-Identifier: MIT
+import logging
+
+import requests
+
+from workers.http_cache import ResponseCache, auth_scope
+
+def make_response(body, headers):
+    response = requests.models.Response()
+    response.status_code = 200
+    response.headers.update(headers)
+    response._content = body
+    return response
+
+def test_validators_are_kept_until_flushed():
+    cache = ResponseCache(None, logging.getLogger(__name__))
+    scope = auth_scope({'Authorization': 'token abc'})
+    assert scope != auth_scope({'Authorization': 'token def'})
+
+    cache.remember('https://api.github.com/a?page=1', scope, make_response(b'[{"id": 1}]', {
+        'ETag': 'W/"1"', 'Link': '<https://api.github.com/a?page=2>; rel="last"'
+    }))
+    # Empty pages end pagination and responses without validators cannot be asked for conditionally
+    cache.remember('https://api.github.com/a?page=3', scope, make_response(b'[]', {'ETag': 'W/"3"'}))
+    cache.remember('https://api.github.com/b', scope, make_response(b'{"id": 1}', {}))
+
+    cached = cache.get('https://api.github.com/a?page=1', scope)
+    assert cache.conditional_headers(cached) == {'If-None-Match': 'W/"1"'}
+    assert cached['link'] == '<https://api.github.com/a?page=2>; rel="last"'
+    assert cached['body'] is None
+    assert list(cache._pending) == [('https://api.github.com/a?page=1', scope)]
+
+    cache.discard()
+    assert cache._pending == {}
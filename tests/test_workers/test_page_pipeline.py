@@ -0,0 +1,47 @@
+#SPDX-License-Identifier: MIT
+import logging
+import threading
+
+import pytest
+
+from workers.page_pipeline import PagePipeline
+
+def test_pages_are_stored_in_order_while_later_pages_are_fetched():
+    fetched = []
+    stored = []
+    pipeline = PagePipeline(logging.getLogger(__name__), queue_size=1)
+
+    def pages():
+        for number in range(1, 8):
+            fetched.append(number)
+            yield number
+
+    def store(page, changes):
+        # Backpressure keeps the fetch stage at most a few pages ahead of storing
+        assert len(fetched) - len(stored) <= 4
+        stored.append((page, changes))
+
+    assert pipeline.run(pages(), lambda page: page * 10, store) == 7
+    assert stored == [(number, number * 10) for number in range(1, 8)]
+
+def test_an_exception_in_a_stage_stops_the_pipeline():
+    closed = threading.Event()
+    pipeline = PagePipeline(logging.getLogger(__name__), queue_size=1)
+
+    def pages():
+        try:
+            number = 0
+            while True:
+                number += 1
+                yield number
+        finally:
+            closed.set()
+
+    def diff(page):
+        if page == 3:
+            raise ValueError(page)
+        return page
+
+    with pytest.raises(ValueError):
+        pipeline.run(pages(), diff, lambda page, changes: None)
+    assert closed.is_set()
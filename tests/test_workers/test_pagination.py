@@ -0,0 +1,63 @@
+#SPDX-License-Identifier: MIT
+import requests
+
+from workers.pagination import (
+    GitlabPages, GraphqlPages, RestPages, classify_response, decode_payload, BAD_CREDENTIALS,
+    CLIENT_ERROR, MALFORMED, NOT_FOUND, NOT_MODIFIED, PAGE, RATE_LIMITED, SECONDARY_RATE_LIMITED,
+    SERVER_ERROR
+)
+
+def make_response(status, body, headers={}):
+    response = requests.models.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = body
+    return response
+
+def outcome(status, body, headers={}):
+    response = make_response(status, body, headers)
+    return classify_response(response, decode_payload(response))
+
+def test_responses_are_classified_by_status_then_message():
+    assert outcome(200, b'[{"id": 1}]') == PAGE
+    assert outcome(200, b'"[{\\"id\\": 1}]"') == PAGE
+    assert outcome(200, b'<!DOCTYPE html>') == MALFORMED
+    assert outcome(304, b'') == NOT_MODIFIED
+    assert outcome(401, b'{"message": "Bad credentials"}') == BAD_CREDENTIALS
+    assert outcome(403, b'{"message": "You have exceeded a secondary rate limit."}') == SECONDARY_RATE_LIMITED
+    assert outcome(403, b'{"message": "x"}', {'Retry-After': '60'}) == SECONDARY_RATE_LIMITED
+    assert outcome(403, b'{"message": "API rate limit exceeded"}', {'X-RateLimit-Remaining': '0'}) == RATE_LIMITED
+    assert outcome(404, b'{"message": "Not Found"}') == NOT_FOUND
+    assert outcome(404, b'{"message": "404 Project Not Found"}') == NOT_FOUND
+    assert outcome(422, b'{"message": "Validation Failed"}') == CLIENT_ERROR
+    assert outcome(502, b'') == SERVER_ERROR
+
+def test_backends_find_the_next_page():
+    github = RestPages('https://api.github.com/repos/a/b/issues?per_page=100&page={}')
+    first = make_response(200, b'[]', {
+        'Link': '<https://api.github.com/repos/a/b/issues?per_page=100&page=2>; rel="next", '
+                '<https://api.github.com/repos/a/b/issues?per_page=100&page=12>; rel="last"'
+    })
+    assert github.request(3)[1].endswith('&page=3')
+    assert github.last_page(first) == 12
+    assert github.next(11, first, [], 12) == 12
+    assert github.next(12, first, [], 12) is None
+    assert github.next(1, make_response(200, b'[]'), [], None) is None
+
+    gitlab = GitlabPages('https://gitlab.com/api/v4/projects/1/issues?per_page=100&page={}')
+    assert gitlab.last_page(make_response(200, b'[]', {'x-total-pages': '3'})) == 3
+    assert gitlab.next(2, make_response(200, b'[]', {'x-next-page': ''}), [], None) is None
+    keyset = make_response(200, b'[]', {'Link': '<https://gitlab.com/api/v4/projects/1/issues?id_after=9>; rel="next"'})
+    assert gitlab.next(1, keyset, [], None) == 'https://gitlab.com/api/v4/projects/1/issues?id_after=9'
+    assert gitlab.request(gitlab.next(1, keyset, [], None))[1].endswith('id_after=9')
+
+    graphql = GraphqlPages('{{ repository {{ files (last: 100{files}) {{ edges }} }} }}', 'files')
+    assert graphql.request(graphql.first())[2]['json']['query'] == '{ repository { files (last: 100) { edges } } }'
+    assert 'before: "abc"' in graphql.request('abc')[2]['json']['query']
+    payload = {'data': {'repository': {'files': {
+        'edges': [{'node': {}}], 'pageInfo': {'hasPreviousPage': True, 'startCursor': 'abc'}
+    }}}}
+    assert graphql.outcome(make_response(200, b''), payload) == PAGE
+    assert graphql.items(payload) == [{'node': {}}]
+    assert graphql.next('', None, payload, None) == 'abc'
+    assert graphql.outcome(make_response(200, b''), {'errors': [{'type': 'NOT_FOUND'}]}) == NOT_FOUND
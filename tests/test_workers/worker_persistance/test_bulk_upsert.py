@@ -0,0 +1,117 @@
+#SPDX-License-Identifier: MIT
+import logging
+import sqlalchemy as s
+
+from workers.copy_stream import CopyStream
+from workers.worker_persistance import Persistant
+
+def test_copy_stream_encodes_rows_lazily():
+    pulled = []
+    def rows():
+        for row in [
+            {'gh_issue_id': 1, 'title': 'a\x00b\tc\\', 'labels': [{'name': 'bug'}], 'score': 0.5},
+            {'gh_issue_id': 2.0, 'title': None, 'labels': None, 'score': float('nan')},
+            {'gh_issue_id': 3, 'title': 'line\nbreak', 'locked': True}
+        ]:
+            pulled.append(row)
+            yield row
+
+    stream = CopyStream(rows(), ['gh_issue_id', 'title', 'labels', 'score'], chunk_size=8)
+    first = stream.read(8)
+    assert len(first) == 8
+    assert len(pulled) == 1
+
+    rest = b''.join(iter(lambda: stream.read(8), b''))
+    assert first + rest == (
+        b'1\ta\xef\xbf\xbdb\\tc\\\\\t[{"name": "bug"}]\t0.5\n'
+        b'2\t\\N\t\\N\t\\N\n'
+        b'3\tline\\nbreak\t\\N\t\\N\n'
+    )
+    assert stream.rows_written == 3
+
+def test_has_unique_key():
+    persistant = Persistant.__new__(Persistant)
+    table = s.Table('issues', s.MetaData(),
+        s.Column('issue_id', s.BigInteger, primary_key=True),
+        s.Column('gh_issue_id', s.BigInteger),
+        s.Column('repo_id', s.BigInteger),
+        s.Column('issue_title', s.String),
+        s.UniqueConstraint('gh_issue_id', 'repo_id'))
+
+    assert persistant._has_unique_key(table, ['repo_id', 'gh_issue_id'])
+    assert persistant._has_unique_key(table, ['issue_id'])
+    assert not persistant._has_unique_key(table, ['gh_issue_id'])
+
+class FakeCursor:
+    def __init__(self, rowcounts):
+        self.statements = []
+        self.rowcounts = rowcounts
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.statements.append(' '.join(sql.split()))
+        self.rowcount = self.rowcounts.pop(0) if self.statements[-1].startswith(('INSERT', 'DELETE')) else 0
+
+    def copy_expert(self, sql, stream, size):
+        while stream.read(size):
+            pass
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakeEngine:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def raw_connection(self):
+        return FakeConnection(self.cursor)
+
+def staged_insert(table, rows, unique_columns, rowcounts):
+    persistant = Persistant.__new__(Persistant)
+    persistant.db_schema = 'augur_data'
+    persistant.db = FakeEngine(FakeCursor(rowcounts))
+    persistant.logger = logging.getLogger('test_bulk_upsert')
+    return persistant._bulk_insert_staged(table, rows, unique_columns), persistant.db.cursor.statements[-1]
+
+def test_staged_insert_targets_the_natural_key(caplog):
+    metadata = s.MetaData()
+    labels = s.Table('issue_labels', metadata,
+        s.Column('issue_label_id', s.BigInteger, primary_key=True),
+        s.Column('label_src_id', s.BigInteger),
+        s.UniqueConstraint('label_src_id'), schema='augur_data')
+    events = s.Table('contributor_repo', metadata,
+        s.Column('cntrb_repo_id', s.BigInteger, primary_key=True),
+        s.Column('event_id', s.BigInteger), schema='augur_data')
+    rows = [{'label_src_id': 1}, {'label_src_id': 1}, {'label_src_id': 2}]
+
+    with caplog.at_level(logging.INFO):
+        inserted, sql = staged_insert(labels, rows, ['label_src_id'], [1, 1])
+    assert inserted == 1
+    assert sql.endswith('ON CONFLICT ("label_src_id") DO NOTHING')
+    assert 'Skipped 2 of 3 rows for issue_labels: 1 repeated a natural key of the batch and 1 already existed' in caplog.text
+
+    _, sql = staged_insert(events, [{'event_id': 1}], 'event_id', [0, 1])
+    assert sql.endswith('WHERE NOT EXISTS (SELECT 1 FROM "augur_data"."contributor_repo" AS target '
+        'WHERE target."event_id" = staged."event_id")')
+
+    _, sql = staged_insert(events, [{'event_id': 1}], [], [1])
+    assert sql.endswith('ON CONFLICT DO NOTHING')
@@ -0,0 +1,69 @@
+#SPDX-License-Identifier: MIT
+import datetime
+
+from workers.change_detection import ChangeIndex
+
+action_map = {
+    'insert': {
+        'source': ['id'],
+        'augur': ['gh_issue_id']
+    },
+    'update': {
+        'source': ['state', 'updated_at'],
+        'augur': ['issue_state', 'updated_at']
+    }
+}
+
+def test_split_finds_new_and_changed_rows():
+    index = ChangeIndex(action_map).add_all([
+        {'gh_issue_id': 1, 'issue_state': 'open', 'updated_at': datetime.datetime(2021, 1, 1)},
+        {'gh_issue_id': 2, 'issue_state': 'open', 'updated_at': datetime.datetime(2021, 1, 1)}
+    ])
+    need_insertion, need_update = index.split([
+        {'id': 1, 'state': 'open', 'updated_at': '2021-01-01T00:00:00Z'},
+        {'id': 2.0, 'state': 'closed', 'updated_at': '2021-01-02T00:00:00Z'},
+        {'id': 3, 'state': 'open', 'updated_at': '2021-01-02T00:00:00Z'},
+        {'id': None, 'state': 'open', 'updated_at': '2021-01-02T00:00:00Z'}
+    ])
+
+    assert need_insertion == [{'id': 3, 'state': 'open', 'updated_at': '2021-01-02T00:00:00Z'}]
+    assert need_update == [{
+        'id': 2.0, 'state': 'closed', 'updated_at': '2021-01-02T00:00:00Z',
+        'issue_state': 'closed', 'b_gh_issue_id': 2.0
+    }]
+
+def test_split_without_update_columns():
+    index = ChangeIndex({'insert': {'source': ['user.login'], 'augur': ['cntrb_login']}})
+    index.add({'cntrb_login': 'octocat'})
+
+    assert index.split([{'user': {'login': 'octocat'}}, {'user': {'login': 'hubot'}}]) == (
+        [{'user': {'login': 'hubot'}}], []
+    )
+
+def test_only_stored_rows_are_remembered():
+    index = ChangeIndex(action_map)
+    page = [{'id': 1, 'state': 'open', 'updated_at': '2021-01-01T00:00:00Z'}]
+    need_insertion, _ = index.split(page)
+    assert index.split(page) == (need_insertion, [])
+
+    index.remember([{'gh_issue_id': 1, 'issue_state': 'open', 'updated_at': '2021-01-01T00:00:00Z'}])
+    assert len(index) == 1
+    assert index.split(page) == ([], [])
+
+    _, need_update = index.split([{'id': 1, 'state': 'closed', 'updated_at': '2021-01-01T00:00:00Z'}])
+    assert need_update[0]['issue_state'] == 'closed'
+    index.remember(need_update, 'b_')
+    assert index.split([{'id': 1, 'state': 'closed', 'updated_at': '2021-01-01T00:00:00Z'}]) == ([], [])
+
+def test_timestamps_match_whatever_their_precision_or_offset():
+    index = ChangeIndex(action_map).add_all([
+        {'gh_issue_id': 1, 'issue_state': 'open', 'updated_at': datetime.datetime(2021, 1, 1, 12, 30, 5)},
+        {'gh_issue_id': 2, 'issue_state': 'open',
+            'updated_at': datetime.datetime(2021, 1, 1, 12, 30, 5, 250000, tzinfo=datetime.timezone.utc)}
+    ])
+
+    assert index.split([
+        {'id': 1, 'state': 'open', 'updated_at': '2021-01-01T12:30:05.123Z'},
+        {'id': 2, 'state': 'open', 'updated_at': '2021-01-01T14:30:05+02:00'}
+    ]) == ([], [])
+    assert len(index.split([{'id': 1, 'state': 'open', 'updated_at': '2021-01-01T12:30:06+00:00'}])[1]) == 1
@@ -0,0 +1,165 @@
+#SPDX-License-Identifier: MIT
+"""
+Decides which collected rows need to be inserted or updated from the natural keys and a
+short hash of the update columns of the rows already in the database
+"""
+import datetime
+import decimal
+import hashlib
+import math
+import re
+
+# Bytes kept per existing row to tell whether its update columns changed
+HASH_SIZE = 8
+
+# ISO 8601 timestamps as the APIs and the database render them, with or without fractional
+# seconds and a Z or numeric UTC offset
+ISO_TIMESTAMP = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.\d+)?(?:(Z)|([+-])(\d{2}):?(\d{2}))?$'
+)
+
+def get_source_value(row, column):
+    """ Value of a source column, following dotted names like user.login into nested dicts
+    """
+    if column in row:
+        return row[column]
+    value = row
+    for attribute in column.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(attribute)
+    return value
+
+def normalize_value(value):
+    """ Common text form of a value as the API returns it and as it comes back from the database,
+        so an id stored as a bigint matches the same id in the JSON and a timestamp matches its
+        ISO string
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, str):
+        value = parse_timestamp(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (float, decimal.Decimal)) and math.isfinite(value) and value == int(value):
+        return str(int(value))
+    return str(value)
+
+def parse_timestamp(value):
+    """ The datetime an ISO timestamp string stands for, so it normalizes like the datetime the
+        database returns for it whatever its precision or offset. Other strings are returned as is
+    """
+    match = ISO_TIMESTAMP.match(value)
+    if match is None:
+        return value
+    year, month, day, hour, minute, second, _, sign, offset_hours, offset_minutes = match.groups()
+    try:
+        parsed = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+    except ValueError:
+        return value
+    if sign:
+        offset = datetime.timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+        parsed -= offset if sign == '+' else -offset
+    return parsed
+
+def row_key(values):
+    """ Natural key of a row, None when part of it is missing since such rows can never match
+    """
+    key = tuple(normalize_value(value) for value in values)
+    if None in key:
+        return None
+    return key[0] if len(key) == 1 else key
+
+def row_hash(values):
+    """ Short digest of the update columns of a row
+    """
+    digest = hashlib.blake2b(digest_size=HASH_SIZE)
+    for value in values:
+        value = normalize_value(value)
+        digest.update(b'\x00' if value is None else b'\x01' + value.encode('utf-8', 'replace') + b'\x1f')
+    return digest.digest()
+
+class ChangeIndex():
+    """
+    Natural keys of the rows already in a table, each mapped to a hash of its update columns
+
+    Only the keys and HASH_SIZE bytes per row are held, instead of every column the action map
+    mentions in a DataFrame, so looking up a page of collected rows is a dict lookup per row.
+    """
+
+    def __init__(self, action_map):
+        """
+        :param action_map: Dict, the `insert` and optionally `update` entries map the `source`
+            fields of the collected rows to the `augur` columns of the table
+        """
+        self.key_columns = action_map['insert']['augur']
+        self.key_sources = action_map['insert']['source']
+        self.update_columns = action_map['update']['augur'] if 'update' in action_map else []
+        self.update_sources = action_map['update']['source'] if 'update' in action_map else []
+        self.hashes = {}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, row):
+        """ Adds a row of the table, any mapping with the key and update columns of the action map
+        """
+        key = row_key([row[column] for column in self.key_columns])
+        if key is not None:
+            self.hashes[key] = row_hash([row[column] for column in self.update_columns])
+
+    def add_all(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def remember(self, rows, key_prefix=''):
+        """ Records rows that were stored in the table, so later lookups of the same task do not report
+            them again
+
+            :param rows: List of dicts with the columns of the table, as bulk_insert takes them
+            :param key_prefix: String, prefix of the natural key columns, b_ for updates
+        """
+        for row in rows:
+            key = row_key([row.get(key_prefix + column) for column in self.key_columns])
+            if key is not None:
+                self.hashes[key] = row_hash([row.get(column) for column in self.update_columns])
+
+    def split(self, new_data):
+        """ Splits collected rows into the ones missing from the table and the ones whose update
+            columns differ from the stored row, in the format bulk_insert takes
+
+            :param new_data: List of dicts, rows as they were collected
+            :returns: List of dicts, rows that need to be inserted, and List of dicts, rows that
+                need to be updated as returned by as_update
+        """
+        need_insertion = []
+        need_update = []
+        for row in new_data:
+            key_values = [get_source_value(row, column) for column in self.key_sources]
+            key = row_key(key_values)
+            if key is None:
+                continue
+            if key not in self.hashes:
+                need_insertion.append(row)
+                continue
+            if not self.update_columns:
+                continue
+            update_values = [get_source_value(row, column) for column in self.update_sources]
+            if row_hash(update_values) != self.hashes[key]:
+                need_update.append(self.as_update(row))
+        return need_insertion, need_update
+
+    def as_update(self, row):
+        """ A collected row with its update columns and its natural key prefixed with b_ added under
+            the names of the table, as bulk_insert takes updates
+        """
+        return {
+            **row,
+            **{column: get_source_value(row, source) for column, source in zip(self.update_columns, self.update_sources)},
+            **{'b_{}'.format(column): get_source_value(row, source) for column, source in zip(self.key_columns, self.key_sources)}
+        }
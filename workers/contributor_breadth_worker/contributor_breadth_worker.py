@@ -85,26 +85,6 @@ class ContributorBreadthWorker(WorkerGitInterfaceable):
         # Because of Bulk Insert
         # keyVal = event_id
 
-        ########################################################
-        # Query for existing event ids to avoid duplication
-        ########################################################
-
-        dup_query = s.sql.text("""
-            SELECT DISTINCT event_id 
-            FROM augur_data.contributor_repo
-            WHERE 1 = 1
-        """)
-
-        current_event_ids = json.loads(pd.read_sql(dup_query, self.db, \
-            params={}).to_json(orient="records"))
-        
-        #Convert list of dictionaries to regular list of 'event_ids'. 
-        #The only values that the sql query returns are event_ids so
-        #it makes no sense to be a list of many dicts of one key.
-        current_event_ids = [value for elem in current_event_ids for value in elem.values()]
-
-        self.logger.info(f"current event ids are: {current_event_ids}")
-
         cntrb_repos_insert = []
 
         for cntrb in current_cntrb_logins:
@@ -120,49 +100,40 @@ class ContributorBreadthWorker(WorkerGitInterfaceable):
               self.logger.info("There are no events, or new events for this user.\n") 
               continue 
             else:  
-              ## current_event_ids are the ones ALREADY IN THE AUGUR DB. SKIP THOSE.
-              ## source_cntrb_events are the ones the API pulls. 
+              ## source_cntrb_events are the ones the API pulls, events already in the
+              ## augur db are skipped by bulk_upsert.
               for event_id_api in source_cntrb_events['all']:
                 self.logger.info(f"Keys of event_id_api: {event_id_api.keys()}")
-                #self.logger.info(f"Keys of current_event_ids: {current_event_ids.keys()}")
-                if int(event_id_api['id']) in current_event_ids: 
-                  continue 
-                else: 
-                #self.register_task_completion(task, repo_id, 'contributor_breadth')             
-                  cntrb_repos_insert.append({
-                          "cntrb_id": cntrb['cntrb_id'],
-                          "repo_git": event_id_api['repo']['url'],
-                          "tool_source": self.tool_source,
-                          "tool_version": self.tool_version,
-                          "data_source": self.data_source,
-                          "repo_name": event_id_api['repo']['name'],
-                          "gh_repo_id": event_id_api['repo']['id'],
-                          "cntrb_category": event_id_api['type'],
-                          "event_id": event_id_api['id'],
-                          "created_at": event_id_api['created_at']
-
-                    })
-                  
-                  #Use this instead of the bulk insert if that is needed in the future.
-                  # (i.e., if an initial scan uses too much RAM on a large repo.)
-                  """"
-                  self.db.execute(self.contributor_repo_table.insert().values({
-                          "cntrb_id": cntrb['cntrb_id'],
-                          "repo_git": cntrb_repo['repo']['url'],
-                          "tool_source": self.tool_source,
-                          "tool_version": self.tool_version,
-                          "data_source": self.data_source,
-                          "repo_name": cntrb_repo['repo']['name'],
-                          "gh_repo_id": cntrb_repo['repo']['id'],
-                          "cntrb_category": cntrb_repo['type'],
-                          "event_id": cntrb_repo['id'],
-                          "created_at": cntrb_repo['created_at']
-
-                    }))"""
-
-            # else:
-            #     # Print the message if the value does not exist
-            #     self.logger.info(f"event_id is found in JSON data {current_event_ids[event_id]}.")
+                cntrb_repos_insert.append({
+                        "cntrb_id": cntrb['cntrb_id'],
+                        "repo_git": event_id_api['repo']['url'],
+                        "tool_source": self.tool_source,
+                        "tool_version": self.tool_version,
+                        "data_source": self.data_source,
+                        "repo_name": event_id_api['repo']['name'],
+                        "gh_repo_id": event_id_api['repo']['id'],
+                        "cntrb_category": event_id_api['type'],
+                        "event_id": event_id_api['id'],
+                        "created_at": event_id_api['created_at']
+
+                  })
+                
+                #Use this instead of the bulk insert if that is needed in the future.
+                # (i.e., if an initial scan uses too much RAM on a large repo.)
+                """"
+                self.db.execute(self.contributor_repo_table.insert().values({
+                        "cntrb_id": cntrb['cntrb_id'],
+                        "repo_git": cntrb_repo['repo']['url'],
+                        "tool_source": self.tool_source,
+                        "tool_version": self.tool_version,
+                        "data_source": self.data_source,
+                        "repo_name": cntrb_repo['repo']['name'],
+                        "gh_repo_id": cntrb_repo['repo']['id'],
+                        "cntrb_category": cntrb_repo['type'],
+                        "event_id": cntrb_repo['id'],
+                        "created_at": cntrb_repo['created_at']
+
+                  }))"""
 
         ########################################################
         # Do the Inserts
@@ -171,8 +142,9 @@ class ContributorBreadthWorker(WorkerGitInterfaceable):
         #cntrb_repos_insert = []
         #cntrb_ids_idx = pd.Index(cntrb_ids, name=contributors)
 
-        cntrb_repo_insert_result, cntrb_repo_update_result = self.bulk_insert(self.contributor_repo_table,
-                     unique_columns='event_id', insert=cntrb_repos_insert)
+        # Events never change, so existing ones are left alone and only new event ids are inserted
+        self.bulk_upsert(self.contributor_repo_table, cntrb_repos_insert,
+                     unique_columns=['event_id'], update_columns=[])
 
         self.register_task_completion(task, '0', 'contributor_breadth')
 
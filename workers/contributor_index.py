@@ -0,0 +1,79 @@
+#SPDX-License-Identifier: MIT
+"""
+cntrb_ids of the contributors already in the database, looked up by their platform identities
+"""
+import time
+
+from workers.change_detection import normalize_value
+
+# Columns of the contributors table the index is loaded from
+INDEX_COLUMNS = ['cntrb_id', 'gh_user_id', 'gh_node_id', 'cntrb_login', 'cntrb_canonical']
+
+# Seconds a worker keeps using its index across tasks before loading it again, 0 loads it every task
+DEFAULT_INDEX_TTL = 0
+
+class ContributorIndex():
+    """
+    Maps the GitHub user id, node id, login and canonical email of every contributor to its
+    cntrb_id, so enriching a row is a dict lookup instead of a scan of the contributors table
+
+    Logins and emails are matched case-insensitively, like GitHub does, while node ids are base64
+    and matched exactly. Contributors inserted while the index is in use are added to it with add.
+    """
+
+    def __init__(self):
+        self.by_user_id = {}
+        self.by_node_id = {}
+        self.by_login = {}
+        self.by_email = {}
+        self.size = 0
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return self.size
+
+    def add(self, row):
+        """ Adds a contributor, any mapping with its cntrb_id and some of the other INDEX_COLUMNS
+        """
+        if not isinstance(row, dict):
+            row = dict(row)
+        cntrb_id = row['cntrb_id']
+        if cntrb_id is None:
+            return
+        self.size += 1
+        for lookup, column, fold_case in (
+            (self.by_user_id, 'gh_user_id', False), (self.by_node_id, 'gh_node_id', False),
+            (self.by_login, 'cntrb_login', True), (self.by_email, 'cntrb_canonical', True)
+        ):
+            key = self.key(row.get(column), fold_case)
+            if key is not None:
+                lookup[key] = cntrb_id
+
+    def add_all(self, rows):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def key(self, value, fold_case=False):
+        value = normalize_value(value)
+        if not value:
+            return None
+        return value.lower() if fold_case else value
+
+    def expired(self, ttl):
+        return time.monotonic() - self.loaded_at > ttl
+
+    def lookup(self, gh_user_id=None, gh_node_id=None, login=None, email=None):
+        """ cntrb_id of the contributor matching the first of the given identities that is indexed,
+            ids first since logins and emails can change hands
+
+            :returns: cntrb_id, or None if no identity is indexed
+        """
+        for lookup, value, fold_case in (
+            (self.by_user_id, gh_user_id, False), (self.by_node_id, gh_node_id, False),
+            (self.by_login, login, True), (self.by_email, email, True)
+        ):
+            key = self.key(value, fold_case)
+            if key is not None and key in lookup:
+                return lookup[key]
+        return None
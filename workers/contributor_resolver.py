@@ -0,0 +1,236 @@
+#SPDX-License-Identifier: MIT
+"""
+Looks up GitHub users by login in batches, with one aliased user field per login in a single
+GraphQL query, turns them into rows of the contributors table, and queues the lookups of
+every worker so one worker makes them
+"""
+import contextlib
+import json
+
+import sqlalchemy as s
+
+from workers.pagination import classify_response, PAGE, RATE_LIMITED
+
+# Users looked up per query, GitHub allows at most 100 nodes in the top level of a query
+DEFAULT_BATCH_SIZE = 100
+
+# Days the resolution queue keeps the cntrb_id a login resolved to, or that GitHub does not know it
+DEFAULT_RESOLUTION_TTL = 7
+
+# Advisory locks of the worker resolving the queue, and of inserting contributors
+QUEUE_LOCK = 62390001
+WRITE_LOCK = 62390002
+
+# Fields of a GraphQL User that map to columns of the contributors table
+USER_FIELDS = 'databaseId id login email company location createdAt updatedAt name avatarUrl url isSiteAdmin'
+
+def batches(items, size=DEFAULT_BATCH_SIZE):
+    """ Splits a list into tuples of at most size items
+    """
+    return [tuple(items[start:start + size]) for start in range(0, len(items), size)]
+
+def user_query(logins):
+    return '{ ' + ' '.join(
+        'u{}: user(login: {}) {{ {} }}'.format(position, json.dumps(login), USER_FIELDS)
+        for position, login in enumerate(logins)
+    ) + ' }'
+
+def from_graphql(user):
+    """ A GraphQL User in the shape the REST API returns users in
+    """
+    login = user['login']
+    api_url = f"https://api.github.com/users/{login}"
+    return {
+        'login': login,
+        'id': user['databaseId'],
+        'node_id': user['id'],
+        'created_at': user['createdAt'],
+        'updated_at': user['updatedAt'],
+        'email': user['email'] or None,
+        'company': user['company'],
+        'location': user['location'],
+        'name': user['name'],
+        'url': api_url,
+        'html_url': user['url'],
+        'avatar_url': user['avatarUrl'],
+        'gravatar_id': '',
+        'followers_url': f"{api_url}/followers",
+        'following_url': f"{api_url}/following{{/other_user}}",
+        'gists_url': f"{api_url}/gists{{/gist_id}}",
+        'starred_url': f"{api_url}/starred{{/owner}}{{/repo}}",
+        'subscriptions_url': f"{api_url}/subscriptions",
+        'organizations_url': f"{api_url}/orgs",
+        'repos_url': f"{api_url}/repos",
+        'events_url': f"{api_url}/events{{/privacy}}",
+        'received_events_url': f"{api_url}/received_events",
+        'type': 'User',
+        'site_admin': user['isSiteAdmin']
+    }
+
+def contributor_row(user, tool_source, tool_version, data_source, defaults={}):
+    """ Row of the contributors table for a user as the REST API returns it
+
+        :param defaults: Dict, values of columns the user has no value for, like the email and name
+            of the commit the user was found through
+    """
+    row = {
+        "cntrb_login": user['login'],
+        "cntrb_created_at": user['created_at'],
+        "cntrb_email": user.get('email'),
+        "cntrb_company": user.get('company'),
+        "cntrb_location": user.get('location'),
+        # "cntrb_type": , dont have a use for this as of now ... let it default to null
+        "cntrb_canonical": user.get('email'),
+        "gh_user_id": user['id'],
+        "gh_login": str(user['login']),
+        "gh_url": user['url'],
+        "gh_html_url": user['html_url'],
+        "gh_node_id": user['node_id'],
+        "gh_avatar_url": user['avatar_url'],
+        "gh_gravatar_id": user['gravatar_id'],
+        "gh_followers_url": user['followers_url'],
+        "gh_following_url": user['following_url'],
+        "gh_gists_url": user['gists_url'],
+        "gh_starred_url": user['starred_url'],
+        "gh_subscriptions_url": user['subscriptions_url'],
+        "gh_organizations_url": user['organizations_url'],
+        "gh_repos_url": user['repos_url'],
+        "gh_events_url": user['events_url'],
+        "gh_received_events_url": user['received_events_url'],
+        "gh_type": user['type'],
+        "gh_site_admin": user['site_admin'],
+        "cntrb_last_used": user.get('updated_at'),
+        "cntrb_full_name": user.get('name'),
+        "tool_source": tool_source,
+        "tool_version": tool_version,
+        "data_source": data_source
+    }
+    for column, value in defaults.items():
+        if row.get(column) is None:
+            row[column] = value
+    return row
+
+class UserQuery():
+    """
+    Batch of users looked up by login in one GraphQL query, requested through
+    WorkerGitInterfaceable.fetch_page with the tuple of logins as the state
+
+    Logins that are not Users, like organizations and bots, come back as null with a
+    NOT_FOUND error next to the users that were found.
+    """
+    numbered = False
+    url = 'https://api.github.com/graphql'
+
+    def request(self, logins):
+        return 'POST', self.url, {'json': {'query': user_query(logins)}}
+
+    def outcome(self, response, payload):
+        if isinstance(payload, dict) and isinstance(payload.get('data'), dict):
+            return PAGE
+        if isinstance(payload, dict) and any(
+            error.get('type') == 'RATE_LIMITED' for error in payload.get('errors') or []
+        ):
+            return RATE_LIMITED
+        return classify_response(response, payload)
+
+    def users(self, payload, logins):
+        """ Users of a response in the shape the REST API returns them, by the login they were
+            requested with
+        """
+        return {
+            login: from_graphql(payload['data'][f'u{position}'])
+            for position, login in enumerate(logins) if payload['data'].get(f'u{position}')
+        }
+
+class ResolutionQueue():
+    """
+    Users workers need contributors for, shared by every worker through the
+    augur_operations.worker_contributor_request table
+
+    Workers submit logins and take the cntrb_ids that are already settled without waiting.
+    Whichever worker holds the queue's advisory lock resolves what every worker submitted, so a user is looked up and
+    inserted once instead of by every worker that runs into it at the same time. Results are
+    kept for ttl days and serve as a shared lookup of login to cntrb_id. Logins that could not
+    be looked up, like when every key is rate limited, stay pending until a worker resolves them.
+    """
+
+    def __init__(self, engine, logger, ttl=DEFAULT_RESOLUTION_TTL):
+        """
+        :param engine: SQLAlchemy engine of the augur_operations schema
+        """
+        self.engine = engine
+        self.logger = logger
+        self.ttl = ttl
+
+    def submit(self, logins):
+        """ Adds logins to the queue, and queues expired results again
+
+            :param logins: List of lowercased logins
+        """
+        self.engine.execute(s.sql.text("""
+            INSERT INTO augur_operations.worker_contributor_request AS request (login)
+            SELECT DISTINCT unnest(CAST(:logins AS TEXT[]))
+            ON CONFLICT (login) DO UPDATE SET
+                requested_at = CURRENT_TIMESTAMP,
+                cntrb_id = CASE WHEN request.settled_at < now() - make_interval(days => :ttl)
+                    THEN NULL ELSE request.cntrb_id END,
+                settled_at = CASE WHEN request.settled_at < now() - make_interval(days => :ttl)
+                    THEN NULL ELSE request.settled_at END
+        """), logins=logins, ttl=self.ttl)
+
+    def results(self, logins):
+        """ Results of the logins the queue has settled
+
+            :returns: Dict, cntrb_id of each settled login, None for users that could not be found
+        """
+        return {
+            row['login']: row['cntrb_id'] for row in self.engine.execute(s.sql.text("""
+                SELECT login, cntrb_id FROM augur_operations.worker_contributor_request
+                WHERE login = ANY(CAST(:logins AS TEXT[])) AND settled_at IS NOT NULL
+            """), logins=logins).fetchall()
+        }
+
+    def pending(self, limit=None):
+        """ Logins waiting to be resolved, oldest request first, all of them if limit is None
+        """
+        return [row['login'] for row in self.engine.execute(s.sql.text("""
+            SELECT login FROM augur_operations.worker_contributor_request
+            WHERE settled_at IS NULL
+            ORDER BY requested_at
+            LIMIT :limit
+        """), limit=limit).fetchall()]
+
+    def settle(self, logins, cntrb_ids, not_found=()):
+        """ Records the results of resolving logins. Logins that are neither resolved nor known
+            not to exist stay pending
+
+            :param cntrb_ids: Dict, cntrb_id of each login that was resolved
+            :param not_found: Collection of the logins GitHub does not know
+        """
+        logins = [login for login in logins if login in cntrb_ids or login in not_found]
+        if not logins:
+            return
+        self.engine.execute(s.sql.text("""
+            UPDATE augur_operations.worker_contributor_request AS request
+            SET cntrb_id = result.cntrb_id, settled_at = CURRENT_TIMESTAMP
+            FROM unnest(CAST(:logins AS TEXT[]), CAST(:cntrb_ids AS BIGINT[])) AS result (login, cntrb_id)
+            WHERE request.login = result.login
+        """), logins=logins, cntrb_ids=[cntrb_ids.get(login) for login in logins])
+
+    @contextlib.contextmanager
+    def lead(self):
+        """ Context in which the worker resolves the queue for every worker if it got the queue's lock
+
+            :returns: Boolean, whether this worker got the lock
+        """
+        connection = self.engine.connect()
+        leader = False
+        try:
+            leader = connection.execute(
+                s.sql.text("SELECT pg_try_advisory_lock(:key)"), key=QUEUE_LOCK
+            ).scalar()
+            yield leader
+        finally:
+            if leader:
+                connection.execute(s.sql.text("SELECT pg_advisory_unlock(:key)"), key=QUEUE_LOCK)
+            connection.close()
@@ -0,0 +1,99 @@
+#SPDX-License-Identifier: MIT
+"""
+Streams rows into postgres' COPY FROM STDIN without building the whole load in memory
+"""
+import datetime
+import json
+import math
+
+# Bytes encoded ahead of what COPY asked for, the most the stream holds at once
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+COPY_NULL = b'\\N'
+
+# Characters with a meaning in COPY's text format, NUL is not allowed in postgres text at all
+TEXT_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\t': '\\t',
+    '\x00': '\ufffd'
+})
+
+def encode_copy_value(value):
+    """ Encodes a single value in COPY's text format
+
+    Nested dicts and lists become JSON, NaN becomes NULL and whole floats are written as
+    integers, so values that went through pandas still load into integer columns.
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return b't' if value else b'f'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return COPY_NULL
+        if value.is_integer():
+            return str(int(value)).encode()
+        return repr(value).encode()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        value = value.isoformat()
+    elif isinstance(value, bytes):
+        return b'\\\\x' + value.hex().encode()
+    elif not isinstance(value, str):
+        value = str(value)
+    return value.translate(TEXT_ESCAPES).encode('utf-8')
+
+def encode_copy_row(row, columns):
+    """ Encodes one row, a dict keyed by column name or a sequence in column order, as a line of COPY text
+    """
+    values = [row.get(column) for column in columns] if isinstance(row, dict) else row
+    return b'\t'.join(encode_copy_value(value) for value in values) + b'\n'
+
+class CopyStream():
+    """
+    File-like object that psycopg2's copy_expert reads a COPY FROM STDIN load from
+
+    Rows are pulled from the iterator and encoded only when COPY asks for more data, so at
+    most about `chunk_size` bytes of the load are in memory at any time, no matter how many
+    rows the iterator yields.
+    """
+
+    def __init__(self, rows, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param rows: Iterable of dicts or sequences, the rows to load
+        :param columns: List of strings, columns of the COPY statement, in order
+        """
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._rows = iter(rows)
+        self._buffer = bytearray()
+        self._exhausted = False
+
+    def _fill(self, size):
+        while not self._exhausted and (size < 0 or len(self._buffer) < size):
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                self._exhausted = True
+                break
+            self._buffer += encode_copy_row(row, self.columns)
+            self.rows_written += 1
+
+    def read(self, size=-1):
+        size = self.chunk_size if size is None or size < 0 else size
+        self._fill(size)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    def readline(self, size=-1):
+        while b'\n' not in self._buffer and not self._exhausted:
+            self._fill(len(self._buffer) + 1)
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return line
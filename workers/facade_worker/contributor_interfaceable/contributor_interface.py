@@ -8,56 +8,34 @@ from psycopg2.errors import UniqueViolation
 from random import randint
 import json
 import multiprocessing
+import threading
 import time
 import numpy as np
+from workers.copy_stream import CopyStream
+from workers.contributor_resolver import DEFAULT_BATCH_SIZE
 
 # Debugger
 import traceback
 
+# Days before a commit email and name that could not be resolved are looked up again, doubled
+# with every failed attempt up to MAX_RETRY_DAYS
+DEFAULT_RETRY_DAYS = 1
+MAX_RETRY_DAYS = 128
+
 #Method to parallelize, takes a queue of data and iterates over it.
 def process_commit_metadata(contributorQueue,interface,repo_id):
-    
-    for contributor in contributorQueue:
-        # Get the email from the commit data
-        email = contributor['email_raw'] if 'email_raw' in contributor else contributor['email']
-    
-        name = contributor['name']
 
-        # check the email to see if it already exists in contributor_aliases
-        try:
-            # Look up email to see if resolved
-            alias_table_data = interface.db.execute(
-                s.sql.select([s.column('alias_email')]).where(
-                    interface.contributors_aliases_table.c.alias_email == email
-                )
-            ).fetchall()
-            if len(alias_table_data) >= 1:
-                # Move on if email resolved
+    # Commits of the queue with the login they were resolved to
+    found = []
 
-                #interface.logger.info(
-                #    f"Email {email} has been resolved earlier.")
+    # Commits whose email and name GitHub answered without a login for. Lookups that were rate
+    # limited, timed out or errored are not recorded, so they are tried again on the next run
+    failed = []
 
-                continue
-        except Exception as e:
-            interface.logger.info(
-                f"alias table query failed with error: {e}")
-        
-        #Check the unresolved_commits table to avoid hitting endpoints that we know don't have relevant data needlessly
-        try:
-            unresolved_query_result = interface.db.execute(
-                s.sql.select([s.column('email'),s.column('name')]).where(
-                    interface.unresolved_commit_emails_table.c.name == name and interface.unresolved_commit_emails_table.c.email == email
-                )
-            ).fetchall()
-
-            if len(unresolved_query_result) >= 1:
-
-                #interface.logger.info(f"Commit data with email {email} has been unresolved in the past, skipping...")
-
-                continue
-        except Exception as e:
-            interface.logger.info(f"Failed to query unresolved alias table with error: {e}")
-    
+    # Emails that are already resolved, or failed recently, were filtered out of the queue for
+    # the whole repo by insert_facade_contributors
+    for contributor in contributorQueue:
+        name = contributor['name']
 
         login = None
     
@@ -76,116 +54,89 @@ def process_commit_metadata(contributorQueue,interface,repo_id):
             interface.logger.error(f"Failed local login lookup with error: {e}")
         
 
+        # Names of the lookups GitHub answered without a user
+        not_found = set()
+
         # Try to get the login from the commit sha
         if login == None or login == "":
-            login = interface.get_login_with_commit_hash(contributor, repo_id)
+            login = interface.get_login_with_commit_hash(contributor, repo_id, not_found=not_found)
     
         if login == None or login == "":
             # Try to get the login from supplemental data if not found with the commit hash
-            login = interface.get_login_with_supplemental_data(contributor)
+            login = interface.get_login_with_supplemental_data(contributor, not_found=not_found)
     
         if login == None:
+            if not_found >= {'commit', 'email', 'name'}:
+                failed.append(contributor)
             continue
 
-        url = ("https://api.github.com/users/" + login)
-
-        user_data = interface.request_dict_from_endpoint(url)
-
-        if user_data == None:
-            interface.logger.warning(
-                f"user_data was unable to be reached. Skipping...")
-            continue
+        found.append((contributor, login))
 
-        # Use the email found in the commit data if api data is NULL
-        emailFromCommitData = contributor['email_raw'] if 'email_raw' in contributor else contributor['email']
-
-        interface.logger.info(
-            f"Successfully retrieved data from github for email: {emailFromCommitData}")
-
-        # Get name from commit if not found by GitHub
-        name_field = contributor['commit_name'] if 'commit_name' in contributor else contributor['name']
+    aliases = []
+    for start in range(0, len(found), DEFAULT_BATCH_SIZE):
+        batch = found[start:start + DEFAULT_BATCH_SIZE]
 
+        # A batch that fails is left for the next run, the ones before and after it are still stored
         try:
+            # Look up the users of the batch at once, using the email and name found in the
+            # commit data if api data is NULL
+            missing_logins = set()
+            contributors = interface.resolve_contributors([login for _, login in batch], {
+                login.lower(): {
+                    'cntrb_canonical': contributor['email_raw'] if 'email_raw' in contributor else contributor['email'],
+                    'cntrb_full_name': contributor['commit_name'] if 'commit_name' in contributor else contributor['name']
+                } for contributor, login in batch
+            }, not_found=missing_logins)
+
+            batch_aliases = []
+            for contributor, login in batch:
+                email = contributor['email_raw'] if 'email_raw' in contributor else contributor['email']
+                cntrb = contributors.get(login.lower())
+
+                if cntrb is None:
+                    interface.logger.warning(
+                        f"user_data was unable to be reached for {login}. Skipping...")
+                    if login.lower() in missing_logins:
+                        failed.append(contributor)
+                    continue
 
-            # try to add contributor to database
-            cntrb = {
-                "cntrb_login": user_data['login'],
-                "cntrb_created_at": user_data['created_at'],
-                "cntrb_email": user_data['email'] if 'email' in user_data else None,
-                "cntrb_company": user_data['company'] if 'company' in user_data else None,
-                "cntrb_location": user_data['location'] if 'location' in user_data else None,
-                # "cntrb_type": , dont have a use for this as of now ... let it default to null
-                "cntrb_canonical": user_data['email'] if 'email' in user_data and user_data['email'] is not None else emailFromCommitData,
-                "gh_user_id": user_data['id'],
-                "gh_login": user_data['login'],
-                "gh_url": user_data['url'],
-                "gh_html_url": user_data['html_url'],
-                "gh_node_id": user_data['node_id'],
-                "gh_avatar_url": user_data['avatar_url'],
-                "gh_gravatar_id": user_data['gravatar_id'],
-                "gh_followers_url": user_data['followers_url'],
-                "gh_following_url": user_data['following_url'],
-                "gh_gists_url": user_data['gists_url'],
-                "gh_starred_url": user_data['starred_url'],
-                "gh_subscriptions_url": user_data['subscriptions_url'],
-                "gh_organizations_url": user_data['organizations_url'],
-                "gh_repos_url": user_data['repos_url'],
-                "gh_events_url": user_data['events_url'],
-                "gh_received_events_url": user_data['received_events_url'],
-                "gh_type": user_data['type'],
-                "gh_site_admin": user_data['site_admin'],
-                "cntrb_last_used": None if 'updated_at' not in user_data else user_data['updated_at'],
-                # Get name from commit if api doesn't get it.
-                "cntrb_full_name": name_field if 'name' not in user_data or user_data['name'] is None else user_data['name'],
-                "tool_source": interface.tool_source,
-                "tool_version": interface.tool_version,
-                "data_source": interface.data_source
-            }
-
-        # interface.logger.info(f"{cntrb}")
+                interface.logger.info(
+                    f"Successfully retrieved data from github for email: {email}")
+                batch_aliases.append({
+                    'cntrb_id': cntrb['cntrb_id'],
+                    'alias_email': email,
+                    'canonical_email': cntrb['cntrb_canonical'] if cntrb['cntrb_canonical'] is not None else email
+                })
+
+            # Aliases go in after the contributors so they have a cntrb_id to point to
+            interface.insert_aliases(batch_aliases)
+            aliases += batch_aliases
         except Exception as e:
-            interface.logger.info(f"Error when trying to create cntrb: {e}")
-            continue
-        # Check if the github login exists in the contributors table and add the emails to alias' if it does.
-
-        # Also update the contributor record with commit data if we can.
-        try:
-            if not interface.resolve_if_login_existing(cntrb):
-                try:
-                    interface.db.execute(
-                        interface.contributors_table.insert().values(cntrb))
-                except Exception as e:
-                    interface.logger.info(
-                        f"Ran into likely database collision. Assuming contributor exists in database. Error: {e}")
-            else:
-                interface.update_contributor(cntrb)
-
-            # Update alias after insertion. Insertion needs to happen first so we can get the autoincrementkey
-            interface.insert_alias(cntrb, emailFromCommitData)
-        except LookupError as e:
-            interface.logger.info(
-                ''.join(traceback.format_exception(None, e, e.__traceback__)))
-            interface.logger.info(
-                f"Contributor id not able to be found in database despite the user_id existing. Something very wrong is happening. Error: {e}")
-            return 
-
-        # Resolve any unresolved emails if we get to this point.
-        # They will get added to the alias table later
-        # Do this last to absolutely make sure that the email was resolved before we remove it from the unresolved table.
-        query = s.sql.text("""
-            DELETE FROM unresolved_commit_emails
-            WHERE email='{}'
-        """.format(email))
-
-        interface.logger.info(f"Updating now resolved email {email}")
-
+            interface.logger.error(f"Resolving the contributors of {len(batch)} commits failed with error: {e}")
+
+    resolved_emails = [alias['alias_email'] for alias in aliases]
+    try:
+        interface.record_resolution_attempts(
+            [(contributor['email_raw'] if 'email_raw' in contributor else contributor['email'], contributor['name'])
+                for contributor in failed],
+            resolved_emails
+        )
+    except Exception as e:
+        interface.logger.error(f"Recording the resolution attempts failed with error: {e}")
+
+    # Resolve any unresolved emails if we get to this point.
+    # Do this last to absolutely make sure that the email was resolved before we remove it from the unresolved table.
+    if resolved_emails:
+        interface.logger.info(f"Updating {len(resolved_emails)} now resolved emails")
         try:
-            interface.db.execute(query)
+            interface.db.execute(s.sql.text("""
+                DELETE FROM unresolved_commit_emails
+                WHERE email = ANY(:emails)
+            """), emails=resolved_emails)
         except Exception as e:
             interface.logger.info(
-                f"Deleting now resolved email failed with error: {e}")
-    
-    
+                f"Deleting now resolved emails failed with error: {e}")
+
     return
 
 
@@ -271,7 +222,18 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
             # 'port': self.augur_config.get_value('Workers', 'contributor_interface')
         })
 
-        
+
+        # State WorkerGitInterfaceable.__init__ would set up, which this class does not call
+        self.headers = None
+        self.http_cache = None
+        self.key_pool = None
+        self.http_client = None
+        self.contributor_index = None
+        self.contributor_queue = None
+        self.change_indexes = {}
+        self.incomplete_collection = False
+        self.rate_limit_lock = threading.RLock()
+
         tries = 5
         
         while tries > 0:
@@ -485,6 +447,102 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
 
         return
 
+    def link_commits_to_contributors(self, repo_id, cntrb_emails):
+        """ Sets the cmt_ght_author_id of the repo's commits to the cntrb_id of their committer email,
+        in one transaction. The emails are streamed into a temporary table with COPY and joined to
+        the commits in a single UPDATE, instead of one UPDATE of every repo's commits per email.
+
+        :param cntrb_emails: List of dicts with the email and cntrb_id of each contributor email
+        :return: Integer, number of commits that were linked to a different contributor
+        """
+        # An email that is both a canonical email and an alias links to the first contributor found
+        links = {}
+        for cntrb_email in cntrb_emails:
+            if cntrb_email['email'] is not None and cntrb_email['cntrb_id'] is not None:
+                links.setdefault(cntrb_email['email'], cntrb_email['cntrb_id'])
+        if not links:
+            return 0
+
+        connection = self.db.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'CREATE TEMPORARY TABLE "staging_commit_links" (email TEXT PRIMARY KEY, cntrb_id BIGINT) ON COMMIT DROP'
+                )
+                stream = CopyStream(links.items(), ['email', 'cntrb_id'])
+                cursor.copy_expert(
+                    'COPY "staging_commit_links" (email, cntrb_id) FROM STDIN', stream, size=stream.chunk_size
+                )
+                cursor.execute("""
+                    UPDATE commits SET cmt_ght_author_id = link.cntrb_id
+                    FROM "staging_commit_links" AS link
+                    WHERE commits.repo_id = %(repo_id)s
+                        AND commits.cmt_committer_email = link.email
+                        AND commits.cmt_ght_author_id IS DISTINCT FROM link.cntrb_id
+                """, {'repo_id': repo_id})
+                linked = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+        self.logger.info(f"Linked {linked} commits of repo {repo_id} to {len(links)} contributor emails")
+        return linked
+
+    def record_resolution_attempts(self, failed, resolved_emails):
+        """ Records the commit emails and names GitHub answered without a login for, so they are not
+        looked up again until their retry interval is over. The interval starts at commit_email_retry_days
+        and doubles with every failed attempt, up to MAX_RETRY_DAYS. Attempts of emails that were
+        resolved are deleted.
+
+        :param failed: List of (email, name) tuples
+        :param resolved_emails: List of emails that were resolved
+        """
+        if failed:
+            self.db.execute(s.sql.text("""
+                INSERT INTO augur_operations.worker_commit_email_attempt AS attempt (email, name, retry_at)
+                SELECT DISTINCT failed.email, failed.name, CURRENT_TIMESTAMP + make_interval(days => :retry_days)
+                FROM unnest(CAST(:emails AS TEXT[]), CAST(:names AS TEXT[])) AS failed (email, name)
+                ON CONFLICT (email, name) DO UPDATE SET
+                    attempts = attempt.attempts + 1,
+                    attempted_at = CURRENT_TIMESTAMP,
+                    retry_at = CURRENT_TIMESTAMP + make_interval(
+                        days => LEAST(:retry_days * power(2, attempt.attempts), :max_days)::int
+                    )
+            """), emails=[email for email, _ in failed], names=[name for _, name in failed],
+                retry_days=self.config.get('commit_email_retry_days', DEFAULT_RETRY_DAYS), max_days=MAX_RETRY_DAYS)
+            self.logger.info(f"{len(failed)} commit emails could not be resolved and will be retried later")
+        if resolved_emails:
+            self.db.execute(s.sql.text("""
+                DELETE FROM augur_operations.worker_commit_email_attempt WHERE email = ANY(CAST(:emails AS TEXT[]))
+            """), emails=resolved_emails)
+
+    def insert_aliases(self, aliases):
+        """ Inserts the aliases of contributors that are not in contributors_aliases yet with one statement
+
+        :param aliases: List of dicts with the cntrb_id, alias_email and canonical_email of each alias
+        """
+        if not aliases:
+            return
+        result = self.db.execute(s.sql.text("""
+            INSERT INTO contributors_aliases (cntrb_id, alias_email, canonical_email, tool_source, tool_version, data_source)
+            SELECT DISTINCT ON (alias.alias_email, alias.canonical_email)
+                alias.cntrb_id, alias.alias_email, alias.canonical_email, :tool_source, :tool_version, :data_source
+            FROM unnest(CAST(:cntrb_ids AS BIGINT[]), CAST(:alias_emails AS TEXT[]), CAST(:canonical_emails AS TEXT[]))
+                AS alias (cntrb_id, alias_email, canonical_email)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM contributors_aliases
+                WHERE contributors_aliases.alias_email = alias.alias_email
+                    AND contributors_aliases.canonical_email = alias.canonical_email
+            )
+        """), cntrb_ids=[alias['cntrb_id'] for alias in aliases],
+            alias_emails=[alias['alias_email'] for alias in aliases],
+            canonical_emails=[alias['canonical_email'] for alias in aliases],
+            tool_source=self.tool_source, tool_version=self.tool_version, data_source=self.data_source)
+        self.logger.info(f"Inserted {result.rowcount} of {len(aliases)} aliases")
+
     # Takes the user data from the endpoint as arg
     # Updates the alias table if the login is already in the contributor's table with the new email.
     # Returns whether the login was found in the contributors table
@@ -554,10 +612,11 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
     # Try every distinct email found within a commit for possible username resolution.
     # Add email to garbage table if can't be resolved.
     #   \param contributor is the raw database entry
+    #   \param not_found Set, 'email' is added to it when the search answered without any user
     #   \return A dictionary of response data from github with potential logins on success.
     #           None on failure
 
-    def fetch_username_from_email(self, commit):
+    def fetch_username_from_email(self, commit, not_found=None):
 
         # Default to failed state
         login_json = None
@@ -580,6 +639,9 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
         login_json = self.request_dict_from_endpoint(
             url, timeout_wait=30)
 
+        if not_found is not None and login_json is not None and login_json.get('total_count') == 0:
+            not_found.add('email')
+
         # Check if the email result got anything, if it failed try a name search.
         if login_json == None or 'total_count' not in login_json or login_json['total_count'] == 0:
             self.logger.info(
@@ -618,11 +680,12 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
     # Method to return the login given commit data using the supplemental data in the commit
     #   -email
     #   -name
-    def get_login_with_supplemental_data(self, commit_data):
+    # 'email' and 'name' are added to not_found for the searches that answered without any user
+    def get_login_with_supplemental_data(self, commit_data, not_found=None):
 
         # Try to get login from all possible emails
         # Is None upon failure.
-        login_json = self.fetch_username_from_email(commit_data)
+        login_json = self.fetch_username_from_email(commit_data, not_found=not_found)
 
         # Check if the email result got anything, if it failed try a name search.
         if login_json == None or 'total_count' not in login_json or login_json['total_count'] == 0:
@@ -648,6 +711,8 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
             self.logger.info(
                 "Search query did not return any results, adding commit's table remains null...\n")
 
+            if not_found is not None:
+                not_found.add('name')
             return None
 
         # Grab first result and make sure it has the highest match score
@@ -661,7 +726,8 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
 
         return match['login']
 
-    def get_login_with_commit_hash(self, commit_data, repo_id):
+    # 'commit' is added to not_found when GitHub has the commit but no user for its author
+    def get_login_with_commit_hash(self, commit_data, repo_id, not_found=None):
 
         # Get endpoint for login from hash
         url = self.create_endpoint_from_commit_sha(
@@ -674,6 +740,11 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
             self.logger.info("Search query returned empty data. Moving on")
             return None
 
+        if login_json.get('author') is None:
+            if not_found is not None:
+                not_found.add('commit')
+            return None
+
         try:
             match = login_json['author']['login']
         except:
@@ -681,52 +752,50 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
 
         return match
 
-    # Update the contributors table from the data facade has gathered.
-    def insert_facade_contributors(self, repo_id,processes=4,multithreaded=True):
-        self.logger.info(
-            "Beginning process to insert contributors from facade commits for repo w entry info: {}\n".format(repo_id))
+    def get_new_contributor_commits(self, repo_id):
+        """ Gets one commit of every email and name of the repo that does not appear in the contributors
+        table or the contributors_aliases table, and that did not fail to resolve recently, so no API
+        call is made for them
 
-        # Get all of the commit data's emails and names from the commit table that do not appear
-        # in the contributors table or the contributors_aliases table.
+        :param repo_id: Integer, repo whose commits are looked at
+        :return: List of dicts with the name, hash and email_raw of each commit
+        """
         new_contrib_sql = s.sql.text("""
-                SELECT DISTINCT
-                    commits.cmt_author_name AS NAME,
-                    commits.cmt_commit_hash AS hash,
-                    commits.cmt_author_raw_email AS email_raw,
-                    'not_unresolved' as resolution_status
-                FROM
-                    commits
-                WHERE
-                    commits.repo_id = :repo_id
-                    AND (NOT EXISTS ( SELECT contributors.cntrb_canonical FROM contributors WHERE contributors.cntrb_canonical = commits.cmt_author_raw_email )
-                    or NOT EXISTS ( SELECT contributors_aliases.alias_email from contributors_aliases where contributors_aliases.alias_email = commits.cmt_author_raw_email)
-                    AND ( commits.cmt_author_name ) IN ( SELECT C.cmt_author_name FROM commits AS C WHERE C.repo_id = :repo_id GROUP BY C.cmt_author_name ))
-                GROUP BY
-                    commits.cmt_author_name,
-                    commits.cmt_commit_hash,
-                    commits.cmt_author_raw_email
-                UNION
-                SELECT DISTINCT
-                    commits.cmt_author_name AS NAME,--commits.cmt_id AS id,
+                SELECT DISTINCT ON (commits.cmt_author_raw_email, commits.cmt_author_name)
+                    commits.cmt_author_name AS name,
                     commits.cmt_commit_hash AS hash,
-                    commits.cmt_author_raw_email AS email_raw,
-                    'unresolved' as resolution_status
+                    commits.cmt_author_raw_email AS email_raw
                 FROM
                     commits
                 WHERE
                     commits.repo_id = :repo_id
-                    AND EXISTS ( SELECT unresolved_commit_emails.email FROM unresolved_commit_emails WHERE unresolved_commit_emails.email = commits.cmt_author_raw_email )
-                    AND ( commits.cmt_author_name ) IN ( SELECT C.cmt_author_name FROM commits AS C WHERE C.repo_id = :repo_id GROUP BY C.cmt_author_name )
-                GROUP BY
-                    commits.cmt_author_name,
-                    commits.cmt_commit_hash,
-                    commits.cmt_author_raw_email
+                    AND NOT EXISTS ( SELECT 1 FROM contributors WHERE contributors.cntrb_canonical = commits.cmt_author_raw_email )
+                    AND NOT EXISTS ( SELECT 1 FROM contributors_aliases WHERE contributors_aliases.alias_email = commits.cmt_author_raw_email )
+                    AND NOT EXISTS (
+                        SELECT 1 FROM augur_operations.worker_commit_email_attempt AS attempt
+                        WHERE attempt.email = commits.cmt_author_raw_email
+                            AND attempt.name = commits.cmt_author_name
+                            AND attempt.retry_at > CURRENT_TIMESTAMP
+                    )
                 ORDER BY
-                hash
+                    commits.cmt_author_raw_email,
+                    commits.cmt_author_name,
+                    commits.cmt_author_timestamp DESC NULLS LAST
         """)
-        new_contribs = json.loads(pd.read_sql(new_contrib_sql, self.db, params={
+        return json.loads(pd.read_sql(new_contrib_sql, self.db, params={
                                   'repo_id': repo_id}).to_json(orient="records"))
 
+    # Update the contributors table from the data facade has gathered.
+    def insert_facade_contributors(self, repo_id,processes=4,multithreaded=True):
+        self.logger.info(
+            "Beginning process to insert contributors from facade commits for repo w entry info: {}\n".format(repo_id))
+
+        # Load the contributor index again for every repo, like other workers do for every task
+        self.contributor_index = None
+
+        new_contribs = self.get_new_contributor_commits(repo_id)
+        self.logger.info(f"{len(new_contribs)} commit emails of repo {repo_id} need to be resolved")
+
         
         if len(new_contribs) > 0 and multithreaded:
             
@@ -760,25 +829,6 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
 
         self.logger.debug("DEBUG: Got through the new_contribs")
         
-        def link_commits_to_contributor(contributorQueue,logger,database, commits_table):
-            # iterate through all the commits with emails that appear in contributors and give them the relevant cntrb_id.
-            for cntrb_email in contributorQueue:
-                logger.debug(
-                   f"These are the emails and cntrb_id's  returned: {cntrb_email}")
-
-                try:
-                    database.execute(commits_table.update().where(
-                        commits_table.c.cmt_committer_email == cntrb_email['email']
-                    ).values({
-                        'cmt_ght_author_id': cntrb_email['cntrb_id']
-                    }))
-                except Exception as e:
-                    logger.info(
-                        f"Ran into problem when enriching commit data. Error: {e}")
-                    continue
-            
-            return
-
         # sql query used to find corresponding cntrb_id's of emails found in the contributor's table
         # i.e., if a contributor already exists, we use it!
         resolve_email_to_cntrb_id_sql = s.sql.text("""
@@ -814,33 +864,7 @@ class ContributorInterfaceable(WorkerGitInterfaceable):
         existing_cntrb_emails = json.loads(pd.read_sql(resolve_email_to_cntrb_id_sql, self.db, params={
                                            'repo_id': repo_id}).to_json(orient="records"))
 
-        
-        if len(existing_cntrb_emails) > 0 and multithreaded:
-            
-            #Split commits into mostly equal queues so each process starts with a workload and there is no
-            #    overhead to pass into queue from the parent.
-            
-            numpyExistingCntrbEmails = np.array(list(existing_cntrb_emails))
-            existingEmailsSplit = np.array_split(numpyExistingCntrbEmails,processes)
-            
-            processList = []
-            #Create process start conditions
-            for process in range(processes):
-            
-                processList.append(Process(target=link_commits_to_contributor, args=(existingEmailsSplit[process].tolist(),self.logger,self.db,self.commits_table,)))
-        
-        
-            #Multiprocess process commits
-            for pNum,process in enumerate(processList):
-                process.daemon = True
-                process.start()
-                self.logger.info(f"Process {pNum} started..")
-        
-        
-            for process in processList:
-                process.join()
-        else:
-            link_commits_to_contributor(list(existing_cntrb_emails), self.logger, self.db, self.commits_table)
+        self.link_commits_to_contributors(repo_id, existing_cntrb_emails)
 
         self.logger.info("Done with inserting and updating facade contributors")
         return
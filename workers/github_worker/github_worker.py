@@ -60,11 +60,11 @@ class GitHubWorker(WorkerGitInterfaceable):
         # Run the general worker initialization
         super().__init__(worker_type, config, given, models, data_tables, operations_tables)
 
-    def _get_pk_source_issues(self):
+    def _get_pk_source_issues(self, since=None):
 
         issues_url = (
             f"https://api.github.com/repos/{self.owner}/{self.repo}"
-            "/issues?per_page=100&state=all&page={}"
+            f"/issues?per_page=100&state=all{self.since_parameters(since)}&page={{}}"
         )
 
         action_map = {
@@ -79,10 +79,10 @@ class GitHubWorker(WorkerGitInterfaceable):
         }
 
         def pk_source_issues_increment_insert(inc_source_issues,action_map):
+            #Normal when only issues updated since the watermark are requested, issues_model completes the task
             if len(inc_source_issues['all']) == 0:
-                self.logger.info("There are no issues for this repository.\n")
-                self.register_task_completion(self.task_info, self.repo_id, 'issues')
-                return False
+                self.logger.info("There are no new or updated issues for this repository.\n")
+                return
 
             def is_valid_pr_block(issue):
                 return (
@@ -177,7 +177,7 @@ class GitHubWorker(WorkerGitInterfaceable):
 
         source_issues = self.paginate_endpoint(
             issues_url, action_map=action_map,
-            table=self.issues_table, where_clause=self.issues_table.c.repo_id == self.repo_id,
+            table=self.issues_table,
             stagger=True,insertion_method=pk_source_issues_increment_insert
         )
 
@@ -201,34 +201,47 @@ class GitHubWorker(WorkerGitInterfaceable):
         #   from having to add them as we discover committers in the issue process
         # self.query_github_contributors(entry_info, self.repo_id)
 
-        pk_source_issues = self._get_pk_source_issues()
+        # Only issues updated since the last full collection are requested, a new comment updates its issue too
+        since = self.get_since_watermark('issues')
+        collected = True
+
+        pk_source_issues = self._get_pk_source_issues(since)
         if pk_source_issues:
             try:
-                self.issue_comments_model(pk_source_issues)
+                self.issue_comments_model(pk_source_issues, since)
                 issue_events_all = self.issue_events_model(pk_source_issues)
                 self.issue_nested_data_model(pk_source_issues, issue_events_all)
             except Exception as e:
+                collected = False
                 self.print_traceback("one of the issue models failed", e, False)
             finally:
                 try:
                     issue_events_all = self.issue_events_model(pk_source_issues)
                 except Exception as e:
+                    collected = False
                     self.print_traceback("issue events model failed", e, False)
                 finally:
                     try:
                         self.issue_nested_data_model(pk_source_issues, issue_events_all)
                     except Exception as e:
+                        collected = False
                         self.print_traceback("issue nested model failed", e, False)
 
+        # Comments that were not stored would never be requested again once the watermark moved past them
+        if collected and not self.incomplete_collection:
+            self.set_since_watermark('issues', pk_source_issues)
+        else:
+            self.incomplete_collection = True
+
 
         # Register this task as completed
         self.register_task_completion(entry_info, self.repo_id, 'issues')
 
-    def issue_comments_model(self, pk_source_issues):
+    def issue_comments_model(self, pk_source_issues, since=None):
         # https://api.github.com/repos/chaoss/augur/issues/comments
         comments_url = (
             f"https://api.github.com/repos/{self.owner}/{self.repo}"
-            "/issues/comments?per_page=100&page={}"
+            f"/issues/comments?per_page=100{self.since_parameters(since)}&page={{}}"
         )
 
         # Get contributors that we already have stored
@@ -296,6 +309,7 @@ class GitHubWorker(WorkerGitInterfaceable):
                 self.bulk_insert(self.message_table, insert=issue_comments_insert,
                     unique_columns=comment_action_map['insert']['augur'])
             except Exception as e:
+                self.incomplete_collection = True
                 self.print_traceback("bulk insert of issue comments", e, False)
 
             """ ISSUE MESSAGE REF TABLE """
@@ -339,25 +353,13 @@ class GitHubWorker(WorkerGitInterfaceable):
                     unique_columns=comment_ref_action_map['insert']['augur']
                 )
             except Exception as e:
+                self.incomplete_collection = True
                 self.print_traceback("bulk insert on issue_msg_ref_table", e, False)
 
         # list to hold contributors needing insertion or update
         try:
             issue_comments = self.paginate_endpoint(
                 comments_url, action_map=comment_action_map, table=self.message_table,
-                where_clause=self.message_table.c.msg_id.in_(
-                    [
-                        msg_row[0] for msg_row in self.db.execute(
-                            s.sql.select(
-                                [self.issue_message_ref_table.c.msg_id]
-                            ).where(
-                                self.issue_message_ref_table.c.issue_id.in_(
-                                    set(pd.DataFrame(pk_source_issues)['issue_id'])
-                                )
-                            )
-                        ).fetchall()
-                    ]
-                ),
                 stagger=True,
                 insertion_method=issue_comments_insert
             )
@@ -368,6 +370,7 @@ class GitHubWorker(WorkerGitInterfaceable):
             return
 
         except Exception as e:
+            self.incomplete_collection = True
             self.print_traceback("paginate endpoint for issue comments", e, False)
 
     def issue_events_model(self, pk_source_issues):
@@ -690,17 +693,7 @@ class GitHubWorker(WorkerGitInterfaceable):
                 } for label in source_labels_insert
             ]
 
-            #Trying to fix an error with creating bigInts using pandas
-            try:
-                self.bulk_insert(
-                    self.issue_labels_table, insert=labels_insert,
-                    unique_columns=['label_src_id']
-                )
-            except psycopg2.errors.InvalidTextRepresentation as e:
-                #If there was an error constructing a type try to redo the insert with a conversion.
-                self.logger.warning(f"Type error when attempting to insert data in issue_nested_data_model with the github worker. Trying again with type conversion on. ERROR: {e}. exception registerred \n")
-                self.bulk_insert(
-                    self.issue_labels_table, insert=labels_insert,
-                    unique_columns=['label_src_id'],
-                    convert_float_int=True
-                )
+            self.bulk_insert(
+                self.issue_labels_table, insert=labels_insert,
+                unique_columns=['label_src_id']
+            )
@@ -0,0 +1,107 @@
+#SPDX-License-Identifier: MIT
+"""
+ETag and Last-Modified validators of platform API responses, shared by every worker through
+the augur_operations.worker_http_cache table, so unchanged pages can be requested conditionally
+"""
+import hashlib
+import threading
+
+import sqlalchemy as s
+
+# Bodies of empty pages, which are never cached so pagination that stops at them still sees them
+EMPTY_BODIES = (b'', b'[]', b'{}')
+
+def auth_scope(headers):
+    """ Short digest of the credentials a request is sent with, since responses can differ per token
+    """
+    credentials = (headers or {}).get('Authorization') or (headers or {}).get('PRIVATE-TOKEN') or ''
+    return hashlib.sha1(credentials.encode()).hexdigest()[:16]
+
+class ResponseCache():
+    """
+    Validators of the responses a worker received, looked up by URL and auth scope
+
+    Validators of a task are kept in memory until the task completes and are only then written
+    to the database, so the pages of a failed task are requested in full again next time.
+    """
+
+    def __init__(self, engine, logger):
+        """
+        :param engine: SQLAlchemy engine of the augur_operations schema
+        """
+        self.engine = engine
+        self.logger = logger
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, scope):
+        """ Validators stored for a URL, a dict with the etag, last_modified, link and body of the
+            response, or None
+        """
+        with self._lock:
+            if (url, scope) in self._pending:
+                return self._pending[(url, scope)]
+
+        row = self.engine.execute(s.sql.text("""
+            SELECT etag, last_modified, link, body FROM augur_operations.worker_http_cache
+            WHERE url = :url AND auth_scope = :scope
+        """), url=url, scope=scope).fetchone()
+        return dict(row) if row else None
+
+    def conditional_headers(self, cached):
+        if not cached:
+            return {}
+        if cached['etag']:
+            return {'If-None-Match': cached['etag']}
+        if cached['last_modified']:
+            return {'If-Modified-Since': cached['last_modified']}
+        return {}
+
+    def remember(self, url, scope, response, keep_body=False):
+        """ Keeps the validators of a successful response until the task completes
+
+            :param keep_body: Boolean, whether to also keep the body so a 304 can be answered with it
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        if response.content.strip() in EMPTY_BODIES:
+            return
+
+        with self._lock:
+            self._pending[(url, scope)] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'link': response.headers.get('Link'),
+                'body': response.text if keep_body else None
+            }
+
+    def flush(self):
+        """ Writes the validators the current task collected to the database
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        self.engine.execute(s.sql.text("""
+            INSERT INTO augur_operations.worker_http_cache (url, auth_scope, etag, last_modified, link, body)
+            VALUES (:url, :scope, :etag, :last_modified, :link, :body)
+            ON CONFLICT (url, auth_scope) DO UPDATE SET
+                etag = EXCLUDED.etag, last_modified = EXCLUDED.last_modified,
+                link = EXCLUDED.link, body = EXCLUDED.body, cached_at = CURRENT_TIMESTAMP
+        """), [{'url': url, 'scope': scope, **cached} for (url, scope), cached in pending.items()])
+        self.logger.info(f"Cached validators of {len(pending)} responses")
+
+    def forget(self, urls):
+        """ Drops the validators the current task collected for the given URLs, for responses that
+            were fetched but never processed
+        """
+        urls = set(urls)
+        with self._lock:
+            self._pending = {key: cached for key, cached in self._pending.items() if key[0] not in urls}
+
+    def discard(self):
+        with self._lock:
+            self._pending = {}
@@ -0,0 +1,75 @@
+#SPDX-License-Identifier: MIT
+"""
+Pooled HTTP sessions for the platform APIs, with retries and a bounded number of concurrent requests
+"""
+import concurrent.futures
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from workers.http_cache import auth_scope
+
+# Requests in flight at once, also the number of pages paginate_endpoint fetches ahead
+DEFAULT_CONCURRENCY = 4
+
+# Retries of requests that failed to connect or got a server error, waiting backoff_factor * 2^n seconds in between
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 2
+
+class ApiClient():
+    """
+    Keeps one requests.Session per API key, so connections to the platform are kept alive and
+    reused instead of opening a new one for every request, and runs requests on a thread pool
+
+    Rate limit accounting stays with the caller, which gets every response back like from
+    requests.get.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR):
+        self.concurrency = concurrency
+        self.retry = Retry(
+            total=retries, backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504),
+            allowed_methods=['GET'], respect_retry_after_header=True, raise_on_status=False
+        )
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    def session(self, headers=None):
+        """ Session of the key in the given headers, created the first time the key is used
+        """
+        scope = auth_scope(headers)
+        with self._lock:
+            if scope not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=self.retry)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[scope] = session
+            return self._sessions[scope]
+
+    def get(self, url, **kwargs):
+        """ Same as requests.get, over the pooled session of the key in kwargs['headers']
+        """
+        return self.session(kwargs.get('headers')).get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """ Same as requests.post, over the pooled session of the key in kwargs['headers']
+        """
+        return self.session(kwargs.get('headers')).post(url, **kwargs)
+
+    def submit(self, function, *args, **kwargs):
+        """ Runs a request function on the client's threads
+
+            :returns: concurrent.futures.Future of the function's result
+        """
+        return self._executor.submit(function, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
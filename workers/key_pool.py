@@ -0,0 +1,123 @@
+#SPDX-License-Identifier: MIT
+"""
+Rate limit budget of every API key, shared by all worker processes through the
+augur_operations.worker_key_budget table
+"""
+import hashlib
+
+import sqlalchemy as s
+
+# Requests a worker may make with a key before asking the pool again
+DEFAULT_LEASE_SIZE = 100
+
+# Seconds to stop using a key when the platform asks us to back off without saying for how long
+DEFAULT_BACKOFF = 60
+
+def key_id(access_token):
+    """ Digest identifying a key in the shared table, so tokens never leave worker_oauth
+    """
+    return hashlib.sha1(access_token.encode()).hexdigest()[:16]
+
+class KeyPool():
+    """
+    Token buckets of the API keys of a platform, refilled when the platform resets their
+    rate limit
+
+    Workers lease a number of requests from the key with the most budget left, instead of
+    using one key until it runs out. A key the platform asked to back off from, like
+    GitHub's secondary rate limit, is not leased to any worker until the backoff passes.
+    """
+
+    def __init__(self, engine, platform, logger, lease_size=DEFAULT_LEASE_SIZE):
+        """
+        :param engine: SQLAlchemy engine of the augur_operations schema
+        """
+        self.engine = engine
+        self.platform = platform
+        self.logger = logger
+        self.lease_size = lease_size
+
+    def register(self, oauths):
+        """ Adds keys to the pool with the budget the worker just saw for them
+
+            :param oauths: List of dicts with the access_token, rate_limit and seconds_to_reset of each key
+        """
+        if not oauths:
+            return
+        self.engine.execute(s.sql.text("""
+            INSERT INTO augur_operations.worker_key_budget (platform, key_id, capacity, remaining, reset_at)
+            VALUES (:platform, :key_id, :remaining, :remaining, now() + make_interval(secs => :seconds_to_reset))
+            ON CONFLICT (platform, key_id) DO UPDATE SET
+                capacity = GREATEST(worker_key_budget.capacity, EXCLUDED.capacity),
+                remaining = EXCLUDED.remaining,
+                reset_at = EXCLUDED.reset_at
+        """), [{
+            'platform': self.platform,
+            'key_id': key_id(oauth['access_token']),
+            'remaining': oauth['rate_limit'],
+            'seconds_to_reset': max(oauth['seconds_to_reset'], 0)
+        } for oauth in oauths])
+
+    def lease(self, oauths):
+        """ Takes up to lease_size requests from the key with the most budget left
+
+            :param oauths: List of dicts, keys this worker has the tokens of
+            :returns: Dict, the oauth to use, with the requests granted under `leased`, or None and
+                the number of seconds until a key has budget again
+        """
+        by_id = {key_id(oauth['access_token']): oauth for oauth in oauths}
+        leased = self.engine.execute(s.sql.text("""
+            WITH candidate AS (
+                SELECT key_id, CASE WHEN reset_at <= now() THEN capacity ELSE remaining END AS budget
+                FROM augur_operations.worker_key_budget
+                WHERE platform = :platform AND key_id = ANY(:key_ids) AND blocked_until <= now()
+                ORDER BY budget DESC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE augur_operations.worker_key_budget AS pool SET
+                remaining = candidate.budget - LEAST(:size, candidate.budget),
+                reset_at = CASE WHEN pool.reset_at <= now() THEN now() + interval '1 hour' ELSE pool.reset_at END
+            FROM candidate
+            WHERE pool.platform = :platform AND pool.key_id = candidate.key_id AND candidate.budget > 0
+            RETURNING pool.key_id, LEAST(:size, candidate.budget) AS granted
+        """), platform=self.platform, key_ids=list(by_id), size=self.lease_size).fetchone()
+
+        if leased is not None:
+            oauth = by_id[leased['key_id']]
+            oauth['leased'] = leased['granted']
+            return oauth, 0
+
+        wait = self.engine.execute(s.sql.text("""
+            SELECT EXTRACT(EPOCH FROM MIN(
+                CASE WHEN remaining > 0 THEN blocked_until ELSE GREATEST(reset_at, blocked_until) END
+            ) - now())
+            FROM augur_operations.worker_key_budget
+            WHERE platform = :platform AND key_id = ANY(:key_ids)
+        """), platform=self.platform, key_ids=list(by_id)).scalar()
+        return None, max(float(wait or 0), 1)
+
+    def observe(self, oauth, remaining, reset):
+        """ Corrects a key's budget with the rate limit headers of a response
+
+            :param remaining: Integer, requests the platform says are left
+            :param reset: Integer, epoch seconds when the platform resets the key's rate limit
+        """
+        self.engine.execute(s.sql.text("""
+            UPDATE augur_operations.worker_key_budget SET
+                remaining = CASE WHEN reset_at < to_timestamp(:reset) - interval '1 minute'
+                    THEN :remaining ELSE LEAST(remaining, :remaining) END,
+                reset_at = GREATEST(reset_at, to_timestamp(:reset)),
+                capacity = GREATEST(capacity, :remaining)
+            WHERE platform = :platform AND key_id = :key_id
+        """), platform=self.platform, key_id=key_id(oauth['access_token']), remaining=remaining, reset=reset)
+
+    def back_off(self, oauth, seconds=DEFAULT_BACKOFF):
+        """ Keeps every worker from using a key for the given number of seconds
+        """
+        self.logger.info(f"Backing off from key {oauth['oauth_id']} for {seconds} seconds in every worker")
+        self.engine.execute(s.sql.text("""
+            UPDATE augur_operations.worker_key_budget
+            SET blocked_until = GREATEST(blocked_until, now() + make_interval(secs => :seconds))
+            WHERE platform = :platform AND key_id = :key_id
+        """), platform=self.platform, key_id=key_id(oauth['access_token']), seconds=seconds)
@@ -0,0 +1,114 @@
+#SPDX-License-Identifier: MIT
+"""
+Stages of a paginated collection run concurrently, connected by bounded queues so memory
+stays constant however many pages an endpoint has
+"""
+import queue
+import threading
+
+# Pages waiting between two stages, a full queue blocks the stage before it
+DEFAULT_QUEUE_SIZE = 4
+
+# Pages stored together, and so the pages a crash can lose before the checkpoint moves
+DEFAULT_BATCH_PAGES = 10
+
+# Marks the end of the pages in a queue
+DONE = object()
+
+class PagePipeline():
+    """
+    Fetches pages, diffs them and stores them in three stages, each of which works on a
+    different page at the same time
+
+    Fetching and diffing run on their own threads and storing runs on the calling thread. When
+    storing falls behind, the queues fill up and the earlier stages wait, so at most a few
+    pages are held in memory. An exception in any stage stops the other stages and is raised
+    to the caller.
+    """
+
+    def __init__(self, logger, queue_size=DEFAULT_QUEUE_SIZE):
+        self.logger = logger
+        self.queue_size = queue_size
+
+    def put(self, items, item, stop):
+        """ Waits for room in a queue, unless the pipeline is stopped
+        """
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, items, stop):
+        while True:
+            try:
+                return items.get(timeout=0.5)
+            except queue.Empty:
+                if stop.is_set():
+                    return DONE
+
+    def run(self, pages, diff, store):
+        """
+        :param pages: Iterable of Pages, the fetch stage, e.g. WorkerGitInterfaceable.iterate_pages
+        :param diff: Function taking a Page and returning what store needs of it
+        :param store: Function taking a Page and what diff returned for it
+        :return: Integer, number of pages stored
+        """
+        fetched = queue.Queue(self.queue_size)
+        diffed = queue.Queue(self.queue_size)
+        stop = threading.Event()
+
+        def fetch_stage():
+            try:
+                for page in pages:
+                    if not self.put(fetched, page, stop):
+                        break
+                else:
+                    self.put(fetched, DONE, stop)
+            except Exception as e:
+                # Exceptions travel down the pipeline to be raised by the store stage
+                self.put(fetched, e, stop)
+            finally:
+                if hasattr(pages, 'close'):
+                    pages.close()
+
+        def diff_stage():
+            while True:
+                page = self.get(fetched, stop)
+                if page is DONE or isinstance(page, Exception):
+                    self.put(diffed, page, stop)
+                    return
+                try:
+                    changes = diff(page)
+                except Exception as e:
+                    self.put(diffed, e, stop)
+                    return
+                if not self.put(diffed, (page, changes), stop):
+                    return
+
+        stages = [
+            threading.Thread(target=fetch_stage, name='pipeline-fetch', daemon=True),
+            threading.Thread(target=diff_stage, name='pipeline-diff', daemon=True)
+        ]
+        for stage in stages:
+            stage.start()
+
+        stored = 0
+        try:
+            while True:
+                item = diffed.get()
+                if item is DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                store(*item)
+                stored += 1
+        finally:
+            stop.set()
+            for stage in stages:
+                stage.join()
+
+        self.logger.info(f"Pipeline stored {stored} pages")
+        return stored
@@ -0,0 +1,220 @@
+#SPDX-License-Identifier: MIT
+"""
+Pagination of the platform APIs, one backend per way a platform links its pages, and the
+classification of responses that WorkerGitInterfaceable.iterate_pages retries on
+"""
+import collections
+import json
+import urllib.parse
+
+# What a response means for pagination
+PAGE = 'page'
+NOT_MODIFIED = 'not_modified'
+NOT_FOUND = 'not_found'
+BAD_CREDENTIALS = 'bad_credentials'
+RATE_LIMITED = 'rate_limited'
+SECONDARY_RATE_LIMITED = 'secondary_rate_limited'
+SERVER_ERROR = 'server_error'
+CLIENT_ERROR = 'client_error'
+MALFORMED = 'malformed'
+
+# A page of an endpoint, with the response it came in, and the number of the last page if known
+Page = collections.namedtuple('Page', ['number', 'data', 'response', 'last'])
+
+def decode_payload(response):
+    """ Body of a response as JSON, or as text when it is not JSON
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+def response_message(payload):
+    if isinstance(payload, dict):
+        return str(payload.get('message') or '')
+    return ''
+
+def classify_response(response, payload):
+    """ What a REST response means for pagination, from its status code first and the error message
+        GitHub and GitLab put in the body second
+
+        :returns: String, one of the outcomes above
+    """
+    status = response.status_code
+    message = response_message(payload)
+
+    if status == 304:
+        return NOT_MODIFIED
+    if status == 401 or message == 'Bad credentials':
+        return BAD_CREDENTIALS
+    if 'secondary rate limit' in message or 'abuse detection mechanism' in message or \
+            (status == 403 and 'Retry-After' in response.headers):
+        return SECONDARY_RATE_LIMITED
+    if status == 429 or (status == 403 and (
+            response.headers.get('X-RateLimit-Remaining') == '0' or 'rate limit' in message)):
+        return RATE_LIMITED
+    if status in (404, 410) or message == 'Not Found' or message.startswith('404'):
+        return NOT_FOUND
+    if status >= 500:
+        return SERVER_ERROR
+    if status >= 400:
+        return CLIENT_ERROR
+    if isinstance(payload, list):
+        return PAGE
+    if isinstance(payload, str):
+        # Text that still parses as JSON is a page, anything else like an HTML error page is retried
+        try:
+            return PAGE if isinstance(json.loads(payload), list) else MALFORMED
+        except ValueError:
+            return MALFORMED
+    return MALFORMED
+
+def page_items(payload):
+    """ Items of a REST page, parsing pages that came back as JSON text
+    """
+    return json.loads(payload) if isinstance(payload, str) else payload
+
+def page_parameter(url, parameter='page'):
+    """ Value of the page parameter of a URL, as an Integer, or None
+    """
+    values = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get(parameter)
+    return int(values[0]) if values else None
+
+class RestPages():
+    """
+    Pages of a GitHub REST endpoint, numbered from 1 and linked through the Link header
+
+    The state of a page is its number, so once the last page is known any page can be
+    requested directly, concurrently or in reverse.
+    """
+    numbered = True
+
+    def __init__(self, url):
+        """
+        :param url: String, the URL of the endpoint with a curly brace formatter where the page
+            number goes
+        """
+        self.url = url
+
+    def first(self):
+        return 1
+
+    def request(self, state):
+        """ Method, URL and keyword arguments of the request of a page
+        """
+        return 'GET', self.url.format(state), {}
+
+    def items(self, payload):
+        return page_items(payload)
+
+    def last_page(self, response):
+        if 'last' in response.links:
+            return page_parameter(response.links['last']['url'])
+        return None
+
+    def next(self, state, response, payload, last):
+        """ State of the page after the given one, or None when it was the last page
+        """
+        if last is not None:
+            return state + 1 if state < last else None
+        return state + 1 if 'next' in response.links else None
+
+    def outcome(self, response, payload):
+        return classify_response(response, payload)
+
+class GitlabPages(RestPages):
+    """
+    Pages of a GitLab REST endpoint, which tells the next page and the number of pages in the
+    x-next-page and x-total-pages headers
+
+    GitLab leaves out x-total-pages for large collections and uses keyset pagination, where
+    the next page is only given as a URL in the Link header. The state of those pages is the URL.
+    """
+
+    def request(self, state):
+        if isinstance(state, str):
+            return 'GET', state, {}
+        return super().request(state)
+
+    def last_page(self, response):
+        total = response.headers.get('x-total-pages')
+        if total:
+            return int(total)
+        return super().last_page(response)
+
+    def next(self, state, response, payload, last):
+        if last is not None and not isinstance(state, str):
+            return state + 1 if state < last else None
+        next_page = response.headers.get('x-next-page')
+        if next_page is not None:
+            return int(next_page) if next_page else None
+        return response.links['next']['url'] if 'next' in response.links else None
+
+class GraphqlPages():
+    """
+    Pages of a connection of a GitHub GraphQL query, linked by cursors in its pageInfo
+
+    The query gets the cursor through a formatter named after the connection, so
+    `files (last: 100{files})` becomes `files (last: 100, before: "<cursor>")` on the next page.
+    """
+    numbered = False
+    url = 'https://api.github.com/graphql'
+
+    def __init__(self, query, connection, parameters=None, backwards=True):
+        """
+        :param query: String, the GraphQL query, with the curly braces that are not formatters doubled
+        :param connection: String, the name of the connection to paginate
+        :param parameters: Dict, values of the other formatters in the query
+        :param backwards: Boolean, page with `before` from the start cursor instead of with
+            `after` from the end cursor
+        """
+        self.query = query
+        self.connection = connection
+        self.parameters = dict(parameters or {})
+        self.parameters.setdefault(connection, '')
+        self.backwards = backwards
+
+    def first(self):
+        return ''
+
+    def request(self, state):
+        cursor = ', {}: "{}"'.format('before' if self.backwards else 'after', state) if state else ''
+        query = self.query.format(**{**self.parameters, self.connection: cursor})
+        return 'POST', self.url, {'json': {'query': query}}
+
+    def root(self, data):
+        """ The connection within the data of a response, found by name at any depth
+        """
+        if not isinstance(data, dict):
+            return None
+        if self.connection in data and isinstance(data[self.connection], dict):
+            return data[self.connection]
+        for nested in data.values():
+            root = self.root(nested)
+            if root is not None:
+                return root
+        return None
+
+    def items(self, payload):
+        return self.root(payload['data'])['edges']
+
+    def last_page(self, response):
+        return None
+
+    def next(self, state, response, payload, last):
+        page_info = self.root(payload['data'])['pageInfo']
+        if self.backwards:
+            return page_info['startCursor'] if page_info['hasPreviousPage'] else None
+        return page_info['endCursor'] if page_info['hasNextPage'] else None
+
+    def outcome(self, response, payload):
+        if isinstance(payload, dict) and payload.get('errors'):
+            error_type = payload['errors'][0].get('type')
+            if error_type == 'NOT_FOUND':
+                return NOT_FOUND
+            if error_type == 'RATE_LIMITED':
+                return RATE_LIMITED
+            return MALFORMED
+        if isinstance(payload, dict) and 'data' in payload:
+            return PAGE if self.root(payload['data']) is not None else NOT_FOUND
+        return classify_response(response, payload)
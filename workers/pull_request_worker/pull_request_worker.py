@@ -7,6 +7,10 @@ import sys
 import time
 import traceback
 from workers.worker_git_integration import WorkerGitInterfaceable
+from workers.pagination import (
+    GraphqlPages, classify_response, decode_payload, page_items, page_parameter, PAGE, NOT_MODIFIED,
+    NOT_FOUND, CLIENT_ERROR, BAD_CREDENTIALS, RATE_LIMITED, SECONDARY_RATE_LIMITED
+)
 from numpy.lib.utils import source
 import requests
 import copy
@@ -67,7 +71,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
 
         def load_url(url, extra_data={}):
             try:
-                html = requests.get(url, stream=True, headers=self.headers)
+                html = self.conditional_get(url, timeout=None, stream=True)
                 return html, extra_data
             except requests.exceptions.RequestException as e:
                 self.logger.debug(f"load_url inside multi_thread_urls failed with {e}, for usl {url}. exception registerred.registered")
@@ -111,42 +115,33 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
                                     f"Url: {url[0]} ; Status code: {response.status_code}"
                                 )
 
-                            if response.status_code == 403 or response.status_code == 401: # 403 is rate limit, 404 is not found, 401 is bad credentials
-                                self.update_rate_limit(response, platform=platform)
+                            payload = decode_payload(response)
+                            outcome = classify_response(response, payload)
+
+                            if outcome in (RATE_LIMITED, SECONDARY_RATE_LIMITED, BAD_CREDENTIALS):
+                                # Kept in urls to be tried again with the key update_rate_limit moves to
+                                self.update_rate_limit(
+                                    response, bad_credentials=outcome == BAD_CREDENTIALS,
+                                    temporarily_disable=outcome == SECONDARY_RATE_LIMITED, platform=platform
+                                )
                                 continue
 
-                            elif response.status_code == 200:
-                                try:
-                                    page_data = response.json() 
-                                    # This seems to not be working.
-                                    ### added by SPG 12/1/2021 for dealing with empty JSON pages where there
-                                    ### are no reviews.
-                                    #if not 'results' in page_data or len(page_data['results']) == 0:
-                                    #    continue  
-                                  
-                                except:
-                                    page_data = json.loads(json.dumps(response.text))
-                                    continue
-
-                                page_data = [{**data, **extra_data} for data in page_data]
-                                all_data += page_data
-
-                                try:
-                                    if 'last' in response.links and "&page=" not in url[0]:
-                                        urls += [
-                                            (url[0] + f"&page={page}", extra_data) for page in range(
-                                                2, int(response.links['last']['url'].split('=')[-1]) + 1
-                                            )
-                                        ]
-                                        # self.logger.info(f"urls boundry issue? for {urls} where they are equal to {url}.")
-
-                                        urls = numpy.delete(urls, numpy.where(urls == url), axis=0)
-                                except:
-                                    self.logger.info(f"ERROR with axis = 0 - Now attempting without setting axis for numpy.delete for {urls} where they are equal to {url}.")
-                                    urls = numpy.delete(urls, numpy.where(urls == url))
-                                    continue
-
-                            elif response.status_code == 404:
+                            elif outcome in (PAGE, NOT_MODIFIED):
+                                if outcome == PAGE:
+                                    page_data = page_items(payload)
+                                    page_data = [{**data, **extra_data} for data in page_data]
+                                    all_data += page_data
+
+                                # Even an unchanged first page may have later pages that changed
+                                if 'last' in response.links and "&page=" not in url[0]:
+                                    urls += [
+                                        (url[0] + f"&page={page}", extra_data) for page in range(
+                                            2, page_parameter(response.links['last']['url']) + 1
+                                        )
+                                    ]
+                                urls = numpy.delete(urls, numpy.where(urls == url), axis=0)
+
+                            elif outcome in (NOT_FOUND, CLIENT_ERROR):
                                 urls = numpy.delete(urls, numpy.where(urls == url), axis=0)
                                 self.logger.info(f"Not found url: {url}\n")
                             else:
@@ -196,98 +191,19 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
             for subject, _ in all_items(data_subjects):
                 before_parameters[subject] = ''
 
-        start_cursor = None
-        has_previous_page = True
-        base_url = 'https://api.github.com/graphql'
         tuples = []
 
-        def find_root_of_subject(data, key_subject):
-            self.logger.debug(f'Finding {key_subject} root of {data}')
-            key_nest = None
-            for subject, nest in data.items():
-                if key_subject in nest:
-                    key_nest = nest[key_subject]
-                    break
-                elif type(nest) == dict:
-                    return find_root_of_subject(nest, key_subject)
-            else:
-                raise KeyError
-            return key_nest
-
         for data_subject, nest in data_subjects.items():
 
             self.logger.debug(f'Beginning paginate process for field {data_subject} '
                  f'for query: {query}')
 
             page_count = 0
-            while has_previous_page:
-
+            for page in self.iterate_pages(
+                GraphqlPages(query, data_subject, before_parameters), max_attempts=3
+            ):
                 page_count += 1
-
-                num_attempts = 3
-                success = False
-
-                for attempt in range(num_attempts):
-                    self.logger.info(f'Attempt #{attempt + 1} for hitting GraphQL endpoint '
-                        f'page number {page_count}\n')
-
-                    response = requests.post(base_url, json={'query': query.format(
-                        **before_parameters)}, headers=self.headers)
-
-                    self.update_gh_rate_limit(response)
-
-                    try:
-                        data = response.json()
-                    except:
-                        data = json.loads(json.dumps(response.text))
-
-                    if 'errors' in data:
-                        self.logger.info("Error!: {}".format(data['errors']))
-                        if data['errors'][0]['type'] == 'NOT_FOUND':
-                            self.logger.warning(
-                                "Github repo was not found or does not exist for "
-                                f"endpoint: {base_url}\n"
-                            )
-                            break
-                        if data['errors'][0]['type'] == 'RATE_LIMITED':
-                            self.update_gh_rate_limit(response)
-                            num_attempts -= 1
-                        continue
-
-
-                    if 'data' in data:
-                        success = True
-                        root = find_root_of_subject(data, data_subject)
-                        page_info = root['pageInfo']
-                        data = root['edges']
-                        break
-                    else:
-                        self.logger.info("Request returned a non-data dict: {}\n".format(data))
-                        if data['message'] == 'Not Found':
-                            self.logger.info(
-                                "Github repo was not found or does not exist for endpoint: "
-                                f"{base_url}\n"
-                            )
-                            break
-                        if data['message'] == (
-                            "You have triggered an abuse detection mechanism. Please wait a "
-                            "few minutes before you try again."
-                        ):
-                            num_attempts -= 1
-                            self.update_gh_rate_limit(response, temporarily_disable=True)
-                        if data['message'] == "Bad credentials":
-                            self.update_gh_rate_limit(response, bad_credentials=True)
-
-                if not success:
-                    self.logger.info('GraphQL query failed: {}'.format(query))
-                    break
-
-                before_parameters.update({
-                    data_subject: ', before: \"{}\"'.format(page_info['startCursor'])
-                })
-                has_previous_page = page_info['hasPreviousPage']
-
-                tuples += data
+                tuples += page.data
 
             self.logger.info(f"Paged through {page_count} pages and "
                 f"collected {len(tuples)} data points\n")
@@ -295,7 +211,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
             if not nest:
                 return tuples
 
-            return tuples + self.graphql_paginate(query, data_subjects[subject],
+            return tuples + self.graphql_paginate(query, nest,
                 before_parameters=before_parameters)
 
 
@@ -501,7 +417,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
         #self.owner and self.repo are both defined in the worker base's collect method using the url of the github repo.
         pr_url = (
             f"https://api.github.com/repos/{self.owner}/{self.repo}/pulls?state=all&"
-            "direction=desc&per_page=100&page={}"
+            "sort=updated&direction=desc&per_page=100&page={}"
         )
 
         #Database action map is essential in order to avoid duplicates messing up the data
@@ -643,8 +559,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
                 self.bulk_insert(
                     self.pull_requests_table,
                     update=inc_source_prs['update'], unique_columns=action_map['insert']['augur'],
-                    insert=prs_insert, update_columns=['pr_src_state', 'pr_closed_at', 'pr_updated_at', 'pr_merged_at'],
-                    convert_float_int=True
+                    insert=prs_insert, update_columns=['pr_src_state', 'pr_closed_at', 'pr_updated_at', 'pr_merged_at']
                 )
 
                 source_data = inc_source_prs['insert'] + inc_source_prs['update']
@@ -677,9 +592,10 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
 
         source_prs = self.paginate_endpoint(
             pr_url, action_map=pr_action_map, table=self.pull_requests_table,
-            where_clause=self.pull_requests_table.c.repo_id == self.repo_id,
             stagger=True,
-            insertion_method=pk_source_increment_insert
+            insertion_method=pk_source_increment_insert,
+            #Most recently updated first, so once a page comes back unchanged the rest are unchanged too
+            stop_unchanged=True
         )
 
         # self.logger.info(
@@ -725,6 +641,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
             pk_source_prs = self._get_pk_source_prs()
         except Exception as e:
             self.print_traceback("Pull Requests model", e)
+            self.incomplete_collection = True
         #self.write_debug_data(pk_source_prs, 'pk_source_prs')
 
         if pk_source_prs:
@@ -733,12 +650,14 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
                 self.logger.info(f"Pull request comments model.")
             except Exception as e:
                 self.print_traceback("PR comments model", e)
+                self.incomplete_collection = True
             finally:
                 try: 
                     self.pull_request_events_model(pk_source_prs)
                     self.logger.info(f"Pull request events model.")
                 except Exception as e:
                     self.print_traceback("PR events model", e)
+                    self.incomplete_collection = True
 
                 finally:
                     try: 
@@ -751,6 +670,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
                             self.logger.info(f"Pull request nested data model.")
                         except Exception as e:
                             self.print_traceback("PR nested model", e)
+                            self.incomplete_collection = True
                         finally:
                             self.logger.debug("finished running through four models.")
 
@@ -882,19 +802,6 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
         try: 
             pr_comments = self.paginate_endpoint(
                 comments_url, action_map=comment_action_map, table=self.message_table,
-                where_clause=self.message_table.c.msg_id.in_(
-                    [
-                        msg_row[0] for msg_row in self.db.execute(
-                            s.sql.select(
-                                [self.pull_request_message_ref_table.c.msg_id]
-                            ).where(
-                                self.pull_request_message_ref_table.c.pull_request_id.in_(
-                                    set(pd.DataFrame(pk_source_prs)['pull_request_id'])
-                                )
-                            )
-                        ).fetchall()
-                    ]
-                ),
                 stagger=True,
                 insertion_method=pr_comments_insert
             )
@@ -928,10 +835,7 @@ class GitHubPullRequestWorker(WorkerGitInterfaceable):
 
         #list to hold contributors needing insertion or update
         pr_events = self.paginate_endpoint(
-            events_url, table=self.pull_request_events_table, action_map=event_action_map,
-            where_clause=self.pull_request_events_table.c.pull_request_id.in_(
-                set(pd.DataFrame(pk_source_prs)['pull_request_id'])
-            )
+            events_url, table=self.pull_request_events_table, action_map=event_action_map
         )
 
         #self.write_debug_data(pr_events, 'pr_events')
@@ -1,5 +1,6 @@
-
 from workers.worker_persistance import *
+import signal
+import threading
 #I figure I can seperate this class into at least three parts.
 #I should also look into the subclass and see what uses what.
 #
@@ -20,9 +21,11 @@ class Worker(Persistant):
         #Construct the persistant functionality for the worker
         super().__init__(worker_type,data_tables,operations_tables)
         self.collection_start_time = None
+        self.upstream_updated_at = None # newest update time of the data an incremental collection found
         self._task = None # task currently being worked on (dict)
         self._child = None # process of currently running task (multiprocessing process)
         self._queue = Queue() # tasks stored here 1 at a time (in a mp queue so it can translate across multiple processes)
+        self._claim_thread = None # thread that claims tasks from the broker when running in pull mode
 
         # if we are finishing a previous task, certain operations work differently
         self.finishing_task = False
@@ -34,6 +37,9 @@ class Worker(Persistant):
 
         self.config.update(config)
 
+        # Pull tasks from the broker instead of waiting for it to post them to /AUGWOP/task,
+        #   can be overridden for a single worker in its block of the Workers section
+        self.claim_tasks = bool(self.config.get('claim_tasks', self.augur_config.get_value('Broker', 'claim_tasks')))
 
         self.task_info = None
         self.repo_id = None
@@ -51,12 +57,15 @@ class Worker(Persistant):
                     'models': self.models # models this worker can fill for a repo as a task
                 }
             ],
-            'config': self.config
+            'config': self.config,
+            'claim_tasks': self.claim_tasks # whether the broker should leave this worker to claim its own tasks
         }
 
         # Send broker hello message
         if self.config['offline_mode'] is False:
             self.connect_to_broker()
+            if self.claim_tasks:
+                self.start_claiming()
 
         try:
             self.tool_source
@@ -129,10 +138,111 @@ class Worker(Persistant):
         """ Kicks off the processing of the queue if it is not already being processed
         Gets run whenever a new task is added
         """
+        # Claimed tasks are picked up by the collection process that is already running
+        if self.claim_tasks and self._child is not None and self._child.is_alive():
+            return
+
         # Spawn a subprocess to handle message reading and performing the tasks
         self._child = Process(target=self.collect, args=())
         self._child.start()
 
+    def start_claiming(self):
+        """ Starts the thread that claims tasks from the broker for this worker
+        """
+        self._claim_thread = threading.Thread(target=self.claim_loop, daemon=True)
+        self._claim_thread.start()
+
+    def claim_loop(self):
+        """ Long-polls the broker for tasks and hands them to the collection process
+        New tasks are claimed as soon as the local queue runs dry, so the next task is
+        usually prefetched while the collection process is finishing the current one
+        """
+        claim_url = 'http://{}:{}/api/unstable/tasks/claim'.format(
+            self.config['host_broker'], self.config['port_broker'])
+        timeout = int(self.augur_config.get_value('Broker', 'claim_timeout'))
+        batch_size = int(self.augur_config.get_value('Broker', 'claim_batch_size'))
+
+        while True:
+            busy = self._child is not None and self._child.is_alive()
+
+            if not self._queue.empty():
+                # The collection process may have exited right before the last claim was put on the queue
+                if not busy:
+                    self.run()
+                time.sleep(1)
+                continue
+
+            try:
+                response = requests.post(claim_url, json={
+                    'worker_id': self.config['id'],
+                    'max_tasks': batch_size,
+                    'timeout': timeout,
+                    'busy': busy
+                }, timeout=timeout + 30)
+            except requests.exceptions.RequestException as e:
+                self.logger.error("Could not claim tasks from the broker: {}. Trying again in 10 seconds...\n".format(e))
+                time.sleep(10)
+                continue
+
+            if response.status_code == 404:
+                self.logger.info("Broker does not know this worker anymore, sending HELLO again\n")
+                self.connect_to_broker()
+                continue
+
+            try:
+                claim = response.json()
+                tasks = claim['tasks']
+            except (ValueError, KeyError):
+                self.logger.error("Broker sent an invalid response to a claim: {}\n".format(response.text))
+                time.sleep(10)
+                continue
+
+            if claim.get('stop'):
+                self.stop_drained()
+                return
+
+            for task in tasks:
+                self.logger.info("Claimed task: {}\n".format(task))
+                self.task = task
+
+    def stop_drained(self):
+        """ Shuts the worker down once the broker drained it, after the current task is finished
+        """
+        self.logger.info("Broker is scaling this worker down, stopping after the current task\n")
+        if self._child is not None:
+            self._child.join()
+        try:
+            requests.post('http://{}:{}/api/unstable/workers/remove'.format(
+                self.config['host_broker'], self.config['port_broker']), json={'id': self.config['id']})
+        except requests.exceptions.RequestException:
+            pass
+        # Gunicorn shuts down gracefully on SIGTERM
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def renew_lease(self, task):
+        """ Keeps renewing the broker's lease on a task from a thread, so long tasks are not
+        handed to another worker while this one is still alive
+
+        :return: threading.Event, set it once the task is finished
+        """
+        stop = threading.Event()
+        if task.get('task_id') is None:
+            return stop
+
+        renew_url = 'http://{}:{}/api/unstable/tasks/renew'.format(
+            self.config['host_broker'], self.config['port_broker'])
+        interval = int(self.augur_config.get_value('Broker', 'lease_renew_interval'))
+
+        def renew():
+            while not stop.wait(interval):
+                try:
+                    requests.post(renew_url, json={'task_id': task['task_id'], 'worker_id': self.config['id']}, timeout=30)
+                except requests.exceptions.RequestException as e:
+                    self.logger.warning("Could not renew the lease on task {}: {}\n".format(task['task_id'], e))
+
+        threading.Thread(target=renew, daemon=True).start()
+        return stop
+
     def collect(self):
         """ Function to process each entry in the worker's task queue
         Determines what action to take based off the message type
@@ -177,15 +287,19 @@ class Worker(Persistant):
 
             # Model method calls wrapped in try/except so that any unexpected error that occurs can be caught
             #   and worker can move onto the next task without stopping
+            stop_renewing = self.renew_lease(message)
             try:
                 self.logger.info("Calling model method {}_model".format(message['models'][0]))
                 self.task_info = message
                 self.repo_id = repo_id
+                self.change_indexes = {}
                 self.owner, self.repo = self.get_owner_repo(list(message['given'].values())[0])
                 model_method(message, repo_id)
             except Exception as e: # this could be a custom exception, might make things easier
                 self.register_task_failure(message, repo_id, e)
                 break
+            finally:
+                stop_renewing.set()
 
         self.logger.debug('Closing database connections\n')
         self.db.dispose()
@@ -395,8 +509,12 @@ class Worker(Persistant):
             'worker_id': self.config['id'],
             'job_type': "MAINTAIN",
             'repo_id': repo_id,
-            'job_model': model
+            'job_model': model,
+            'task_id': task.get('task_id'),
+            'changes': self.results_counter + self.insert_counter + self.update_counter
         }
+        if self.upstream_updated_at is not None:
+            task_completed['upstream_updated_at'] = self.upstream_updated_at
 
         key = None
         if 'github_url' in task['given']:
@@ -451,6 +569,7 @@ class Worker(Persistant):
         self.results_counter = 0
         self.insert_counter = 0
         self.update_counter = 0
+        self.upstream_updated_at = None
 
     def register_task_failure(self, task, repo_id, e):
         """Registers a task as failed with the broker,
@@ -483,6 +602,8 @@ class Worker(Persistant):
         repo_id = int(pd.read_sql(repoUrlSQL, self.db, params={}).iloc[0]['repo_id'])
 
         task['worker_id'] = self.config['id']
+        task['repo_id'] = repo_id
+        task['error'] = repr(e)[:1000]
         try:
             requests.post("http://{}:{}/api/unstable/task_error".format(
                 self.config['host_broker'],self.config['port_broker']), json=task)
@@ -527,3 +648,4 @@ class Worker(Persistant):
 
         # Reset results counter for next task
         self.results_counter = 0
+        self.upstream_updated_at = None
@@ -1,8 +1,23 @@
 #Get everything that the base depends on.
+import concurrent.futures
 import math
+import threading
 
 from numpy.lib.utils import source
 from workers.worker_base import *
+from workers.http_cache import ResponseCache, auth_scope
+from workers.http_client import ApiClient, DEFAULT_CONCURRENCY
+from workers.key_pool import KeyPool, DEFAULT_BACKOFF, DEFAULT_LEASE_SIZE
+from workers.contributor_index import ContributorIndex, DEFAULT_INDEX_TTL, INDEX_COLUMNS
+from workers.contributor_resolver import (
+    ResolutionQueue, UserQuery, batches, contributor_row, DEFAULT_BATCH_SIZE,
+    DEFAULT_RESOLUTION_TTL, WRITE_LOCK
+)
+from workers.page_pipeline import PagePipeline, DEFAULT_BATCH_PAGES, DEFAULT_QUEUE_SIZE
+from workers.pagination import (
+    Page, RestPages, GitlabPages, decode_payload, PAGE, NOT_MODIFIED, NOT_FOUND, BAD_CREDENTIALS,
+    RATE_LIMITED, SECONDARY_RATE_LIMITED, SERVER_ERROR, CLIENT_ERROR
+)
 import sqlalchemy as s
 import time
 import math
@@ -20,6 +35,15 @@ class WorkerGitInterfaceable(Worker):
 
         #Fix loose attribute definition
         self.headers = None
+        self.http_cache = None
+        self.key_pool = None
+        self.http_client = None
+        self.contributor_index = None
+        self.contributor_queue = None
+        # Set when a pagination of the current task resumed from a checkpoint
+        self.resumed_pagination = False
+        # Pipelined pagination updates rate limits from more than one thread
+        self.rate_limit_lock = threading.RLock()
         self.platform = platform
         self.given = given
         self.models = models
@@ -33,7 +57,8 @@ class WorkerGitInterfaceable(Worker):
                     'models': self.models # models this worker can fill for a repo as a task
                 }
             ],
-            'config': self.config
+            'config': self.config,
+            'claim_tasks': self.claim_tasks # whether the broker should leave this worker to claim its own tasks
         }
 
         # Send broker hello message
@@ -52,6 +77,11 @@ class WorkerGitInterfaceable(Worker):
     #database interface, additional functionality with github interface.
     def initialize_database_connections(self):
         super().initialize_database_connections()
+        self.http_cache = ResponseCache(self.helper_db, self.logger)
+        self.http_client = ApiClient(self.config.get('page_concurrency', DEFAULT_CONCURRENCY))
+        self.contributor_queue = ResolutionQueue(
+            self.helper_db, self.logger, self.config.get('contributor_resolution_ttl', DEFAULT_RESOLUTION_TTL)
+        )
         # Organize different api keys/oauths available
         self.logger.info("Initializing API key.")
         if 'gh_api_key' in self.config or 'gitlab_api_key' in self.config:
@@ -264,7 +294,13 @@ class WorkerGitInterfaceable(Worker):
             availablekeys = len(self.oauths)
             keytouse = randint(0,availablekeys-1)
             if platform == 'github':
-                self.headers = {'Authorization': 'token %s' % self.oauths[keytouse]['access_token']}
+                # Keys are shared with every other worker process through the key pool
+                self.key_pool = KeyPool(
+                    self.helper_db, platform, self.logger,
+                    self.config.get('key_lease_size', DEFAULT_LEASE_SIZE)
+                )
+                self.key_pool.register(self.oauths)
+                self.lease_key()
             elif platform == 'gitlab':
                 self.headers = {'Authorization': 'Bearer %s' % self.oauths[keytouse]['access_token']}
             else: 
@@ -286,258 +322,45 @@ class WorkerGitInterfaceable(Worker):
 
         self.logger.info(f"Enriching contributor ids for {len(data)} data points...")
 
+        #Expanding the login's object brings its id and node_id along
         source_df = pd.DataFrame(data)
-        expanded_source_df = self._add_nested_columns(
-            source_df.copy(), [key] + action_map_additions['insert']['source']
-        )
-
-        # Insert cntrbs that are not in db
-
-        cntrb_action_map = {
-            'insert': {
-                'source': [key] + action_map_additions['insert']['source'] + [f'{prefix}id'],
-                'augur': ['cntrb_login'] + action_map_additions['insert']['augur'] + ['gh_user_id']
-            }
-        }
-
-        table_values_cntrb = self.db.execute(
-            s.sql.select(self.get_relevant_columns(self.contributors_table,cntrb_action_map))
-        ).fetchall()
+        expanded_source_df = self._add_nested_columns(source_df.copy(), [key])
 
         source_data = expanded_source_df.to_dict(orient='records')
 
         #Filter out bad data where we can't even hit the api.
         source_data = [data for data in source_data if f'{prefix}login' in data and data[f'{prefix}login'] != None and type(data[f'{prefix}login']) is str]
 
-        self.logger.info(f"table_values_cntrb keys: {table_values_cntrb[0].keys()}")
-        # self.logger.info(f"source_data keys: {source_data[0].keys()}")
-
-        #We can't use this because of worker collisions
-        #TODO: seperate this method into it's own worker.
-        #cntrb_id_offset = self.get_max_id(self.contributors_table, 'cntrb_id') - 1
-
         self.logger.debug(f"Enriching {len(source_data)} contributors.")
 
-        # source_data = source_data.loc[data[f'{prefix}login'] != 'nan']
+        #Data points whose contributor has to be looked up on GitHub
+        missing = []
 
-        # loop through data to test if it is already in the database
-        for index, data in enumerate(source_data):
-
-            if data[f'{prefix}login'] == 'nan':
-                self.logger.debug("Nan user found continuing")
-                continue
+        with_login = [data for data in source_data if data[f'{prefix}login'] != 'nan']
 
-            #removed this log because it was generating a lot of data.
-            #self.logger.info(f"Enriching {index} of {len(source_data)}")
-
-            user_unique_ids = []
-
-            #Allow for alt identifiers to be checked if user.id is not present in source_data
-            try:
-                #This will trigger a KeyError if data has alt identifier.
-                data[f'{prefix}id']
-                for row in table_values_cntrb:
-                    # removed checks for nan user in this block because this is getting all the gh_user_ids that are
-                    # already in the database so it doesn't need to be filtered from the database, it needs to be
-                    # filtered out so it is never inserted into the database
-                    # Andrew Brain 12/21/2021
-                    user_unique_ids.append(row['gh_user_id'])
-
-            except KeyError:
-                self.print_traceback("Enrich_cntrb_id, data doesn't have user.id. Using node_id instead", e, True)
-
-            finally: 
-                for row in table_values_cntrb:
-                    try:
-                        user_unique_ids.append(row['gh_node_id'])
-                    except Exception as e:
-                        self.logger.info(f"Error adding gh_node_id: {e}. Row: {row}")
-                        self.print_traceback("", e, True)
-
-
-
-            #self.logger.info(f"gh_user_ids: {gh_user_ids}")
-
-            # self.logger.info(f"Users gh_user_id: {data['user.id']}")
-            # in_user_ids = False
-            # if data['user.id'] in gh_user_ids:
-            #     in_user_ids = True
-            # self.logger.info(f"{data['user.id']} is in gh_user_ids")
-
-            # self.logger.info(f"table_values_cntrb len: {len(table_values_cntrb)}")
-
-            #Deal with if data
-            #See if we can check using the user.id
-            source_data_id = None
-            try:
-                source_data_id = data[f'{prefix}id']
-            except KeyError:
-                source_data_id = data[f'{prefix}node_id']
+        #Use the alt identifier if user.id is not present in source_data
+        cntrb_ids = self.find_contributors([(data.get(f'{prefix}id'), data.get(f'{prefix}node_id')) for data in with_login])
 
+        # loop through data to test if it is already in the database
+        for data, cntrb_id in zip(with_login, cntrb_ids):
 
             #if user.id is in the database then there is no need to add the contributor
-            if source_data_id in user_unique_ids:
-
-                self.logger.info("{} found in database".format(source_data_id))
-
-                user_id_row = []
-                try:
-                    data[f'{prefix}id']
-                    #gets the dict from the table_values_cntrb that contains data['user.id']
-                    user_id_row = list(filter(lambda x: x['gh_user_id'] == source_data_id, table_values_cntrb))[0]
-                    #### Andrew: in a small number of cases, using data on contributors originally gathered in late 2019, there
-                    #### is a mismatch .. the gh_user_id for a login is different. I suspect this rare case to be one 
-                    #### where a person did something that changed their gh_user_id ... I am unsure how this can happen ... 
-                except KeyError:
-                    user_id_row = list(filter(lambda x: x['gh_node_id'] == source_data_id, table_values_cntrb))[0]
-                    #pass # 12/3/2021 SPG ... added pass to try to get past this key error in large inserts.
-                    continue # 12/3/2021 SPG ... may be better inside a loop
+            if cntrb_id is not None:
 
                 #assigns the cntrb_id to the source data to be returned to the workers
-                data['cntrb_id'] = user_id_row['cntrb_id']
-                self.logger.info(f"cntrb_id {data['cntrb_id']} found in database and assigned to enriched data")
+                data['cntrb_id'] = cntrb_id
 
-            #contributor is not in the database
+            #contributor is not in the database, it is looked up with the others that are missing
             else:
+                missing.append(data)
 
-              self.logger.info("{} not in database, making api call".format(source_data_id))
-
-              self.logger.info("login: {}".format(data[f'{prefix}login']))
-
-              try:
-                url = ("https://api.github.com/users/" + str(data[f'{prefix}login']))
-              except Exception as e:
-                self.logger.info(f"Error when creating url: {e}. Data: {data}")
-                #pass # changed continue to pass 12/3/2021 SPG
-                continue # changed back 12/3/2021 SPG
-              attempts = 0
-              contributor = None
-              success = False
-
-              while attempts < 10:
-                self.logger.info(f"Hitting endpoint: {url} ...\n")
-                try:
-                  response = requests.get(url=url, headers=self.headers, timeout=(5.05,30.01))
-                except TimeoutError:
-                  self.logger.info(f"User data request for enriching contributor data failed with {attempts} attempts! Trying again...")
-                  time.sleep(10)
-                  #pass # changed continue to pass 12/3/2021 SPG
-                  continue # changed back 12/3/2021 SPG
-                self.update_rate_limit(response,platform=platform)
-
-                try:
-                  contributor = response.json()
-                except:
-                  contributor = json.loads(json.dumps(response.text))
-                  continue # added continue 12/3/2021 SPG
-
-
-                if type(contributor) == dict:
-                  self.logger.info("Request returned a dict!")
-                  self.logger.info(f"Contributor data: {contributor}") 
-                  # contributor['gh_login'] = str(contributor['gh_login']) ## cast as string by SPG on 11/28/2021 due to `nan` user
-                  success = True
-                  break
-                elif type(contributor) == list:
-                  self.logger.warning("Wrong type returned trying again...")
-                  self.logger.info(f"Contributor data: {contributor}")
-                elif type(contributor) == str:
-                  self.logger.info(f"Warning! page_data was string: {contributor}\n")
-                  if "<!DOCTYPE html>" in contributor:
-                    self.logger.info("HTML was returned, trying again...\n")
-                  elif len(contributor) == 0:
-                    self.logger.warning("Empty string, trying again...\n")
-                  else:
-                    try:
-                      contributor = json.loads(contributor)
-                      # contributor['gh_login'] = str(contributor['gh_login']) ## cast as string by SPG on 11/28/2021 due to `nan` user                     
-                      success = True
-                      break
-                    except:
-                      pass
-                attempts += 1
-              if not success:
-                break
-
-
-
-
-              self.logger.info(f"Contributor data: {contributor}")
-
-              cntrb = {
-              "cntrb_login": contributor['login'],
-              "cntrb_created_at": contributor['created_at'],
-              "cntrb_email": contributor['email'] if 'email' in contributor else None,
-              "cntrb_company": contributor['company'] if 'company' in contributor else None,
-              "cntrb_location": contributor['location'] if 'location' in contributor else None,
-              # "cntrb_type": , dont have a use for this as of now ... let it default to null
-              "cntrb_canonical": contributor['email'] if 'email' in contributor else None,
-              "gh_user_id": contributor['id'],
-              "gh_login": str(contributor['login']),  ## cast as string by SPG on 11/28/2021 due to `nan` user
-              "gh_url": contributor['url'],
-              "gh_html_url": contributor['html_url'],
-              "gh_node_id": contributor['node_id'],
-              "gh_avatar_url": contributor['avatar_url'],
-              "gh_gravatar_id": contributor['gravatar_id'],
-              "gh_followers_url": contributor['followers_url'],
-              "gh_following_url": contributor['following_url'],
-              "gh_gists_url": contributor['gists_url'],
-              "gh_starred_url": contributor['starred_url'],
-              "gh_subscriptions_url": contributor['subscriptions_url'],
-              "gh_organizations_url": contributor['organizations_url'],
-              "gh_repos_url": contributor['repos_url'],
-              "gh_events_url": contributor['events_url'],
-              "gh_received_events_url": contributor['received_events_url'],
-              "gh_type": contributor['type'],
-              "gh_site_admin": contributor['site_admin'],
-              "cntrb_last_used" : None if 'updated_at' not in contributor else contributor['updated_at'],
-              "cntrb_full_name" : None if 'name' not in contributor else contributor['name'],
-              "tool_source": self.tool_source,
-              "tool_version": self.tool_version,
-              "data_source": self.data_source
-              }
-
-              #insert new contributor into database
-              # TODO: make this method it's own worker. This errors because of collisions between github_worker and pull_request_worker.
-              #We can solve this by making another worker with a queue. It wouldn't have to be too complicated.
-              try:
-                self.db.execute(self.contributors_table.insert().values(cntrb))
-              except s.exc.IntegrityError:
-                self.logger.info(f"there was a collision caught ....")
-                self.logger.info(traceback.format_exc())
-                #pass # added by sean 11/29/2021 ... think it might be blocking comment insertion otherwise
-                continue # changed to continue on 12/3/2021
-              except Exception as e:
-                self.logger.info(f"Contributor was unable to be added to table! Attempting to get cntrb_id from table anyway because of possible collision. Error: {e}")
-                #pass # added by sean 11/29/2021 ... think it might be blocking comment insertion otherwise
-                continue 
-
-              #Get the contributor id from the newly inserted contributor.
-              cntrb_id_row = self.db.execute(
-                  s.sql.select(self.get_relevant_columns(self.contributors_table,cntrb_action_map)).where(
-                    self.contributors_table.c.gh_user_id==cntrb["gh_user_id"]
-                  )
-                ).fetchall()
-
-              #Handle and log rare failure cases. If this part errors something is very wrong.
-              if len(cntrb_id_row) == 1:
-                data['cntrb_id'] = cntrb_id_row[0]['cntrb_id']
-                self.logger.info(f"cntrb_id {data['cntrb_id']} found in database and assigned to enriched data")
-              elif len(cntrb_id_row) == 0:
-                self.logger.error("Couldn't find contributor in database. Something has gone very wrong. Augur ran into a contributor that is unable to be inserted into the contributors table but is also not present in that table.")
-              else:
-                self.logger.info(f"There are more than one contributors in the table with gh_user_id={cntrb['gh_user_id']}")
-
-
-              cntrb_data = {
-              'cntrb_id': int(data['cntrb_id']), # came through as a float. Fixed 11/28/2021, SPG
-              'gh_node_id': cntrb['gh_node_id'],
-              'cntrb_login': str(cntrb['cntrb_login']), # NaN user issue. Fixed 11/28/2021, SPG
-              'gh_user_id': int(cntrb['gh_user_id']) # came through as a float. Fixed 11/28/2021, SPG
-              }
-              #This updates our list of who is already in the database as we iterate to avoid duplicates.
-              #People who make changes tend to make more than one in a row.
-              table_values_cntrb.append(cntrb_data)
+        if missing:
+            self.logger.info(f"{len(missing)} data points have contributors that are not in the database, resolving them...")
+            cntrb_ids = self.request_contributors([data[f'{prefix}login'] for data in missing])
+            for data in missing:
+                cntrb_id = cntrb_ids.get(str(data[f'{prefix}login']).lower())
+                if cntrb_id is not None:
+                    data['cntrb_id'] = cntrb_id
 
         self.logger.info(
           "Contributor id enrichment successful, result has "
@@ -715,7 +538,7 @@ class WorkerGitInterfaceable(Worker):
         # This borrow's the logic to safely hit an endpoint from paginate_endpoint.
         while attempts < 10:
             try:
-                response = requests.get(url=url, headers=self.headers, timeout=(5.05,30.01))
+                response = self.conditional_get(url, timeout=(5.05,30.01), keep_body=True)
             except TimeoutError:
                 self.logger.info(
                     f"User data request for enriching contributor data failed with {attempts} attempts! Trying again...")
@@ -1031,6 +854,23 @@ class WorkerGitInterfaceable(Worker):
             # Change headers to be using the new oauth's key
             self.headers = {"PRIVATE-TOKEN" : self.oauths[0]['access_token']}
 
+    def lease_key(self):
+        """ Switches to the key with the most rate limit budget left across every worker process,
+        waiting for the first key to reset or come out of a backoff if none has any left
+        """
+        while True:
+            oauth, wait = self.key_pool.lease(self.oauths)
+            if oauth is not None:
+                break
+            self.logger.info(f"No key has rate limit left in any worker, waiting {wait} seconds")
+            time.sleep(wait)
+
+        # Make the leased oauth the 0th element in self.oauths so we know which one is in use
+        index = self.oauths.index(oauth)
+        self.oauths[0], self.oauths[index] = self.oauths[index], self.oauths[0]
+        self.headers = {'Authorization': 'token %s' % oauth['access_token']}
+        self.logger.info(f"Leased {oauth['leased']} requests of oauth {oauth['oauth_id']}")
+
     def update_gh_rate_limit(self, response, bad_credentials=False, temporarily_disable=False):
         # Try to get rate limit from request headers, sometimes it does not work (GH's issue)
         #   In that case we just decrement from last recieved header count
@@ -1038,6 +878,8 @@ class WorkerGitInterfaceable(Worker):
             self.logger.warning(
                 f"Removing oauth with bad credentials from consideration: {self.oauths[0]}"
             )
+            if self.key_pool is not None:
+                self.key_pool.back_off(self.oauths[0], 3600)
             del self.oauths[0]
 
         if temporarily_disable:
@@ -1046,9 +888,13 @@ class WorkerGitInterfaceable(Worker):
                 "of this key until its rate limit resets..."
             )
             self.oauths[0]['rate_limit'] = 0
+            if self.key_pool is not None:
+                retry_after = str(response.headers.get('Retry-After', ''))
+                self.key_pool.back_off(self.oauths[0], int(retry_after) if retry_after.isdigit() else DEFAULT_BACKOFF)
         else:
             try:
                 self.oauths[0]['rate_limit'] = int(response.headers['X-RateLimit-Remaining'])
+                self.oauths[0]['reset'] = int(response.headers['X-RateLimit-Reset'])
                 # self.logger.info("Recieved rate limit from headers\n")
             except:
                 self.oauths[0]['rate_limit'] -= 1
@@ -1059,6 +905,15 @@ class WorkerGitInterfaceable(Worker):
             f"Updated rate limit, you have: {self.oauths[0]['rate_limit']} requests remaining."
         )
 
+        if self.key_pool is not None:
+            # Lease again once this lease is used up, the key ran out or the key was backed off from
+            self.oauths[0]['leased'] = self.oauths[0].get('leased', 0) - 1
+            if self.oauths[0]['leased'] <= 0 or self.oauths[0]['rate_limit'] <= 0 or temporarily_disable or bad_credentials:
+                if 'reset' in self.oauths[0]:
+                    self.key_pool.observe(self.oauths[0], self.oauths[0]['rate_limit'], self.oauths[0]['reset'])
+                self.lease_key()
+            return
+
         #Stalls after here for some reason.
         if self.oauths[0]['rate_limit'] <= 0:
             try:
@@ -1131,148 +986,630 @@ class WorkerGitInterfaceable(Worker):
     def update_rate_limit(
         self, response, bad_credentials=False, temporarily_disable=False, platform="gitlab"
     ):
-        if platform == 'gitlab':
-            return self.update_gitlab_rate_limit(
-                response, bad_credentials=bad_credentials, temporarily_disable=temporarily_disable
-            )
-        elif platform == 'github':
-            return self.update_gh_rate_limit(
-                response, bad_credentials=bad_credentials, temporarily_disable=temporarily_disable
-            )
+        with self.rate_limit_lock:
+            if platform == 'gitlab':
+                return self.update_gitlab_rate_limit(
+                    response, bad_credentials=bad_credentials, temporarily_disable=temporarily_disable
+                )
+            elif platform == 'github':
+                return self.update_gh_rate_limit(
+                    response, bad_credentials=bad_credentials, temporarily_disable=temporarily_disable
+                )
 
-    #insertion_method and stagger are arguments that allow paginate_endpoint to insert at around ~500 pages at a time.
-    def paginate_endpoint(
-        self, url, action_map={}, table=None, where_clause=True, platform='github', in_memory=True, stagger=False, insertion_method=None, insertion_threshold=1000
-    ):
+    def conditional_get(self, url, timeout, keep_body=False, **kwargs):
+        """ requests.get with the current headers, over the pooled session of the current key,
+        that only asks for the response if it changed since the last collection. Unchanged
+        responses come back with status code 304, which GitHub does not count against the rate
+        limit, and with the Link header they had before.
 
-        #Get augur columns using the action map along with the primary key
-        table_values = self.db.execute(
-            s.sql.select(self.get_relevant_columns(table, action_map)).where(where_clause)
-        ).fetchall()
+        :param keep_body: Boolean, also cache the body and answer a 304 with it, for single
+            objects whose content the caller needs either way
+        """
+        get = self.http_client.get if self.http_client is not None else requests.get
+        if self.http_cache is None:
+            return get(url=url, headers=self.headers, timeout=timeout, **kwargs)
+
+        scope = auth_scope(self.headers)
+        cached = self.http_cache.get(url, scope)
+        response = get(
+            url=url, headers={**self.headers, **self.http_cache.conditional_headers(cached)},
+            timeout=timeout, **kwargs
+        )
 
-        page_number = 1
-        multiple_pages = False
-        need_insertion = []
-        need_update = []
+        if response.status_code == 304 and cached:
+            if cached['link'] and 'Link' not in response.headers:
+                response.headers['Link'] = cached['link']
+            if cached['body'] is not None:
+                response._content = cached['body'].encode('utf-8')
+        else:
+            self.http_cache.remember(url, scope, response, keep_body)
+        return response
 
-        #Stores sum of page data
-        all_data = []
-        forward_pagination = True
-        backwards_activation = False
-        last_page_number = -1
+    def get_contributor_index(self):
+        """ ContributorIndex of the contributors table, loaded the first time a task looks up a
+        contributor, and kept across tasks for contributor_index_ttl seconds if that is set
+        """
+        ttl = self.config.get('contributor_index_ttl', DEFAULT_INDEX_TTL)
+        if self.contributor_index is not None and not (ttl and self.contributor_index.expired(ttl)):
+            return self.contributor_index
 
-        #Block to handle page queries and retry at least 10 times
-        while True:
+        index = ContributorIndex()
+        query = s.sql.select([self.contributors_table.c[column] for column in INDEX_COLUMNS])
+        with self.db.connect() as connection:
+            index.add_all(connection.execution_options(stream_results=True).execute(query))
 
-            # Multiple attempts to hit endpoint
-            num_attempts = 0
-            success = False
-            while num_attempts < 10:
-                self.logger.info(f"Hitting endpoint: {url.format(page_number)}...\n")
-                try:
-                    response = requests.get(url=url.format(page_number), headers=self.headers, timeout=(20.24, 50.01))
-                except TimeoutError as e:
-                    self.logger.info("Request timed out. Sleeping 10 seconds and trying again...\n")
-                    time.sleep(10)
+        self.logger.info(f"Indexed {len(index)} contributors")
+        self.contributor_index = index
+        return index
+
+    def find_contributors(self, users):
+        """ cntrb_ids of GitHub users, from the contributor index or, for users another worker added
+        since the index was loaded, from the contributors table in a single query
+
+        :param users: List of (gh_user_id, gh_node_id) tuples, either may be None
+        :return: List of cntrb_ids in the order of users, None for users that are not contributors yet
+        """
+        index = self.get_contributor_index()
+        cntrb_ids = [index.lookup(gh_user_id=user_id, gh_node_id=node_id) for user_id, node_id in users]
+
+        unknown = [user for user, cntrb_id in zip(users, cntrb_ids) if cntrb_id is None]
+        user_ids = {int(index.key(user_id)) for user_id, _ in unknown if index.key(user_id) is not None}
+        node_ids = {str(node_id) for _, node_id in unknown if index.key(node_id) is not None}
+        if not user_ids and not node_ids:
+            return cntrb_ids
+
+        conditions = []
+        if user_ids:
+            conditions.append(self.contributors_table.c.gh_user_id.in_(sorted(user_ids)))
+        if node_ids:
+            conditions.append(self.contributors_table.c.gh_node_id.in_(sorted(node_ids)))
+        index.add_all(self.db.execute(
+            s.sql.select([self.contributors_table.c[column] for column in INDEX_COLUMNS]).where(s.or_(*conditions))
+        ).fetchall())
+
+        return [
+            cntrb_id if cntrb_id is not None else index.lookup(gh_user_id=user_id, gh_node_id=node_id)
+            for (user_id, node_id), cntrb_id in zip(users, cntrb_ids)
+        ]
+
+    def resolve_contributors(self, logins, defaults={}, not_found=None):
+        """ Contributors of GitHub users, inserting the users that are not contributors yet. The
+        logins are deduplicated and looked up DEFAULT_BATCH_SIZE at a time in one GraphQL query,
+        instead of one request to the users endpoint each.
+
+        :param logins: Iterable of Strings, GitHub logins
+        :param defaults: Dict, values for the columns a new contributor's user has no value for,
+            see contributor_row, keyed by the lowercased login
+        :param not_found: Set, when given the lowercased logins GitHub answered with a 404 are added
+            to it. Logins in neither it nor the result could not be looked up this time
+        :return: Dict, row of the contributors table with its cntrb_id for every login that could
+            be resolved, keyed by the lowercased login
+        """
+        logins = list({str(login).lower(): login for login in logins if login and login != 'nan'}.values())
+        if not logins:
+            return {}
+        self.logger.info(f"Resolving {len(logins)} GitHub users")
+
+        query = UserQuery()
+        users = {}
+        for batch in batches(logins, self.config.get('contributor_batch_size', DEFAULT_BATCH_SIZE)):
+            response, payload = self.fetch_page(query, batch, {}, max_attempts=3)
+            if response is not None:
+                users.update(query.users(payload, batch))
+
+            # Organizations and bots are not Users in GraphQL, the REST API still knows them
+            for login in batch:
+                if login in users:
                     continue
+                user = self.request_dict_from_endpoint(f"https://api.github.com/users/{login}")
+                if isinstance(user, dict) and 'login' in user and 'id' in user:
+                    users[login] = user
+                elif isinstance(user, dict) and user.get('message') == 'Not Found':
+                    self.logger.info(f"GitHub user {login} does not exist")
+                    if not_found is not None:
+                        not_found.add(login.lower())
+                else:
+                    self.logger.info(f"GitHub user {login} could not be looked up, it is tried again later")
+
+        rows = {
+            login.lower(): contributor_row(
+                user, self.tool_source, self.tool_version, self.data_source, defaults.get(login.lower(), {})
+            ) for login, user in users.items()
+        }
+        cntrb_ids = self.insert_contributors(list(rows.values()))
+        return {
+            login: {**row, 'cntrb_id': cntrb_ids[row['gh_user_id']]}
+            for login, row in rows.items() if row['gh_user_id'] in cntrb_ids
+        }
+
+    def request_contributors(self, logins):
+        """ cntrb_ids of GitHub users, resolved through the contributor resolution queue every worker
+        shares. A worker that gets the queue's lock resolves what every worker submitted. The others
+        return what the queue already settled without waiting, their rows are left without a
+        cntrb_id until the worker resolving the queue gets to them or a later pass asks again.
+
+        :param logins: Iterable of Strings, GitHub logins
+        :return: Dict, cntrb_id of every login that could be resolved, keyed by the lowercased login
+        """
+        logins = list({str(login).lower() for login in logins if login and login != 'nan'})
+        if not logins:
+            return {}
+        queue = self.contributor_queue
+        queue.submit(logins)
+
+        settled = queue.results(logins)
+        if len(settled) < len(logins):
+            with queue.lead() as leader:
+                if leader:
+                    self.resolve_contributor_queue()
+                    settled = queue.results(logins)
+
+        unsettled = len(logins) - len(settled)
+        if unsettled:
+            # They stay pending for the next worker that resolves the queue
+            self.logger.info(f"{unsettled} GitHub users are not resolved yet, their rows are left for a later pass")
+        return {login: cntrb_id for login, cntrb_id in settled.items() if cntrb_id is not None}
+
+    def resolve_contributor_queue(self):
+        """ Resolves the logins every worker submitted to the contributor resolution queue, only
+        called while holding the queue's lock. Only the logins pending when it is called are
+        resolved, so logins that cannot be looked up right now are not retried over and over and
+        other workers' new submissions do not keep this worker from its own task.
+        """
+        queue = self.contributor_queue
+        batch_size = self.config.get('contributor_batch_size', DEFAULT_BATCH_SIZE)
+        for logins in batches(queue.pending(), batch_size):
+            not_found = set()
+            contributors = self.resolve_contributors(logins, not_found=not_found)
+            queue.settle(logins, {
+                login: contributor['cntrb_id'] for login, contributor in contributors.items()
+            }, not_found)
+
+    def insert_contributors(self, rows):
+        """ Inserts the contributors whose gh_user_id is not in the table yet with one statement.
+        Workers insert contributors one at a time under an advisory lock, so two workers never
+        insert the same user.
+
+        :param rows: List of dicts, rows of the contributors table from contributor_row
+        :return: Dict, cntrb_id of every row by its gh_user_id
+        """
+        if not rows:
+            return {}
+        table = self.contributors_table
+
+        def existing(connection, user_ids):
+            return {
+                row['gh_user_id']: row['cntrb_id'] for row in connection.execute(
+                    s.sql.select([table.c.gh_user_id, table.c.cntrb_id]).where(table.c.gh_user_id.in_(user_ids))
+                ).fetchall()
+            }
+
+        def insert(new_rows):
+            with self.db.begin() as connection:
+                connection.execute(s.sql.text("SELECT pg_advisory_xact_lock(:key)"), key=WRITE_LOCK)
+                cntrb_ids = existing(connection, [row['gh_user_id'] for row in new_rows])
+                new_rows = [row for row in new_rows if row['gh_user_id'] not in cntrb_ids]
+                if new_rows:
+                    cntrb_ids.update({
+                        row['gh_user_id']: row['cntrb_id'] for row in connection.execute(
+                            table.insert().values(new_rows).returning(table.c.gh_user_id, table.c.cntrb_id)
+                        ).fetchall()
+                    })
+            return cntrb_ids
+
+        with self.db.connect() as connection:
+            cntrb_ids = existing(connection, list({row['gh_user_id'] for row in rows}))
+        new_rows = list({row['gh_user_id']: row for row in rows if row['gh_user_id'] not in cntrb_ids}.values())
+
+        if new_rows:
+            try:
+                inserted = insert(new_rows)
+            except s.exc.IntegrityError:
+                # A login of these users still belongs to another contributor, like a user that
+                # renamed, insert the others one at a time
+                inserted = {}
+                for row in new_rows:
+                    try:
+                        inserted.update(insert([row]))
+                    except s.exc.IntegrityError:
+                        self.logger.info(f"Contributor {row['gh_login']} could not be inserted, its login is taken")
+            cntrb_ids.update(inserted)
+            self.logger.info(f"Stored {len(inserted)} contributors that were not in the table")
+
+        # Only an index that is already loaded is kept up to date, loading one here would read the whole table
+        if self.contributor_index is not None:
+            for row in rows:
+                if row['gh_user_id'] in cntrb_ids:
+                    self.contributor_index.add({**row, 'cntrb_id': cntrb_ids[row['gh_user_id']]})
+        return cntrb_ids
+
+    def register_task_completion(self, task, repo_id, model):
+        if not self.config.get('contributor_index_ttl', DEFAULT_INDEX_TTL):
+            self.contributor_index = None
+        if self.http_cache is not None and self.incomplete_collection:
+            # Pages whose rows were not all stored must not come back as 304s next time
+            self.logger.info("Not caching the responses of this task since some of their data was not stored")
+            self.http_cache.discard()
+        elif self.http_cache is not None:
+            try:
+                self.http_cache.flush()
+            except Exception as e:
+                self.print_traceback("Writing the response cache", e, False)
+        self.incomplete_collection = False
+        self.resumed_pagination = False
+        super().register_task_completion(task, repo_id, model)
+
+    def register_task_failure(self, task, repo_id, e):
+        if not self.config.get('contributor_index_ttl', DEFAULT_INDEX_TTL):
+            self.contributor_index = None
+        if self.http_cache is not None:
+            self.http_cache.discard()
+        self.incomplete_collection = False
+        self.resumed_pagination = False
+        super().register_task_failure(task, repo_id, e)
+
+    def get_since_watermark(self, model):
+        """ Newest updated_at the given model has fully collected for the current repo
+
+        :param model: String, name of the model, e.g. issues
+        :return: String, ISO 8601 timestamp to pass as the since parameter of the API,
+            None if the model was never fully collected for this repo
+        """
+        since = self.helper_db.execute(s.sql.text("""
+            SELECT since FROM augur_operations.worker_collection_watermark
+            WHERE repo_id = :repo_id AND model = :model
+        """), repo_id=self.repo_id, model=model).scalar()
+
+        if since is None:
+            return None
+        self.logger.info(f"Collecting {model} updated since {since} for repo {self.repo_id}")
+        return since.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def since_parameters(self, since):
+        """ Query parameters asking a GitHub list endpoint for the data updated since a watermark,
+        oldest first. They go before the page parameter, which paginate_endpoint expects last.
+
+        :param since: String, watermark from get_since_watermark, or None for all data
+        """
+        if not since:
+            return ""
+        return f"&since={since}&sort=updated&direction=asc"
+
+    def set_since_watermark(self, model, source_data, column='updated_at'):
+        """ Moves the watermark of the given model up to the newest value of a column in the
+        collected data. Should only be called once everything the model collected is stored.
+
+        :param model: String, name of the model, e.g. issues
+        :param source_data: List of dicts, data points as the API returned them
+        :param column: String, field of the data points holding their ISO 8601 update time
+        """
+        if self.resumed_pagination:
+            # Rows of the pages before the checkpoint never reached the child models, and items updated
+            # meanwhile may have moved behind it, so the next run starts from the old watermark again
+            self.logger.info(f"Not moving the {model} watermark since a pagination resumed from a checkpoint")
+            return
+
+        updated = [data[column] for data in source_data if data.get(column)]
+        if not updated:
+            return
+
+        self.helper_db.execute(s.sql.text("""
+            INSERT INTO augur_operations.worker_collection_watermark (repo_id, model, since)
+            VALUES (:repo_id, :model, :since)
+            ON CONFLICT (repo_id, model) DO UPDATE SET
+                since = GREATEST(worker_collection_watermark.since, EXCLUDED.since),
+                data_collection_date = CURRENT_TIMESTAMP
+        """), repo_id=self.repo_id, model=model, since=max(updated))
+
+        # Sent to the broker with the task's completion, newer upstream data counts as a change
+        self.upstream_updated_at = max(filter(None, [getattr(self, 'upstream_updated_at', None), max(updated)]))
+
+    def get_pagination_checkpoint(self, url):
+        """ Last page of an endpoint whose rows an interrupted pipelined pagination of the current
+        repo stored, or None
+        """
+        return self.helper_db.execute(s.sql.text("""
+            SELECT page FROM augur_operations.worker_pagination_checkpoint
+            WHERE repo_id = :repo_id AND endpoint = :endpoint
+        """), repo_id=self.repo_id, endpoint=url).scalar()
+
+    def set_pagination_checkpoint(self, url, page):
+        self.helper_db.execute(s.sql.text("""
+            INSERT INTO augur_operations.worker_pagination_checkpoint (repo_id, endpoint, page)
+            VALUES (:repo_id, :endpoint, :page)
+            ON CONFLICT (repo_id, endpoint) DO UPDATE SET
+                page = EXCLUDED.page, data_collection_date = CURRENT_TIMESTAMP
+        """), repo_id=self.repo_id, endpoint=url, page=page)
+
+    def clear_pagination_checkpoint(self, url):
+        self.helper_db.execute(s.sql.text("""
+            DELETE FROM augur_operations.worker_pagination_checkpoint
+            WHERE repo_id = :repo_id AND endpoint = :endpoint
+        """), repo_id=self.repo_id, endpoint=url)
+
+    def request_page(self, backend, state, timeout):
+        """ Sends the request of a page with the current key, conditionally when it is a GET
+        """
+        method, url, kwargs = backend.request(state)
+        if method == 'GET':
+            return self.conditional_get(url, timeout=timeout, **kwargs)
+        post = self.http_client.post if self.http_client is not None else requests.post
+        return post(url, headers=self.headers, timeout=timeout, **kwargs)
+
+    def fetch_page(self, backend, state, prefetched, platform='github', max_attempts=10, timeout=(20.24, 50.01)):
+        """ Requests a page until it arrives, retrying timeouts, server errors and malformed
+        responses up to max_attempts times. Rate limits are waited out or handed to another key
+        without using up attempts. A page that is refused or runs out of attempts marks the collection
+        incomplete, so its validators are discarded and callers know the pagination was cut off.
+
+        :returns: The response and its decoded body, or None and None when the page can't be collected
+        """
+        attempts = 0
+        while attempts < max_attempts:
+            url = backend.request(state)[1]
+            self.logger.info(f"Hitting endpoint: {url}...\n")
+            try:
+                future = prefetched.pop(state, None)
+                response = future.result() if future is not None else self.request_page(backend, state, timeout)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, TimeoutError) as e:
+                attempts += 1
+                self.logger.info(f"Request failed with {e}. Sleeping 10 seconds and trying again...\n")
+                time.sleep(10)
+                continue
 
+            if future is not None:
+                self.account_prefetched_page(response, platform)
+            else:
                 self.update_rate_limit(response, platform=platform)
 
+            payload = decode_payload(response)
+            outcome = backend.outcome(response, payload)
+
+            if outcome in (PAGE, NOT_MODIFIED):
+                return response, payload
+            if outcome == NOT_FOUND:
+                self.logger.warning(f"Repo was not found or does not exist for endpoint: {url}\n")
+                return None, None
+            if outcome == CLIENT_ERROR:
+                self.logger.warning(f"Request to {url} was refused with status {response.status_code}: {payload}\n")
+                self.incomplete_collection = True
+                return None, None
+            if outcome == SECONDARY_RATE_LIMITED:
+                if self.key_pool is not None or platform == 'gitlab':
+                    # Every worker stays off this key for a while and this one moves on to another
+                    self.update_rate_limit(response, temporarily_disable=True, platform=platform)
+                else:
+                    retry_after = str(response.headers.get('Retry-After', ''))
+                    wait = int(retry_after) if retry_after.isdigit() else 100
+                    self.logger.info(f"Sleeping for {wait} seconds due to secondary rate limit issue.\n")
+                    time.sleep(wait)
+                continue
+            if outcome == RATE_LIMITED:
+                # update_rate_limit already waited for the reset or switched keys
+                continue
+
+            attempts += 1
+            if outcome == BAD_CREDENTIALS:
+                self.logger.info("\n\n\n\n\n\n\n POSSIBLY BAD TOKEN \n\n\n\n\n\n\n")
+                self.update_rate_limit(response, bad_credentials=True, platform=platform)
+            elif outcome == SERVER_ERROR:
+                self.logger.info(f"Server returned {response.status_code}, trying again...\n")
+                time.sleep(min(2 ** attempts, 60))
+            else:
+                self.logger.info(f"Unexpected response, trying again: {payload}\n")
+
+        self.logger.warning(f"Could not collect {backend.request(state)[1]} after {max_attempts} attempts\n")
+        self.incomplete_collection = True
+        return None, None
+
+    def account_prefetched_page(self, response, platform):
+        """ Rate limit accounting of a page that was requested ahead, which is charged to the key it
+        was sent with even if the worker has leased another key since
+        """
+        sent_with = response.request.headers.get('Authorization') if response.request is not None else None
+        if self.key_pool is None or platform != 'github' or sent_with == (self.headers or {}).get('Authorization'):
+            self.update_rate_limit(response, platform=platform)
+            return
+
+        for oauth in self.oauths:
+            if sent_with == 'token %s' % oauth['access_token']:
                 try:
-                    page_data = response.json()
-                except:
-                    page_data = json.loads(json.dumps(response.text))
+                    self.key_pool.observe(
+                        oauth, int(response.headers['X-RateLimit-Remaining']), int(response.headers['X-RateLimit-Reset'])
+                    )
+                except (KeyError, ValueError):
+                    self.logger.info("Page requested ahead had no rate limit headers")
+                return
 
-                if type(page_data) == list:
-                    success = True
+    def iterate_pages(
+        self, backend, platform='github', backwards=False, max_attempts=10, timeout=(20.24, 50.01), start=None,
+        stop_unchanged=False
+    ):
+        """ Generator of the pages of an endpoint as they arrive, so they can be processed without
+        holding the whole endpoint in memory. Pagination ends at an empty page, a missing
+        resource, or a page that could not be collected.
+
+        Once the last page is known, the next pages, in the order the pagination visits them, are
+        requested on the http client's threads while the current one is processed.
+
+        :param backend: RestPages, GitlabPages or GraphqlPages of the endpoint, or the URL of a
+            REST endpoint of the platform with a curly brace formatter for the page number
+        :param backwards: Boolean, after the first page continue from the last page back to the
+            second, for numbered pages
+        :param start: Integer, number of the page to start forward pagination at instead of the first
+        :param stop_unchanged: Boolean, end the pagination at the first page that did not change since
+            the last collection. Only for endpoints sorted by most recently updated first, where an
+            unchanged page means no later page changed either
+        :returns: Generator of Pages, pages that did not change since the last collection come
+            with no data and their 304 response
+        """
+        if isinstance(backend, str):
+            backend = GitlabPages(backend) if platform == 'gitlab' else RestPages(backend)
+        backwards = backwards and backend.numbered
+
+        state = start if start is not None and backend.numbered and not backwards else backend.first()
+        count = 0
+        last = None
+        prefetched = {}
+        try:
+            while state is not None:
+                response, payload = self.fetch_page(backend, state, prefetched, platform, max_attempts, timeout)
+                if response is None:
                     break
-                elif type(page_data) == dict:
-                    self.logger.info("Request returned a dict: {}\n".format(page_data))
-                    if page_data['message'] == "Not Found":
-                        self.logger.warning(
-                            "Github repo was not found or does not exist for endpoint: "
-                            f"{url.format(page_number)}\n"
-                        )
-                        break
-                    if "You have exceeded a secondary rate limit. Please wait a few minutes before you try again" in page_data['message']:
-                        num_attempts -=1
-                        self.logger.info('\n\n\n\nSleeping for 100 seconds due to secondary rate limit issue.\n\n\n\n')
-                        time.sleep(100)
-                    if "You have triggered an abuse detection mechanism." in page_data['message']:
-                        num_attempts -= 1
-                        self.update_rate_limit(response, temporarily_disable=True,platform=platform)
-                    if page_data['message'] == "Bad credentials":
-                        self.logger.info("\n\n\n\n\n\n\n POSSIBLY BAD TOKEN \n\n\n\n\n\n\n")
-                        self.update_rate_limit(response, bad_credentials=True, platform=platform)
-                elif type(page_data) == str:
-                    self.logger.info(f"Warning! page_data was string: {page_data}\n")
-                    if "<!DOCTYPE html>" in page_data:
-                        self.logger.info("HTML was returned, trying again...\n")
-                    elif len(page_data) == 0:
-                        self.logger.warning("Empty string, trying again...\n")
+
+                not_modified = response.status_code == 304
+                data = [] if not_modified else backend.items(payload)
+                if len(data) == 0 and not not_modified:
+                    self.logger.info("Response was empty, breaking from pagination.\n")
+                    break
+
+                count += 1
+                if last is None:
+                    last = backend.last_page(response)
+
+                if last is not None and self.http_client is not None:
+                    if backwards:
+                        #After the first page backwards pagination goes from the last page down to the second
+                        top = last if state == 1 else state - 1
+                        upcoming = range(top, max(top - self.http_client.concurrency, 1), -1)
                     else:
-                        try:
-                            page_data = json.loads(page_data)
-                            success = True
-                            break
-                        except:
-                            pass
-                num_attempts += 1
-            if not success:
-              break
-
-            # Success
-
-            # Determine if continued pagination is needed
-
-            if len(page_data) == 0:
-                self.logger.info("Response was empty, breaking from pagination.\n")
-                break
+                        upcoming = range(state + 1, min(state + self.http_client.concurrency, last) + 1)
+                    for next_page in upcoming:
+                        if next_page not in prefetched:
+                            prefetched[next_page] = self.http_client.submit(self.request_page, backend, next_page, timeout)
+
+                number = state if backend.numbered and not isinstance(state, str) else count
+                self.logger.info("Analyzation of page {} of {} complete\n".format(
+                    number, last if last is not None else "*last page not known*"))
+                yield Page(number, data, response, last)
+
+                if not_modified and stop_unchanged:
+                    self.logger.info("Page did not change since the last collection, neither did the ones after it.\n")
+                    break
 
-            all_data += page_data
+                if backwards and state == 1:
+                    state = last if last is not None and last > 1 else None
+                elif backwards:
+                    state = state - 1 if state > 2 else None
+                else:
+                    state = backend.next(state, response, payload, last)
+        finally:
+            self.discard_prefetched_pages(backend, prefetched, platform)
 
-            if not forward_pagination:
+    def discard_prefetched_pages(self, backend, prefetched, platform='github'):
+        """ Waits for pages that were requested ahead but not processed, charges the ones that were
+        sent to the rate limit, and forgets their validators so they are requested in full next time
+        """
+        for future in prefetched.values():
+            future.cancel()
+        concurrent.futures.wait(list(prefetched.values()))
+        for future in prefetched.values():
+            if not future.cancelled() and future.exception() is None:
+                self.account_prefetched_page(future.result(), platform)
+        if self.http_cache is not None and prefetched:
+            self.http_cache.forget([backend.request(state)[1] for state in prefetched])
+
+    def endpoint_change_index(self, table, action_map, where_clause=True):
+        """ Index of the natural keys of the rows we already have, or None to compare on the server
+        if there are too many
+        """
+        if where_clause is True:
+            #Only the current repo's rows can match, tables without a repo_id are looked up by the keys of each page
+            return self.repo_change_index(table, action_map)
+        return self.build_change_index(table, action_map, where_clause)
+
+    def pipeline_endpoint(
+        self, url, insertion_method, action_map={}, table=None, where_clause=True, platform='github', batch_pages=DEFAULT_BATCH_PAGES,
+        stop_unchanged=False
+    ):
+        """ paginate_endpoint for endpoints too large to hold in memory. Pages are fetched, diffed
+        and handed to insertion_method every batch_pages pages by the stages of a PagePipeline, so
+        a slow database holds back the requests instead of pages piling up.
 
-                # Checking contents of requests with what we already have in the db
-                page_insertions, page_updates = self.organize_needed_data(
-                    page_data, table_values, list(table.primary_key)[0].name,
-                    action_map
-                )
+        After every batch is stored its last page is checkpointed, and a pagination of the endpoint
+        that was interrupted resumes after that page instead of from the first. Rows of the pages
+        before the checkpoint are not handed to insertion_method again, so a task that resumed does
+        not move the since watermark, and its next run collects everything since the old one.
 
-                # Reached a page where we already have all tuples
-                if len(need_insertion) == 0 and len(need_update) == 0 and \
-                        backwards_activation:
-                    self.logger.info(
-                        "No more pages with unknown tuples, breaking from pagination.\n"
-                    )
-                    break
+        :return: Dict like paginate_endpoint's, holding the last batch, which the caller stores
+            like the remainder of a staggered pagination
+        """
+        change_index = self.endpoint_change_index(table, action_map, where_clause)
+
+        checkpoint = self.get_pagination_checkpoint(url)
+        if checkpoint:
+            self.logger.info(f"Resuming pagination of {url} after page {checkpoint}")
+            self.resumed_pagination = True
+
+        batch = {'insert': [], 'update': [], 'all': []}
+        pages_in_batch = 0
+
+        def diff(page):
+            return self.detect_changes(page.data, table, action_map, where_clause, change_index)
+
+        def store(page, changes):
+            nonlocal batch, pages_in_batch
+            batch['insert'] += changes[0]
+            batch['update'] += changes[1]
+            batch['all'] += page.data
+            pages_in_batch += 1
+
+            #The last page stays in the batch that is returned, so the caller always gets the remainder
+            if pages_in_batch >= batch_pages and page.last is not None and page.number < page.last:
+                insertion_method(batch, action_map)
+                self.set_pagination_checkpoint(url, page.number)
+                batch = {'insert': [], 'update': [], 'all': []}
+                pages_in_batch = 0
+
+        #fetch_page marks the collection incomplete when it gives up on a page, so the flag is
+        #looked at for this pagination alone
+        incomplete = self.incomplete_collection
+        self.incomplete_collection = False
+
+        pipeline = PagePipeline(self.logger, self.config.get('pipeline_queue_size', DEFAULT_QUEUE_SIZE))
+        try:
+            pipeline.run(
+                self.iterate_pages(
+                    url, platform=platform, start=checkpoint + 1 if checkpoint else None, stop_unchanged=stop_unchanged
+                ), diff, store
+            )
+            cut_off = self.incomplete_collection
+        finally:
+            self.incomplete_collection = self.incomplete_collection or incomplete
 
-                need_insertion += page_insertions
-                need_update += page_updates
+        if cut_off:
+            #The next pagination resumes after the last checkpointed batch
+            self.logger.info(f"Pagination of {url} was cut off, keeping its checkpoint")
+        else:
+            #Reached the end of the endpoint, the next pagination starts from the first page again
+            self.clear_pagination_checkpoint(url)
+        return batch
 
-            # Find last page so we can decrement from there
-            if 'last' in response.links and last_page_number == -1:
-                if platform == 'github':
-                    last_page_number = int(response.links['last']['url'][-6:].split('=')[1])
-                elif platform == 'gitlab':
-                    last_page_number = int(response.links['last']['url'].split('&')[2].split('=')[1])
+    #insertion_method and stagger are arguments that allow paginate_endpoint to insert every insertion_threshold pages.
+    def paginate_endpoint(
+        self, url, action_map={}, table=None, where_clause=True, platform='github', in_memory=True, stagger=False, insertion_method=None, insertion_threshold=1000,
+        stop_unchanged=False
+    ):
 
-                if not forward_pagination and not backwards_activation:
-                    page_number = last_page_number
-                    backwards_activation = True
+        if stagger and insertion_method != None and self.config.get('pipeline_pagination', True):
+            return self.pipeline_endpoint(
+                url, insertion_method, action_map, table, where_clause, platform,
+                self.config.get('pipeline_batch_pages', DEFAULT_BATCH_PAGES), stop_unchanged
+            )
 
-            self.logger.info("Analyzation of page {} of {} complete\n".format(page_number,
-                int(last_page_number) if last_page_number != -1 else "*last page not known*"))
+        change_index = self.endpoint_change_index(table, action_map, where_clause)
 
-            if (page_number <= 1 and not forward_pagination) or \
-                    (page_number >= last_page_number and forward_pagination):
-                self.logger.info("No more pages to check, breaking from pagination.\n")
-                break
+        #Stores sum of page data
+        all_data = []
+
+        for page in self.iterate_pages(url, platform=platform, stop_unchanged=stop_unchanged):
+            all_data += page.data
 
-            #This is probably where we should insert at around ~500 at a time
-            #makes sure that stagger is enabled, we have an insertion method, and the insertion happens every 500 pages or so.
-            if stagger and insertion_method != None and page_number % insertion_threshold == 0:
-                #call insertion method passed as argument.
+            #makes sure that stagger is enabled, we have an insertion method, and the insertion happens every insertion_threshold pages.
+            if stagger and insertion_method != None and page.number % insertion_threshold == 0:
+                need_insertion, need_update = self.detect_changes(
+                    all_data, table, action_map, where_clause, change_index
+                )
                 staggered_source_prs = {
                     'insert' : need_insertion,
                     'update' : need_update,
@@ -1283,16 +1620,11 @@ class WorkerGitInterfaceable(Worker):
                 insertion_method(staggered_source_prs,action_map)
 
                 #clear the data from memory and avoid duplicate insertions.
-                need_insertion = []
-                need_update = []
                 all_data = []
 
-            page_number = page_number + 1 if forward_pagination else page_number - 1
-
-        if forward_pagination:
-            need_insertion, need_update = self.organize_needed_data(
-                all_data, table_values, list(table.primary_key)[0].name, action_map
-            )
+        need_insertion, need_update = self.detect_changes(
+            all_data, table, action_map, where_clause, change_index
+        )
 
         return {
             'insert': need_insertion,
@@ -1344,237 +1676,50 @@ class WorkerGitInterfaceable(Worker):
         cols_to_query = list(duplicate_col_map.keys()) + update_keys + [table_pkey]
         table_values = self.get_table_values(cols_to_query, [table], where_clause)
 
-        i = 1
-        multiple_pages = False
-        tuples = []
-        while True:
-            num_attempts = 0
-            success = False
-            while num_attempts < 3:
-                self.logger.info(f'Hitting endpoint: {url.format(i)}...\n')
-                r = requests.get(url=url.format(i), headers=self.headers, timeout=(10.59, 70.21))
-
-                self.update_rate_limit(r, platform=platform)
-                if 'last' not in r.links:
-                    last_page = None
-                else:
-                    if platform == "github":
-                        last_page = r.links['last']['url'][-6:].split('=')[1]
-                    elif platform == "gitlab":
-                        last_page =  r.links['last']['url'].split('&')[2].split("=")[1]
-                    self.logger.info("Analyzing page {} of {}\n".format(i, int(last_page) + 1 if last_page is not None else '*last page not known*'))
-
-                try:
-                    j = r.json()
-                except:
-                    j = json.loads(json.dumps(r.text))
-
-                if type(j) != dict and type(j) != str:
-                    success = True
-                    break
-                elif type(j) == dict:
-                    self.logger.info("Request returned a dict: {}\n".format(j))
-                    if j['message'] == 'Not Found':
-                        self.logger.warning("Github repo was not found or does not exist for endpoint: {}\n".format(url))
-                        break
-                    if j['message'] == 'You have triggered an abuse detection mechanism. Please wait a few minutes before you try again.':
-                        num_attempts -= 1
-                        self.logger.info("rate limit update code goes here")
-                        self.update_rate_limit(r, temporarily_disable=True,platform=platform)
-                    if j['message'] == 'Bad credentials':
-                        self.logger.info("rate limit update code goes here")
-                        self.update_rate_limit(r, bad_credentials=True, platform=platform)
-                elif type(j) == str:
-                    self.logger.info(f'J was string: {j}\n')
-                    if '<!DOCTYPE html>' in j:
-                        self.logger.info('HTML was returned, trying again...\n')
-                    elif len(j) == 0:
-                        self.logger.warning('Empty string, trying again...\n')
-                    else:
-                        try:
-                            j = json.loads(j)
-                            success = True
-                            break
-                        except:
-                            pass
-                num_attempts += 1
-            if not success:
-                break
+        if self.finishing_task:
+            self.logger.info("Finishing a previous task, paginating forwards ..."
+                " excess rate limit requests will be made\n")
 
-            # Find last page so we can decrement from there
-            if 'last' in r.links and not multiple_pages and not self.finishing_task:
-                if platform == "github":
-                    param = r.links['last']['url'][-6:]
-                    i = int(param.split('=')[1]) + 1
-                elif platform == "gitlab":
-                    i = int(r.links['last']['url'].split('&')[2].split("=")[1]) + 1
-                self.logger.info("Multiple pages of request, last page is " + str(i - 1) + "\n")
-                multiple_pages = True
-            elif not multiple_pages and not self.finishing_task:
-                self.logger.info("Only 1 page of request\n")
-            elif self.finishing_task:
-                self.logger.info("Finishing a previous task, paginating forwards ..."
-                    " excess rate limit requests will be made\n")
-
-            if len(j) == 0:
-                self.logger.info("Response was empty, breaking from pagination.\n")
-                break
+        tuples = []
+        for page in self.iterate_pages(
+            url, platform=platform, backwards=not self.finishing_task, max_attempts=3, timeout=(10.59, 70.21)
+        ):
+            if page.response.status_code == 304:
+                self.logger.info("Page has not changed since the last collection, moving to next page.\n")
+                continue
 
             # Checking contents of requests with what we already have in the db
-            j = self.assign_tuple_action(j, table_values, update_col_map, duplicate_col_map, table_pkey, value_update_col_map)
+            j = self.assign_tuple_action(page.data, table_values, update_col_map, duplicate_col_map, table_pkey, value_update_col_map)
 
             if not j:
                 self.logger.error("Assigning tuple action failed, moving to next page.\n")
-                i = i + 1 if self.finishing_task else i - 1
                 continue
             try:
                 to_add = [obj for obj in j if obj not in tuples and (obj['flag'] != 'none')]
             except Exception as e:
                 self.logger.error("Failure accessing data of page: {}. Moving to next page.\n".format(e))
-                i = i + 1 if self.finishing_task else i - 1
                 continue
-            if len(to_add) == 0 and multiple_pages and 'last' in r.links:
-                self.logger.info("{}".format(r.links['last']))
-                if platform == "github":
-                    page_number = int(r.links['last']['url'][-6:].split('=')[1])
-                elif platform == "gitlab":
-                    page_number = int(r.links['last']['url'].split('&')[2].split("=")[1])
-                if i - 1 != page_number:
-                    self.logger.info("No more pages with unknown tuples, breaking from pagination.\n")
-                    break
 
-            tuples += to_add
-
-            i = i + 1 if self.finishing_task else i - 1
-
-            # Since we already wouldve checked the first page... break
-            if (i == 1 and multiple_pages and not self.finishing_task) or i < 1 or len(j) == 0:
-                self.logger.info("No more pages to check, breaking from pagination.\n")
+            # Going backwards from the last page, a page with nothing new means the rest is known
+            if len(to_add) == 0 and not self.finishing_task and page.number not in (1, page.last):
+                self.logger.info("No more pages with unknown tuples, breaking from pagination.\n")
                 break
 
+            tuples += to_add
+
         return tuples
 
     def new_paginate_endpoint(
         self, url, action_map={}, table=None, where_clause=True, platform='github'
     ):
 
-        page_number = 1
-        multiple_pages = False
-        need_insertion = []
-        need_update = []
         all_data = []
-        forward_pagination = True
-        backwards_activation = False
-        last_page_number = -1
-        while True:
-
-            # Multiple attempts to hit endpoint
-            num_attempts = 0
-            success = False
-            while num_attempts < 10:
-                self.logger.info("hitting an endpiont")
-                #    f"Hitting endpoint: ...\n"
-                #    f"{url.format(page_number)} on page number. \n")
-                try:
-                    response = requests.get(url=url.format(page_number), headers=self.headers, timeout=(5.05,30.01))
-                except TimeoutError as e:
-                    self.logger.info("Request timed out. Sleeping 10 seconds and trying again...\n")
-                    time.sleep(10)
-                    continue
-
-                self.update_rate_limit(response, platform=platform)
-
-                try:
-                    page_data = response.json()
-                except:
-                    page_data = json.loads(json.dumps(response.text))
+        for page in self.iterate_pages(url, platform=platform, timeout=(5.05, 30.01)):
+            all_data += page.data
 
-                if type(page_data) == list:
-                    success = True
-                    break
-                elif type(page_data) == dict:
-                    self.logger.info("Request returned a dict: {}\n".format(page_data))
-                    if page_data['message'] == "Not Found":
-                        self.logger.warning(
-                            "Github repo was not found or does not exist for endpoint: "
-                            f"{url.format(page_number)}\n"
-                        )
-                        break
-                    if "You have triggered an abuse detection mechanism." in page_data['message']:
-                        num_attempts -= 1
-                        self.update_rate_limit(response, temporarily_disable=True,platform=platform)
-                    if page_data['message'] == "Bad credentials":
-                        self.update_rate_limit(response, bad_credentials=True, platform=platform)
-                elif type(page_data) == str:
-                    self.logger.info(f"Warning! page_data was string: {page_data}\n")
-                    if "<!DOCTYPE html>" in page_data:
-                        self.logger.info("HTML was returned, trying again...\n")
-                    elif len(page_data) == 0:
-                        self.logger.warning("Empty string, trying again...\n")
-                    else:
-                        try:
-                            page_data = json.loads(page_data)
-                            success = True
-                            break
-                        except:
-                            pass
-                num_attempts += 1
-            if not success:
-                break
-
-            # Success
-
-            # Determine if continued pagination is needed
-
-            if len(page_data) == 0:
-                self.logger.info("Response was empty, breaking from pagination.\n")
-                break
-
-            all_data += page_data
-
-            if not forward_pagination:
-
-                # Checking contents of requests with what we already have in the db
-                page_insertions, page_updates = self.new_organize_needed_data(
-                    page_data, augur_table=table, action_map=action_map
-                )
-
-                # Reached a page where we already have all tuples
-                if len(need_insertion) == 0 and len(need_update) == 0 and \
-                        backwards_activation:
-                    self.logger.info(
-                        "No more pages with unknown tuples, breaking from pagination.\n"
-                    )
-                    break
-
-                need_insertion += page_insertions
-                need_update += page_updates
-
-            # Find last page so we can decrement from there
-            if 'last' in response.links and last_page_number == -1:
-                if platform == 'github':
-                    last_page_number = int(response.links['last']['url'][-6:].split('=')[1])
-                elif platform == 'gitlab':
-                    last_page_number = int(response.links['last']['url'].split('&')[2].split('=')[1])
-
-                if not forward_pagination and not backwards_activation:
-                    page_number = last_page_number
-                    backwards_activation = True
-
-            self.logger.info("Analyzation of page {} of {} complete\n".format(page_number,
-                int(last_page_number) if last_page_number != -1 else "*last page not known*"))
-
-            if (page_number <= 1 and not forward_pagination) or \
-                    (page_number >= last_page_number and forward_pagination):
-                self.logger.info("No more pages to check, breaking from pagination.\n")
-                break
-
-            page_number = page_number + 1 if forward_pagination else page_number - 1
-
-        if forward_pagination:
-            need_insertion, need_update = self.new_organize_needed_data(
-                all_data, augur_table=table, action_map=action_map
-            )
+        need_insertion, need_update = self.new_organize_needed_data(
+            all_data, augur_table=table, action_map=action_map
+        )
 
         return {
             'insert': need_insertion,
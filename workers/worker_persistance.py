@@ -15,8 +15,6 @@ import concurrent
 import multiprocessing
 import psycopg2
 import psycopg2.extensions
-import csv
-import io
 from logging import FileHandler, Formatter, StreamHandler
 from multiprocessing import Process, Queue, Pool, Value
 from os import getpid
@@ -29,12 +27,17 @@ from augur.config import AugurConfig
 from augur.logging import AugurLogging
 from sqlalchemy.sql.expression import bindparam
 from concurrent import futures
+from workers.change_detection import ChangeIndex, get_source_value
+from workers.copy_stream import CopyStream
 import dask.dataframe as dd
 
 class Persistant():
 
     ROOT_AUGUR_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 
+    # Rows of a table's slice that build_change_index holds in memory before leaving the comparison to postgres
+    CHANGE_INDEX_MAX_KEYS = 1000000
+
     def __init__(self, worker_type, data_tables=[],operations_tables=[]):
 
         self.db_schema = None
@@ -69,8 +72,14 @@ class Persistant():
 
         worker_info = self.augur_config.get_value('Workers', self.config['worker_type'])
         self.config.update(worker_info)
-
-        worker_port = self.config['port']
+        self.change_index_max_keys = self.config.get('change_index_max_keys', Persistant.CHANGE_INDEX_MAX_KEYS)
+        # ChangeIndexes of the current repo's rows, kept for the duration of a task
+        self.change_indexes = {}
+        # Set when rows of the current task could not be stored, so the responses are not cached as seen
+        self.incomplete_collection = False
+
+        # Instances the autoscaler starts are given the port to start probing at
+        worker_port = int(os.environ.get('AUGUR_WORKER_PORT', self.config['port']))
         while True:
             try:
                 r = requests.get('http://{}:{}/AUGWOP/heartbeat'.format(
@@ -328,7 +337,7 @@ class Persistant():
         # Insert data to tables
         for data_table, data in zip(data_tables, data_sets):
             self.bulk_insert(
-                data_table, insert=data, increment_counter=False, convert_float_int=True
+                data_table, insert=data, increment_counter=False
             )
 
         session = s.orm.Session(self.db)
@@ -387,7 +396,8 @@ class Persistant():
 
         :param new_data: list of dictionaries - needs to be compared with data in database to see if any updates are
             needed or if the data needs to be inserted
-        :param table_values: list of SQLAlchemy tuples - data that is currently in the database
+        :param table_values: list of SQLAlchemy tuples - data that is currently in the database, only the
+            columns of the action map are needed
         :param action_map: dict with two keys (insert and update) and each key's value contains a list of the fields
             that are needed to determine if a row is unique or if a row needs to be updated
         :param in_memory: boolean - determines whether the method is done is memory or database
@@ -462,87 +472,123 @@ class Persistant():
                 f"{len(need_updates)} updates.\n")
 
         else:
-            #create panda tabluar data from the keys of the passed table values
-            table_values_df = pd.DataFrame(table_values, columns=table_values[0].keys())
-            new_data_df = pd.DataFrame(new_data).dropna(subset=action_map['insert']['source'])
-
-            new_data_df, table_values_df = self.sync_df_types(new_data_df, table_values_df,
-                    action_map['insert']['source'], action_map['insert']['augur'])
-
-            #Throwing value errors. 'cannot use name of an existing column for indicator column'
-
-
-            '''
-                This is how uniqueness, or whether a piece of data needs to be inserted, or
-                if that data already exists.
-
-                With regards to the comment_action_map (for insertion of issue_comments and pull_request_comments
-                we need to recognize the following:
+            need_insertion, need_updates = ChangeIndex(action_map).add_all(table_values).split(new_data)
+            self.logger.info(
+                f"Table needs {len(need_insertion)} insertions and "
+                f"{len(need_updates)} updates.\n")
+            return need_insertion, need_updates
 
-                    paginate_endpoint() then gets a dataframe of all the data that needs to be inserted.
-                    Earlier, we added 'tool_source' to the augur side of the action map, and left
-                    'id' alone on the source side (since tool_source) is our variable, and part of our
-                    natural key.
+        return need_insertion.to_dict('records'), need_updates.to_dict('records')
 
-                    --Andrew Brain and Sean Goggins 9/16/2021. Debugging duplicate insert errors for
-                    comments after initial collection.
-            '''
 
-            try:
-                need_insertion = new_data_df.merge(table_values_df, suffixes=('','_table'),
-                        how='outer', indicator=True, left_on=action_map['insert']['source'],
-                        right_on=action_map['insert']['augur']).loc[lambda x : x['_merge']=='left_only']
-            except ValueError as e:
+    def build_change_index(self, table, action_map, where_clause=True):
+        """ Streams the natural keys and update columns of the rows of a table into a ChangeIndex
 
-                #Log the error, try to merge again without label to avoid ValueError
-                self.logger.warning(f"Error thrown during pandas merge: {e}")
-                need_insertion = new_data_df.merge(table_values_df, suffixes=('','_table'),
-                        how='outer', indicator=False, left_on=action_map['insert']['source'],
-                        right_on=action_map['insert']['augur']).loc[lambda x : x['_merge']=='left_only']
+            :param table: SQLAlchemy table, table the collected rows go into
+            :param where_clause: SQLAlchemy expression, slice of the table to compare against,
+                usually the rows of the current repo
+            :returns: ChangeIndex, or None when the slice has more than change_index_max_keys rows
+                and detect_changes should compare on the server instead
+        """
+        index = ChangeIndex(action_map)
+        columns = list(dict.fromkeys(index.key_columns + index.update_columns))
+        query = s.sql.select([table.c[column] for column in columns]).where(where_clause)
+
+        with self.db.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query)
+            for row in result:
+                index.add(row)
+                if len(index) > self.change_index_max_keys:
+                    result.close()
+                    self.logger.info(
+                        f"{table.name} has more than {self.change_index_max_keys} rows to compare "
+                        "against, finding changes on the server"
+                    )
+                    return None
 
+        self.logger.info(f"Indexed {len(index)} existing rows of {table.name}")
+        return index
 
+    def repo_change_index(self, table, action_map):
+        """ ChangeIndex of the current repo's rows of a table, built the first time a task asks for it
+            and reused by every later lookup of the task
 
-            if 'update' in action_map:
-                new_data_df, table_values_df = self.sync_df_types(new_data_df, table_values_df,
-                    action_map['update']['source'], action_map['update']['augur'])
-
-                partitions = math.ceil(len(new_data_df) / 1000)
-                attempts = 0
-                while attempts < 50:
-                    try:
-                        need_updates = pd.DataFrame()
-                        self.logger.info(f"Trying {partitions} partitions\n")
-                        for sub_df in numpy.array_split(new_data_df, partitions):
-                            self.logger.info(f"Trying a partition, len {len(sub_df)}\n")
-                            need_updates = pd.concat([ need_updates, sub_df.merge(table_values_df, left_on=action_map['insert']['source'],
-                                right_on=action_map['insert']['augur'], suffixes=('','_table'), how='inner',
-                                indicator=False).merge(table_values_df, left_on=action_map['update']['source'],
-                                right_on=action_map['update']['augur'], suffixes=('','_table'), how='outer',
-                                indicator=True).loc[lambda x : x['_merge']=='left_only'] ])
-                            self.logger.info(f"need_updates merge: {len(sub_df)} worked\n")
-                        break
-
-                    except MemoryError as e:
-                        self.logger.info(f"new_data ({sub_df.shape}) is too large to allocate memory for " +
-                            f"need_updates df merge.\nMemoryError: {e}\nTrying again with {partitions + 1} partitions...\n")
-                        partitions += 1
-                        attempts += 1
-                    # self.logger.info(f"End attempt # {attempts}\n")
-                if attempts >= 50:
-                    self.loggger.info("Max need_updates merge attempts exceeded, cannot perform " +
-                        "updates on this repo.\n")
-                else:
-                    need_updates = need_updates.drop([column for column in list(need_updates.columns) if \
-                        column not in action_map['update']['augur'] and column not in action_map['insert']['augur']],
-                        axis='columns')
-
-                    for column in action_map['insert']['augur']:
-                        need_updates[f'b_{column}'] = need_updates[column]
-
-                    need_updates = need_updates.drop([column for column in action_map['insert']['augur']], axis='columns')
+            :returns: ChangeIndex, or None when the table has no repo_id column or the repo has more
+                than change_index_max_keys rows in it
+        """
+        repo_id = getattr(self, 'repo_id', None)
+        if 'repo_id' not in table.c or repo_id is None:
+            return None
 
-        return need_insertion.to_dict('records'), need_updates.to_dict('records')
+        cache_key = (
+            table.fullname, repo_id, tuple(action_map['insert']['augur']),
+            tuple(action_map['update']['augur']) if 'update' in action_map else ()
+        )
+        if cache_key not in self.change_indexes:
+            self.change_indexes[cache_key] = self.build_change_index(table, action_map, table.c.repo_id == repo_id)
+        return self.change_indexes[cache_key]
 
+    def remember_stored_rows(self, table, rows, key_prefix=''):
+        """ Records rows that were just stored in the change indexes this task holds for the table,
+            so they are not reported as missing or changed again
+        """
+        for cache_key, index in self.change_indexes.items():
+            if index is not None and cache_key[0] == table.fullname:
+                index.remember(rows, key_prefix)
+
+    def detect_changes(self, new_data, table, action_map, where_clause=True, index=None):
+        """ Determines which collected rows need to be inserted or updated, with the same result as
+            organize_needed_data but without loading the table's values
+
+            :param new_data: List of dicts, rows as they were collected
+            :param table: SQLAlchemy table, table the collected rows go into
+            :param where_clause: SQLAlchemy expression, slice of the table to compare against
+            :param index: ChangeIndex from build_change_index, when None the collected rows are
+                staged and anti-joined with the table on the server
+            :returns: List of dicts, rows that need to be inserted, and List of dicts, rows that need
+                to be updated, in the format bulk_insert takes
+        """
+        if len(new_data) == 0:
+            return [], []
+        if index is not None:
+            return index.split(new_data)
+
+        key_columns = action_map['insert']['augur']
+        update_columns = action_map['update']['augur'] if 'update' in action_map else []
+        columns = list(dict.fromkeys(key_columns + update_columns))
+        sources = dict(zip(key_columns, action_map['insert']['source']))
+        if update_columns:
+            sources.update(zip(update_columns, action_map['update']['source']))
+        rows = ([get_source_value(row, sources[column]) for column in columns] for row in new_data)
+
+        connection = self.db.connect()
+        try:
+            with connection.begin():
+                with connection.connection.cursor() as cursor:
+                    staging, _ = self._stage(cursor, table, columns, rows)
+
+                staged = s.Table(staging, s.MetaData(),
+                    *[s.Column(column, table.c[column].type) for column in columns],
+                    s.Column('staging_row', s.BigInteger))
+                existing = table.c[key_columns[0]]
+                changed = s.tuple_(*[table.c[column] for column in update_columns]).op('IS DISTINCT FROM')(
+                    s.tuple_(*[staged.c[column] for column in update_columns])) if update_columns else s.false()
+
+                query = s.sql.select([staged.c.staging_row, existing.is_(None)]).select_from(
+                    staged.outerjoin(table, s.and_(
+                        *[table.c[column] == staged.c[column] for column in key_columns], where_clause))
+                ).where(s.and_(
+                    *[staged.c[column].isnot(None) for column in key_columns],
+                    s.or_(existing.is_(None), changed)
+                )).order_by(staged.c.staging_row)
+                changes = connection.execute(query).fetchall()
+        finally:
+            connection.close()
+
+        index = ChangeIndex(action_map)
+        need_insertion = [new_data[staging_row - 1] for staging_row, missing in changes if missing]
+        need_update = [index.as_update(new_data[staging_row - 1]) for staging_row, missing in changes if not missing]
+        return need_insertion, need_update
 
     def assign_tuple_action(self, new_data, table_values, update_col_map, duplicate_col_map, table_pkey, value_update_col_map={}):
         """ DEPRECATED
@@ -735,7 +781,7 @@ class Persistant():
 
     def bulk_insert(
         self, table, insert=[], update=[], unique_columns=[], update_columns=[],
-        max_attempts=3, attempt_delay=3, increment_counter=True, convert_float_int=False
+        max_attempts=3, attempt_delay=3, increment_counter=True
     ):
         """ Performs bulk inserts/updates of the given data to the given table
 
@@ -766,25 +812,12 @@ class Persistant():
             update_start_time = time.time()
             while attempts < max_attempts:
                 try:
-                    update_result = self.db.execute(
-                        table.update().where(
-                                eval(
-                                    ' and '.join(
-                                        [
-                                            f"self.{table}_table.c.{key} == bindparam('b_{key}')"
-                                            for key in unique_columns
-                                        ]
-                                    )
-                                )
-                            ).values(
-                                {key: key for key in update_columns}
-                            ),
-                        update
-                    )
+                    update_result = self._bulk_update_staged(table, update, unique_columns, update_columns)
+                    self.remember_stored_rows(table, update, 'b_')
                     if increment_counter:
-                        self.update_counter += update_result.rowcount
+                        self.update_counter += update_result
                     self.logger.info(
-                        f"Updated {update_result.rowcount} rows in "
+                        f"Updated {update_result} of {len(update)} rows in "
                         f"{time.time() - update_start_time} seconds"
                     )
                     break
@@ -792,92 +825,261 @@ class Persistant():
                     self.logger.info(f"Warning! Error bulk updating data: {e}")
                     time.sleep(attempt_delay)
                 attempts += 1
+            if attempts == max_attempts:
+                self.incomplete_collection = True
 
         if len(insert) > 0:
-
+            attempts = 0
             insert_start_time = time.time()
+            # One COPY for the whole batch, rows whose natural key already exists are skipped on the server
+            while attempts < max_attempts:
+                try:
+                    insert_result = self._bulk_insert_staged(table, insert, unique_columns)
+                    self.remember_stored_rows(table, insert)
+                    if increment_counter:
+                        self.insert_counter += insert_result
+                    self.logger.info(
+                        f"Inserted {insert_result} of {len(insert)} rows in {time.time() - insert_start_time} seconds"
+                    )
+                    break
+                except Exception as e:
+                    self.print_traceback("Warning! Error bulk inserting data", e, False)
+                    time.sleep(attempt_delay)
+                attempts += 1
+            if attempts == max_attempts:
+                self.incomplete_collection = True
 
-            def psql_insert_copy(table, conn, keys, data_iter):
-                """
-                Execute SQL statement inserting data
-
-                Parameters
-                ----------
-                table : pandas.io.sql.SQLTable
-                conn : sqlalchemy.engine.Engine or sqlalchemy.engine.Connection
-                keys : list of str
-                    Column names
-                data_iter : Iterable that iterates the values to be inserted
-                """
-                # gets a DBAPI connection that can provide a cursor
-                dbapi_conn = conn.connection
-                with dbapi_conn.cursor() as curs:
-                    s_buf = io.StringIO()
-                    writer = csv.writer(s_buf)
-                    writer.writerows(data_iter)
-                    s_buf.seek(0)
-
-                    columns = ', '.join('"{}"'.format(k) for k in keys)
-                    if table.schema:
-                        table_name = '{}.{}'.format(table.schema, table.name)
-                    else:
-                        table_name = table.name
-
-                    sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT CSV, encoding "UTF-8")'.format(
-                        table_name, columns)                        
-
-                    #(FORMAT CSV, FORCE_NULL(column_name))
-
-                    self.logger.debug(f'table name is: {table_name}, and columns are {columns}.')
-                    self.logger.debug(f'sql is: {sql}')
-
-                    #This causes the github worker to throw an error with pandas
-                    #cur.copy_expert(sql=sql, file=self.text_clean(s_buf))
-                    # s_buf_encoded = s_buf.read().encode("UTF-8")
-                    #self.logger.info(f"this is the sbuf_encdoded {s_buf_encoded}")
-                    try:
-                        #Session=sessy.sessionmaker(bind=curs)
-                        #session=Session()
-                        #session.copy_expert(sql=sql, file=s_buf)
-                        #copy_expert(sql=sql, file=s_buf)
-                        curs.copy_expert(sql=sql, file=s_buf)
-                        #session.commit()
-                        #self.logger.info("message committed")
-                        dbapi_conn.commit()
-                        # self.logger.debug("good dog. record committed! Watson, come quick!!!")
-                    except psycopg2.errors.UniqueViolation as e: 
-                        self.logger.info(f"{e}")
-                        dbapi_conn.rollback()                        
-                    except Exception as e:
-                        self.print_traceback("Bulk insert error", e, True)
-                        dbapi_conn.rollback()
-
-            try: 
-                df = pd.DataFrame(insert)
-                if convert_float_int:
-                    df = self._convert_float_nan_to_int(df)
-                df.to_sql(
-                    schema = self.db_schema,
-                    name=table.name,
-                    con=self.db,
-                    if_exists="append",
-                    index=False,
-                    #method=None,
-                    method=psql_insert_copy,
-                    #dtype=dict,
-                    chunksize=1
-                )
-                if increment_counter:
-                    self.insert_counter += len(insert)
+        return insert_result, update_result
 
-                self.logger.info(
-                    f"Inserted {len(insert)} rows in {time.time() - insert_start_time} seconds "
-                    "thanks to postgresql's COPY FROM CSV! :)"
-                )
-            except Exception as e: 
-                self.logger.info(f"Bulk insert error 2: {e}. exception registered.")
+    def _copy_columns(self, rows):
+        """ Every key of the given dicts, in the order they first appear
+        """
+        return list(dict.fromkeys(key for row in rows for key in row))
+
+    def _stage(self, cursor, table, columns, rows, unique_columns=None):
+        """ Streams rows into a temporary table shaped like the given table with a single COPY,
+            encoding them as COPY reads them so the whole load is never held in memory
+
+            :param cursor: psycopg2 cursor, the staging table is dropped when its transaction commits
+            :param rows: Iterable of dicts or sequences in the order of columns
+            :param unique_columns: List of strings, when given only the last staged row of every
+                natural key is kept
+            :returns: String, name of the staging table, and Integer, number of rows it holds.
+                Its staging_row column numbers the rows from 1 in the order they were given
+        """
+        staging = 'staging_{}'.format(table.name)
+        column_list = ', '.join('"{}"'.format(column) for column in columns)
+        cursor.execute('CREATE TEMPORARY TABLE "{}" ON COMMIT DROP AS SELECT {} FROM "{}"."{}" WITH NO DATA'.format(
+            staging, column_list, table.schema or self.db_schema, table.name))
+        cursor.execute('ALTER TABLE "{}" ADD COLUMN staging_row BIGSERIAL'.format(staging))
+
+        stream = CopyStream(rows, columns)
+        cursor.copy_expert('COPY "{}" ({}) FROM STDIN'.format(staging, column_list), stream, size=stream.chunk_size)
+        staged = stream.rows_written
+
+        if unique_columns:
+            cursor.execute("""
+                DELETE FROM "{staging}" AS earlier USING "{staging}" AS later
+                WHERE {join} AND earlier.staging_row < later.staging_row
+            """.format(staging=staging, join=' AND '.join(
+                'earlier."{0}" = later."{0}"'.format(column) for column in unique_columns)))
+            staged -= cursor.rowcount
+        return staging, staged
+
+    def _has_unique_key(self, table, columns):
+        """ Whether the table has a unique constraint or index on exactly these columns, which INSERT ... ON CONFLICT needs
+        """
+        keys = [set(column.name for column in constraint.columns) for constraint in table.constraints
+            if isinstance(constraint, (s.UniqueConstraint, s.PrimaryKeyConstraint))]
+        keys += [set(column.name for column in index.columns) for index in table.indexes
+            if index.unique and not index.dialect_options['postgresql'].get('where')]
+        return set(columns) in keys
+
+    def _staged_update_sql(self, target, staging, unique_columns, update_columns, returning):
+        """ UPDATE of the rows of the target whose update columns differ from the staged row with the same natural key
+        """
+        return """
+            UPDATE {target} AS target SET {assignments}
+            FROM "{staging}" AS staged
+            WHERE {join} AND ({target_values}) IS DISTINCT FROM ({staged_values})
+            RETURNING {returning}
+        """.format(
+            target=target, staging=staging,
+            assignments=', '.join('"{0}" = staged."{0}"'.format(column) for column in update_columns),
+            join=' AND '.join('target."{0}" = staged."{0}"'.format(column) for column in unique_columns),
+            target_values=', '.join('target."{}"'.format(column) for column in update_columns),
+            staged_values=', '.join('staged."{}"'.format(column) for column in update_columns),
+            returning=', '.join('target."{}"'.format(column) for column in returning)
+        )
 
-        return insert_result, update_result
+    def _bulk_insert_staged(self, table, insert, unique_columns=None):
+        """ Inserts every row whose natural key is not in the table yet in one round trip
+
+            :param unique_columns: List of strings, natural key of the rows. Without one, rows
+                that violate any unique constraint of the table are skipped
+            :returns: Integer, number of inserted rows
+        """
+        if isinstance(unique_columns, str):
+            unique_columns = [unique_columns]
+        columns = self._copy_columns(insert)
+        if unique_columns and not set(unique_columns) <= set(columns):
+            unique_columns = None
+        target = '"{}"."{}"'.format(table.schema or self.db_schema, table.name)
+
+        connection = self.db.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                staging, staged = self._stage(cursor, table, columns, insert, unique_columns)
+                column_list = ', '.join('"{}"'.format(column) for column in columns)
+                if not unique_columns:
+                    conflict = 'ON CONFLICT DO NOTHING'
+                elif self._has_unique_key(table, unique_columns):
+                    conflict = 'ON CONFLICT ({}) DO NOTHING'.format(
+                        ', '.join('"{}"'.format(column) for column in unique_columns))
+                else:
+                    conflict = 'WHERE NOT EXISTS (SELECT 1 FROM {} AS target WHERE {})'.format(target,
+                        ' AND '.join('target."{0}" = staged."{0}"'.format(column) for column in unique_columns))
+                cursor.execute('INSERT INTO {} ({}) SELECT {} FROM "{}" AS staged {}'.format(
+                    target, column_list, column_list, staging, conflict))
+                inserted = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+        if inserted < len(insert):
+            self.logger.info(
+                f"Skipped {len(insert) - inserted} of {len(insert)} rows for {table.name}: "
+                f"{len(insert) - staged} repeated a natural key of the batch and "
+                f"{staged - inserted} already existed"
+            )
+        return inserted
+
+    def _bulk_update_staged(self, table, update, unique_columns, update_columns):
+        """ Applies the updates bulk_insert takes (natural key values prefixed with b_) in one round trip
+
+            :returns: Integer, number of rows that changed
+        """
+        columns = unique_columns + [column for column in update_columns if column not in unique_columns]
+        rows = (
+            [row['b_{}'.format(key)] for key in unique_columns] + [row[column] for column in columns[len(unique_columns):]]
+            for row in update
+        )
+        target = '"{}"."{}"'.format(table.schema or self.db_schema, table.name)
+
+        connection = self.db.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                staging, _ = self._stage(cursor, table, columns, rows, unique_columns)
+                cursor.execute(self._staged_update_sql(target, staging, unique_columns, update_columns, unique_columns))
+                updated = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        return updated
+
+    def bulk_upsert(self, table, data, unique_columns, update_columns=None, increment_counter=True, columns=None):
+        """ Inserts new rows and updates changed ones in one round trip, by COPYing all of them
+            into a staging table and merging it into the table on the server
+
+            :param table: SQLAlchemy table, table that we are inserting/updating rows in
+            :param data: List of dicts, data points to upsert, later ones win over earlier ones
+                with the same natural key. Any iterable of dicts or sequences works when columns
+                is given, its rows are streamed to the database as they are produced
+            :param unique_columns: List of strings, natural key of the data points
+            :param update_columns: List of strings, columns that are updated on existing rows,
+                defaults to every column of the data points that is not part of the natural key
+            :param columns: List of strings, columns of the data points, defaults to every key
+                that appears in them
+            :returns: Dict, number of rows `inserted`, `updated` and `unchanged`, and the
+                primary and natural key of every inserted or updated row under `rows`
+        """
+        result = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'rows': []}
+        if columns is None:
+            data = data if isinstance(data, list) else list(data)
+            columns = self._copy_columns(data)
+        if len(columns) == 0:
+            return result
+
+        upsert_start_time = time.time()
+        if update_columns is None:
+            update_columns = [column for column in columns if column not in unique_columns]
+        returning = [column.name for column in table.primary_key.columns]
+        returning += [column for column in unique_columns if column not in returning]
+        target = '"{}"."{}"'.format(table.schema or self.db_schema, table.name)
+
+        connection = self.db.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                staging, staged = self._stage(cursor, table, columns, data, unique_columns)
+                column_list = ', '.join('"{}"'.format(column) for column in columns)
+
+                if self._has_unique_key(table, unique_columns):
+                    # xmax is 0 for rows the statement inserted and set for the ones it updated
+                    cursor.execute("""
+                        INSERT INTO {target} AS target ({columns})
+                        SELECT {columns} FROM "{staging}"
+                        ON CONFLICT ({keys}) DO {action}
+                        RETURNING {returning}, (target.xmax = 0) AS inserted
+                    """.format(
+                        target=target, columns=column_list, staging=staging,
+                        keys=', '.join('"{}"'.format(column) for column in unique_columns),
+                        action='UPDATE SET {} WHERE ({}) IS DISTINCT FROM ({})'.format(
+                            ', '.join('"{0}" = EXCLUDED."{0}"'.format(column) for column in update_columns),
+                            ', '.join('target."{}"'.format(column) for column in update_columns),
+                            ', '.join('EXCLUDED."{}"'.format(column) for column in update_columns)
+                        ) if update_columns else 'NOTHING',
+                        returning=', '.join('target."{}"'.format(column) for column in returning)
+                    ))
+                    rows = cursor.fetchall()
+                    inserted = [row[:-1] for row in rows if row[-1]]
+                    updated = [row[:-1] for row in rows if not row[-1]]
+                else:
+                    # Without a unique key to conflict on, changed rows are updated first and the rest inserted
+                    updated = []
+                    if update_columns:
+                        cursor.execute(self._staged_update_sql(target, staging, unique_columns, update_columns, returning))
+                        updated = cursor.fetchall()
+                    cursor.execute("""
+                        INSERT INTO {target} ({columns})
+                        SELECT {columns} FROM "{staging}" AS staged
+                        WHERE NOT EXISTS (SELECT 1 FROM {target} AS target WHERE {join})
+                        RETURNING {returning}
+                    """.format(
+                        target=target, columns=column_list, staging=staging,
+                        join=' AND '.join('target."{0}" = staged."{0}"'.format(column) for column in unique_columns),
+                        returning=', '.join('"{}"'.format(column) for column in returning)
+                    ))
+                    inserted = cursor.fetchall()
+            connection.commit()
+        except Exception as e:
+            connection.rollback()
+            self.print_traceback("Bulk upsert into {} failed".format(table.name), e, False)
+            self.incomplete_collection = True
+            raise
+        finally:
+            connection.close()
+
+        if isinstance(data, list) and data and isinstance(data[0], dict):
+            self.remember_stored_rows(table, data)
+        result['inserted'] = len(inserted)
+        result['updated'] = len(updated)
+        result['unchanged'] = staged - len(inserted) - len(updated)
+        result['rows'] = [dict(zip(returning, row)) for row in inserted + updated]
+        if increment_counter:
+            self.insert_counter += result['inserted']
+            self.update_counter += result['updated']
+
+        self.logger.info(
+            f"Upserted {staged} rows into {table.name} in {time.time() - upsert_start_time} seconds: "
+            f"{result['inserted']} inserted, {result['updated']} updated, {result['unchanged']} unchanged"
+        )
+        return result
 
     def text_clean(self, data, field):
         """ "Cleans" the provided field of each dict in the list of dicts provided